@@ -1,20 +1,25 @@
 from fastapi import APIRouter, UploadFile, HTTPException, Depends, File
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import hashlib
 import json
 import tempfile
 import os
-import shutil
 
-from app.core.database import get_db, Document
+from app.core.database import get_async_db, Document
 from app.core.config import get_settings
-from app.services.document_loader import DocumentLoader
-from app.services.chunker import SmartChunker
-from app.services.embedder import EmbeddingService
+from app.core.metrics import timed
+from app.core.tracing import finish_trace, start_trace
+from app.services.ingestion import SUPPORTED_EXTENSIONS, cleanup_spooled
+from app.services.jobs import IngestionQueue, get_jobs
 from app.services.retriever import HybridRetriever
-from app.services.generator import RAGGenerator
-from app.services.query_optimizer import QueryOptimizer
-from app.models.rag import QueryRequest, QueryResponse, StatsResponse
+from app.services.registry import ServiceRegistry, get_services
+from app.services.query_optimizer import normalize_query
+from app.models.rag import BatchQueryRequest, JobResponse, QueryRequest, QueryResponse, StatsResponse
 import time
 import logging
 
@@ -23,99 +28,204 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 settings = get_settings()
 
-@router.post("/upload", status_code=201)
+# Strong references to fire-and-forget tasks (e.g. late query rewrites)
+_background_tasks = set()
+
+def _spool_to_temp(file: UploadFile, suffix: str) -> Tuple[str, str]:
+    """Copy an upload to the spool dir, returning (path, sha256 of its bytes)"""
+    # delete=False: the file must outlive this request until a worker picks it up
+    spool_dir = settings.UPLOAD_SPOOL_DIR or None
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=spool_dir) as tmp:
+        while block := file.file.read(1024 * 1024):
+            digest.update(block)
+            tmp.write(block)
+        return tmp.name, digest.hexdigest()
+
+def _job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job["id"],
+        **{k: v for k, v in job.items() if k not in ("id", "files")},
+        "files": [f["filename"] for f in job["files"]]
+    }
+
+@router.post("/upload", status_code=202, response_model=JobResponse)
 async def upload_documents(
     files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db)
+    jobs: IngestionQueue = Depends(get_jobs)
 ):
-    """Upload and process documents"""
-    loader = DocumentLoader()
-    chunker = SmartChunker()
-    embedder = EmbeddingService()
-    
-    documents_processed = 0
-    total_chunks = 0
+    """Accept documents for ingestion and return a job to poll.
+
+    Parsing, chunking, embedding and writing run on background workers;
+    follow progress at GET /jobs/{job_id}. Files ingested before and chunks
+    already stored are skipped; the job result counts new vs deduplicated.
+    """
+    # Reject the whole batch up front rather than failing halfway through
+    for file in files:
+        if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise HTTPException(400, f"Unsupported file type: {file.filename}")
     
+    spooled = []
     try:
-        all_chunks = []
-        source_files = []
-        
         for file in files:
-            # Create a secure temp file
-            # delete=False because Windows can't open open files by name
             suffix = os.path.splitext(file.filename)[1]
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                shutil.copyfileobj(file.file, tmp)
-                temp_path = tmp.name
-            
-            try:
-                # Load based on extension
-                if file.filename.lower().endswith('.pdf'):
-                    docs = loader.load_pdf(temp_path)
-                elif file.filename.lower().endswith('.txt'):
-                    docs = loader.load_text(temp_path)
-                else:
-                    # Skip unsupported but don't crash whole batch? 
-                    # For now raise to be explicit
-                    raise HTTPException(400, f"Unsupported file type: {file.filename}")
-                
-                # Chunk
-                chunks = chunker.chunk_documents(docs)
-                all_chunks.extend(chunks)
-                source_files.append(file.filename)
-                documents_processed += 1
-                
-            finally:
-                # Cleanup temp file
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-        
-        if not all_chunks:
-            return {"status": "success", "message": "No content processed"}
+            path, sha256 = await run_in_threadpool(_spool_to_temp, file, suffix)
+            spooled.append({"filename": file.filename, "path": path, "sha256": sha256})
+        job = await jobs.submit(spooled)
+    except Exception as e:
+        cleanup_spooled({"files": spooled})
+        logger.error("Upload failed", extra={"error": str(e)}, exc_info=True)
+        raise HTTPException(500, f"Could not queue upload: {str(e)}")
+    
+    logger.info("Ingestion job queued", extra={"job_id": job["id"], "files": len(spooled)})
+    return _job_response(job)
 
-        # Generate embeddings (batching handled in service)
-        texts = [c.page_content for c in all_chunks]
-        embeddings = embedder.embed_texts(texts)
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, jobs: IngestionQueue = Depends(get_jobs)):
+    """Status and progress of an ingestion job"""
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return _job_response(job)
+
+
+@router.post("/jobs/{job_id}/retry", status_code=202, response_model=JobResponse)
+async def retry_job(job_id: str, jobs: IngestionQueue = Depends(get_jobs)):
+    """Re-run a failed (or stalled running) ingestion job from its last committed batch"""
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    if job["status"] != "failed" and not jobs.is_stale(job):
+        raise HTTPException(409, f"Only failed or stalled jobs can be retried (job is {job['status']})")
+    if not all(os.path.exists(f["path"]) for f in job["files"]):
+        raise HTTPException(409, "Uploaded files are no longer available; upload them again")
+    job = await jobs.retry(job)
+    if job is None:
+        raise HTTPException(409, "Job is running again")
+    logger.info("Ingestion job requeued", extra={"job_id": job_id})
+    return _job_response(job)
+
+
+@timed("retrieve")
+async def _retrieve_context(
+    request: QueryRequest,
+    db: AsyncSession,
+    services: ServiceRegistry,
+    query_emb: Optional[List[float]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Optionally rewrite the query, then retrieve context docs for it.
+
+    In speculative mode an uncached rewrite runs concurrently with retrieval
+    for the raw query; its results are merged in if it arrives within the
+    grace period. query_emb is the embedding of the raw query, if known.
+    """
+    retriever = HybridRetriever(
+        db, services.embedder, vector_index=services.vector_index, pgvector_version=services.pgvector_version
+    )
+    
+    async def retrieve(query: str) -> List[Dict[str, Any]]:
+        return await retriever.aretrieve(
+            query,
+            top_k=request.top_k,
+            probes=request.probes,
+            ef_search=request.ef_search,
+            query_emb=query_emb if query == request.query else None,
+            filters=request.filters
+        )
+    
+    # Skipped (keyword-like) or cached rewrites need no LLM round trip
+    final_query = services.optimizer.peek(request.query) if request.optimize_query else request.query
+    
+    if final_query is None and settings.QUERY_OPTIMIZER_MODE == "speculative":
+        # Retrieve for the raw query while the rewrite is in flight
+        rewrite_task = asyncio.create_task(services.optimizer.aoptimize(request.query))
+        _background_tasks.add(rewrite_task)
+        rewrite_task.add_done_callback(_background_tasks.discard)
         
-        # Store in DB
-        new_docs = []
-        for i, chunk in enumerate(all_chunks):
-            # Source should be in metadata from loader, but fallback to filename if needed
-            # Our loader puts source in metadata
-            source = chunk.metadata.get('source', 'unknown')
-             # If source is the temp path, we might want to fix it to the original filename?
-             # For now, let's just ensure we track it.
-             
-            doc = Document(
-                content=chunk.page_content,
-                embedding=embeddings[i],
-                doc_metadata=json.dumps(chunk.metadata),
-                source=source
+        docs = await retrieve(request.query)
+        try:
+            final_query = await asyncio.wait_for(
+                asyncio.shield(rewrite_task),
+                timeout=settings.QUERY_REWRITE_GRACE_MS / 1000
             )
-            db.add(doc)
-            new_docs.append(doc)
+        except asyncio.TimeoutError:
+            # Answer from the raw query; the rewrite still lands in the
+            # optimizer cache for the next time this query comes in
+            return docs, None
         
-        db.commit()
-        total_chunks = len(new_docs)
-        
-        return {
-            "status": "success",
-            "documents_processed": documents_processed,
-            "chunks_created": total_chunks,
-            "files": source_files
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(500, f"Processing failed: {str(e)}")
+        if normalize_query(final_query) == normalize_query(request.query):
+            return docs, None
+        rewritten_docs = await retrieve(final_query)
+        return HybridRetriever.merge_results(rewritten_docs, docs, request.top_k), final_query
+    
+    if final_query is None:
+        final_query = await services.optimizer.aoptimize(request.query)
+    if normalize_query(final_query) == normalize_query(request.query):
+        # Not a real rewrite: retrieve with the raw query's embedding
+        final_query = request.query
+    
+    optimized_query_str = final_query if final_query != request.query else None
+    
+    # Retrieve relevant docs
+    docs = await retrieve(final_query)
+    return docs, optimized_query_str
+
+
+def _cache_scope(request: QueryRequest) -> str:
+    # Everything except the query text (and debug) changes which answer is valid
+    return request.model_dump_json(exclude={"query", "debug"})
+
+
+@timed("cache_lookup")
+async def _lookup_cached_answer(
+    request: QueryRequest,
+    services: ServiceRegistry
+) -> Tuple[Optional[List[float]], Optional[int], Optional[Dict[str, Any]]]:
+    """Embed the raw query and check the semantic cache with it.
+
+    Returns (query_emb, corpus_version, hit), all None when the cache is
+    disabled. The version is the cache's as of the lookup; pass it to
+    store() so an answer generated while the corpus changed isn't cached.
+    """
+    cache = services.semantic_cache
+    if cache is None:
+        return None, None, None
+    query_emb = await services.embedder.aembed_query(request.query)
+    hit = await cache.alookup(query_emb, _cache_scope(request))
+    return query_emb, cache.corpus_version, hit
+
+
+def _format_sources(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Map retrieved docs to the SourceDocument response shape"""
+    sources = []
+    for doc in docs:
+        # Parse metadata if string
+        meta = doc.get('metadata', {})
+        if isinstance(meta, str):
+            try:
+                meta = json.loads(meta)
+            except:
+                pass
+                
+        sources.append({
+            "source": doc.get('source') or meta.get('source', 'unknown'),
+            "content": doc.get('content', '')[:200] + "...", # Snippet
+            "score": doc.get('score'),
+            "chunk_id": meta.get('chunk_id')
+        })
+    return sources
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 @router.post("/query", response_model=QueryResponse)
 async def query_rag(
     request: QueryRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    services: ServiceRegistry = Depends(get_services)
 ):
     """Query the RAG system"""
     start_time = time.time()
@@ -125,47 +235,41 @@ async def query_rag(
         raise HTTPException(400, "Query cannot be empty")
         
     logger.info("Query received", extra={"query": request.query, "optimize": request.optimize_query})
-
+    trace = start_trace(detailed=request.debug)
         
     try:
-        embedder = EmbeddingService()
-        retriever = HybridRetriever(db, embedder)
-        generator = RAGGenerator()
-        optimizer = QueryOptimizer()
-        
-        final_query = request.query
-        optimized_query_str = None
-        
-        if request.optimize_query:
-            final_query = optimizer.optimize(request.query)
-            if final_query != request.query:
-                optimized_query_str = final_query
+        query_emb, cache_version, hit = await _lookup_cached_answer(request, services)
+        if hit is not None:
+            logger.info("Query served from cache", extra={
+                "query": request.query,
+                "similarity": round(hit["similarity"], 4),
+                "latency_ms": round((time.time() - start_time) * 1000, 2)
+            })
+            trace_data = finish_trace(trace, settings.TRACE_LOG_SLOW_MS, query=request.query)
+            return {
+                "query": request.query,
+                "optimized_query": hit["optimized_query"],
+                "answer": hit["answer"],
+                "sources": hit["sources"],
+                "tokens_used": 0,
+                "cached": True,
+                "trace": trace_data if request.debug else None
+            }
         
-        # Retrieve relevant docs
-        docs = retriever.retrieve(final_query, top_k=request.top_k)
+        docs, optimized_query_str = await _retrieve_context(request, db, services, query_emb)
         
         # Generate answer
-        result = generator.generate_answer(request.query, docs)
+        result = await services.generator.agenerate_answer(request.query, docs)
         
         # Map sources to response model
-        sources = []
-        for doc in result.get("sources", []):
-            # Parse metadata if string
-            meta = doc.get('metadata', {})
-            if isinstance(meta, str):
-                try:
-                    meta = json.loads(meta)
-                except:
-                    pass
-                    
-            sources.append({
-                "source": doc.get('source') or meta.get('source', 'unknown'),
-                "content": doc.get('content', '')[:200] + "...", # Snippet
-                "score": doc.get('score'),
-                "chunk_id": meta.get('chunk_id')
-            })
-
-
+        sources = _format_sources(result.get("sources", []))
+        
+        if query_emb is not None and "error" not in result:
+            services.semantic_cache.store(query_emb, _cache_scope(request), {
+                "optimized_query": optimized_query_str,
+                "answer": result["answer"],
+                "sources": sources
+            }, version=cache_version)
         
         latency = (time.time() - start_time) * 1000
         logger.info("Query processed", extra={
@@ -173,15 +277,18 @@ async def query_rag(
             "optimized_query": optimized_query_str,
             "tokens_used": result.get("tokens_used", 0),
             "doc_count": len(docs),
+            **result.get("context", {}),
             "latency_ms": round(latency, 2)
         })
+        trace_data = finish_trace(trace, settings.TRACE_LOG_SLOW_MS, query=request.query)
         
         return {
             "query": request.query,
             "optimized_query": optimized_query_str,
             "answer": result["answer"],
             "sources": sources,
-            "tokens_used": result.get("tokens_used", 0)
+            "tokens_used": result.get("tokens_used", 0),
+            "trace": trace_data if request.debug else None
         }
         
     except Exception as e:
@@ -189,13 +296,244 @@ async def query_rag(
         raise HTTPException(500, str(e))
 
 
+@router.post("/query/stream")
+async def query_rag_stream(
+    request: QueryRequest,
+    db: AsyncSession = Depends(get_async_db),
+    services: ServiceRegistry = Depends(get_services)
+):
+    """Query the RAG system, streaming the answer as server-sent events.
+
+    Emits one `sources` event, then `token` events with answer deltas, then
+    a final `done` event with token usage and timings (or an `error` event).
+    """
+    start_time = time.time()
+    
+    if not request.query.strip():
+        logger.warning("Empty query received")
+        raise HTTPException(400, "Query cannot be empty")
+    
+    logger.info("Query received", extra={"query": request.query, "optimize": request.optimize_query, "stream": True})
+    trace = start_trace(detailed=request.debug)
+    
+    # Retrieval happens before the response starts so errors still map to HTTP status
+    try:
+        query_emb, cache_version, hit = await _lookup_cached_answer(request, services)
+        if hit is None:
+            docs, optimized_query_str = await _retrieve_context(request, db, services, query_emb)
+    except Exception as e:
+        logger.error("Query failed", extra={"error": str(e), "query": request.query}, exc_info=True)
+        raise HTTPException(500, str(e))
+    
+    async def cached_events():
+        yield _sse("sources", {
+            "query": request.query,
+            "optimized_query": hit["optimized_query"],
+            "sources": hit["sources"],
+            "cached": True
+        })
+        yield _sse("token", {"delta": hit["answer"]})
+        latency_ms = round((time.time() - start_time) * 1000, 2)
+        logger.info("Query served from cache", extra={
+            "query": request.query,
+            "similarity": round(hit["similarity"], 4),
+            "latency_ms": latency_ms,
+            "stream": True
+        })
+        trace_data = finish_trace(trace, settings.TRACE_LOG_SLOW_MS, query=request.query, stream=True)
+        done = {"tokens_used": 0, "cached": True, "latency_ms": latency_ms}
+        if request.debug:
+            done["trace"] = trace_data
+        yield _sse("done", done)
+    
+    async def events():
+        sources = []
+        answer_parts = []
+        async for item in services.generator.astream_answer(request.query, docs):
+            if item["type"] == "context":
+                sources = _format_sources(item["sources"])
+                yield _sse("sources", {
+                    "query": request.query,
+                    "optimized_query": optimized_query_str,
+                    "sources": sources,
+                    "cached": False
+                })
+            elif item["type"] == "token":
+                answer_parts.append(item["delta"])
+                yield _sse("token", {"delta": item["delta"]})
+            elif item["type"] == "error":
+                logger.error("Query stream failed", extra={"error": item["error"], "query": request.query})
+                yield _sse("error", {"error": item["error"]})
+            else:
+                usage = {k: v for k, v in item.items() if k != "type"}
+                usage["cached"] = False
+                usage["latency_ms"] = round((time.time() - start_time) * 1000, 2)
+                if query_emb is not None:
+                    services.semantic_cache.store(query_emb, _cache_scope(request), {
+                        "optimized_query": optimized_query_str,
+                        "answer": "".join(answer_parts),
+                        "sources": sources
+                    }, version=cache_version)
+                logger.info("Query streamed", extra={
+                    "query": request.query,
+                    "optimized_query": optimized_query_str,
+                    "doc_count": len(docs),
+                    **usage
+                })
+                trace_data = finish_trace(trace, settings.TRACE_LOG_SLOW_MS, query=request.query, stream=True)
+                if request.debug:
+                    usage["trace"] = trace_data
+                yield _sse("done", usage)
+    
+    return StreamingResponse(
+        cached_events() if hit is not None else events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/query/batch")
+async def query_rag_batch(
+    request: BatchQueryRequest,
+    db: AsyncSession = Depends(get_async_db),
+    services: ServiceRegistry = Depends(get_services)
+):
+    """Answer many queries in one request, streamed as NDJSON.
+
+    All queries are embedded together and retrieved by one SQL statement;
+    answers are then generated at most BATCH_GENERATION_CONCURRENCY at a
+    time. Each line is a QueryResponse plus the query's `index` in the
+    request (or `index` and `error`), written as soon as that answer is
+    ready, so lines arrive out of order.
+    """
+    start_time = time.time()
+    
+    if len(request.queries) > settings.BATCH_QUERY_MAX:
+        raise HTTPException(400, f"At most {settings.BATCH_QUERY_MAX} queries per batch")
+    if not all(q.strip() for q in request.queries):
+        logger.warning("Empty query received", extra={"batch": len(request.queries)})
+        raise HTTPException(400, "Query cannot be empty")
+    
+    # The single-query request each one corresponds to (cache scope included)
+    requests = [
+        QueryRequest(query=q, optimize_query=False, **request.model_dump(exclude={"queries"}))
+        for q in request.queries
+    ]
+    cache = services.semantic_cache
+    trace = start_trace()
+    
+    # Retrieval happens before the response starts so errors still map to HTTP status
+    try:
+        query_embs = await services.embedder.aembed_queries(request.queries)
+        cache_version = None
+        if cache is not None:
+            await cache.refresh_version()
+            cache_version = cache.corpus_version
+        hits = [
+            cache.lookup(emb, _cache_scope(r)) if cache is not None else None
+            for emb, r in zip(query_embs, requests)
+        ]
+        pending = [i for i, hit in enumerate(hits) if hit is None]
+        retriever = HybridRetriever(
+            db, services.embedder, vector_index=services.vector_index, pgvector_version=services.pgvector_version
+        )
+        retrieved = await retriever.aretrieve_batch(
+            [request.queries[i] for i in pending],
+            [query_embs[i] for i in pending],
+            top_k=request.top_k,
+            probes=request.probes,
+            ef_search=request.ef_search,
+            filters=request.filters
+        )
+    except Exception as e:
+        logger.error("Batch query failed", extra={"error": str(e), "batch": len(request.queries)}, exc_info=True)
+        raise HTTPException(500, str(e))
+    
+    logger.info("Batch retrieved", extra={
+        "batch": len(request.queries),
+        "cached": len(request.queries) - len(pending),
+        "latency_ms": round((time.time() - start_time) * 1000, 2)
+    })
+    
+    async def answer(index: int, docs: List[Dict[str, Any]], limit: asyncio.Semaphore) -> Dict[str, Any]:
+        query = request.queries[index]
+        try:
+            async with limit:
+                result = await services.generator.agenerate_answer(query, docs)
+        except Exception as e:
+            # One failed answer becomes its own error line; the rest still stream
+            logger.error("Batch query failed", extra={"error": str(e), "query": query}, exc_info=True)
+            return {"index": index, "query": query, "error": str(e)}
+        if "error" in result:
+            return {"index": index, "query": query, "error": result["error"]}
+        sources = _format_sources(result.get("sources", []))
+        if cache is not None:
+            cache.store(query_embs[index], _cache_scope(requests[index]), {
+                "optimized_query": None,
+                "answer": result["answer"],
+                "sources": sources
+            }, version=cache_version)
+        return {
+            "index": index,
+            "query": query,
+            "optimized_query": None,
+            "answer": result["answer"],
+            "sources": sources,
+            "tokens_used": result.get("tokens_used", 0),
+            "cached": False
+        }
+    
+    async def lines():
+        for index, hit in enumerate(hits):
+            if hit is not None:
+                yield json.dumps({
+                    "index": index,
+                    "query": request.queries[index],
+                    "optimized_query": hit["optimized_query"],
+                    "answer": hit["answer"],
+                    "sources": hit["sources"],
+                    "tokens_used": 0,
+                    "cached": True
+                }) + "\n"
+        
+        limit = asyncio.Semaphore(settings.BATCH_GENERATION_CONCURRENCY)
+        tasks = [asyncio.create_task(answer(i, docs, limit)) for i, docs in zip(pending, retrieved)]
+        tokens_used = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                line = await finished
+                tokens_used += line.get("tokens_used", 0)
+                yield json.dumps(line) + "\n"
+        finally:
+            # Client went away or the stream broke: stop generating answers nobody reads
+            for task in tasks:
+                task.cancel()
+        
+        logger.info("Batch answered", extra={
+            "batch": len(request.queries),
+            "tokens_used": tokens_used,
+            "latency_ms": round((time.time() - start_time) * 1000, 2)
+        })
+        finish_trace(trace, settings.TRACE_LOG_SLOW_MS, "Batch trace", batch=len(request.queries))
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/stats", response_model=StatsResponse)
-async def get_stats(db: Session = Depends(get_db)):
+async def get_stats(
+    db: AsyncSession = Depends(get_async_db),
+    services: ServiceRegistry = Depends(get_services)
+):
     """Get system statistics"""
-    doc_count = db.query(Document).count()
+    doc_count = await db.scalar(select(func.count()).select_from(Document))
     
     return {
         "total_documents": doc_count,
         "embedding_model": settings.EMBEDDING_MODEL,
-        "llm_model": settings.MODEL_NAME
+        "llm_model": settings.MODEL_NAME,
+        "embedding_cache": services.embedding_cache_stats(),
+        "embedding_throughput": services.embedding_throughput_stats(),
+        "semantic_cache": services.semantic_cache.stats() if services.semantic_cache else None,
+        "vector_index": services.vector_index.stats() if services.vector_index else None,
+        "context_packing": services.context_packing_stats()
     }
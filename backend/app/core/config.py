@@ -1,6 +1,7 @@
 import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "RAG System"
@@ -18,6 +19,13 @@ class Settings(BaseSettings):
         from urllib.parse import quote_plus
         return f"postgresql://{quote_plus(self.POSTGRES_USER)}:{quote_plus(self.POSTGRES_PASSWORD)}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return self.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+
     # Redis
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
@@ -26,10 +34,128 @@ class Settings(BaseSettings):
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     
+    # Providers: "gemini" or "hash" embeddings (offline, deterministic);
+    # "openrouter" or "stub" completions (benchmarks/stub_llm_server.py at STUB_LLM_URL)
+    EMBEDDING_PROVIDER: str = "gemini"
+    HASH_EMBEDDING_SEED: int = 0
+    LLM_PROVIDER: str = "openrouter"
+    STUB_LLM_URL: str = "http://localhost:8001/v1"
+
     # Defaults
     EMBEDDING_MODEL: str = "models/text-embedding-004"
     MODEL_NAME: str = "google/gemini-3-flash-preview"
 
+    # Document embedding calls: batches in flight at once and provider rate limits (0 = unlimited)
+    EMBED_CONCURRENCY: int = 4
+    EMBED_REQUESTS_PER_MINUTE: float = 1500
+    EMBED_TEXTS_PER_MINUTE: float = 0
+    EMBED_RETRIES: int = 5  # per batch, on 429/5xx
+    EMBED_RETRY_BACKOFF: float = 0.5  # seconds; doubles per attempt, with full jitter
+
+    # Stored embeddings: EMBEDDING_DIM below the model's native size keeps the
+    # leading dimensions (only meaningful for Matryoshka-trained models such as
+    # text-embedding-004). "halfvec" storage (float16) needs pgvector >= 0.7.
+    # Change these on an existing table with `manage.py compact-embeddings`.
+    EMBEDDING_DIM: int = 768
+    EMBEDDING_STORAGE: str = "vector"
+    # Shortlist by Hamming distance over a 1-bit-per-dimension copy, then rank
+    # the shortlist (BINARY_RESCORE_FACTOR x candidates) at full precision.
+    # Needs pgvector >= 0.7 (HNSW bit index); older servers use plain ANN search
+    EMBEDDING_BINARY_RESCORE: bool = False
+    BINARY_RESCORE_FACTOR: int = 10
+
+    # Shared HTTP connection pool for LLM clients
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE: int = 20
+    HTTP_TIMEOUT: float = 60.0
+
+    # ANN index on documents.embedding: "hnsw", "ivfflat" or "none"
+    ANN_INDEX_TYPE: str = "hnsw"
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    IVFFLAT_LISTS: int = 0  # 0 = derive from row count at build time
+    ANN_BUILD_MAINTENANCE_WORK_MEM: str = ""  # e.g. "1GB" to speed up builds
+    # Per-query search knobs; None leaves the server default
+    IVFFLAT_PROBES: Optional[int] = None
+    HNSW_EF_SEARCH: Optional[int] = None
+    # Metadata-filtered queries: pgvector >= 0.8 keeps scanning the index until
+    # enough rows pass the filter ("off", "relaxed_order" or "strict_order";
+    # IVFFlat only has relaxed_order). Older servers search this many times
+    # wider instead (ef_search / probes)
+    ANN_ITERATIVE_SCAN: str = "relaxed_order"
+    FILTERED_SEARCH_FACTOR: int = 4
+
+    # In-process vector index (memory-mapped files shared by the workers on a host):
+    # "off" = pgvector only, "front" = use it once it has caught up with the table
+    # and fall back to pgvector otherwise, "replace" = always use it
+    VECTOR_INDEX_MODE: str = "off"
+    VECTOR_INDEX_PATH: str = "vector_index/documents"
+    VECTOR_INDEX_DTYPE: str = "float32"  # "float16" halves memory, but scans convert it back and run slower
+    VECTOR_INDEX_IVF_MIN_ROWS: int = 100000  # below this, searches scan every row
+    VECTOR_INDEX_NLIST: int = 0  # IVF partitions; 0 = derive from row count
+    VECTOR_INDEX_NPROBE: int = 8  # partitions scored per query (the probes field overrides)
+
+    # Hybrid retrieval: "fused" (one CTE statement), "parallel" or "sequential"
+    RETRIEVAL_MODE: str = "fused"
+    # Candidates (ids and scores only) each search contributes before fusion;
+    # 0 = 2 x top_k. Content is then loaded for the final top_k only
+    SEMANTIC_CANDIDATES: int = 0
+    KEYWORD_CANDIDATES: int = 0
+    # POST /query/batch: most queries per request, and answers generated at once
+    BATCH_QUERY_MAX: int = 500
+    BATCH_GENERATION_CONCURRENCY: int = 8
+    # Prompt context: adjacent chunks of a source are merged (overlap removed)
+    # and the best-scoring ones kept up to this many tokens; 0 = no cap
+    CONTEXT_TOKEN_BUDGET: int = 4000
+
+    # Query traces (spans, row counts, cache results) are logged for debug
+    # requests and for queries slower than this; 0 = debug requests only
+    TRACE_LOG_SLOW_MS: float = 1000
+
+    # Query rewriting: "blocking" waits for the rewrite before retrieval,
+    # "speculative" retrieves for the raw query while the rewrite is in flight
+    QUERY_OPTIMIZER_MODE: str = "speculative"
+    QUERY_REWRITE_CACHE_SIZE: int = 5000
+    QUERY_REWRITE_SKIP_MAX_WORDS: int = 4  # keyword-like queries up to this length skip rewriting
+    QUERY_REWRITE_GRACE_MS: int = 150  # how long speculative mode waits on a late rewrite
+
+    # Semantic answer cache (matched by query-embedding cosine similarity)
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_SIZE: int = 1000
+    SEMANTIC_CACHE_TTL: int = 3600
+    # How often each process checks the shared corpus version (bumped by
+    # ingestion anywhere) before serving cached answers
+    SEMANTIC_CACHE_VERSION_CHECK_SECONDS: float = 1.0
+
+    # Embedding cache (memory LRU, optional SQLite file and Redis tiers)
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_PATH: str = ""
+    EMBEDDING_CACHE_REDIS: bool = False
+    EMBEDDING_CACHE_TTL: int = 7 * 24 * 3600
+
+    # PDF parsing process pool: 0 = one worker per CPU core, 1 = parse in-process
+    PDF_PARSE_WORKERS: int = 0
+    PDF_PAGES_PER_TASK: int = 32  # large PDFs are split into ranges of this many pages
+    TEXT_BLOCK_CHARS: int = 1 << 20  # other files are read in blocks of about this many characters
+
+    # Background ingestion jobs: "memory", "sqlite" or "redis" (shared with app.worker)
+    JOB_BACKEND: str = "memory"
+    JOB_SQLITE_PATH: str = "jobs.db"
+    JOB_WORKERS: int = 2  # 0 = API only enqueues; run python -m app.worker instead
+    JOB_STAGE_RETRIES: int = 3
+    JOB_RETRY_BACKOFF: float = 1.0  # seconds, doubled after every failed attempt
+    # Running jobs heartbeat every third of this; a job whose heartbeat is
+    # older (its worker died) is put back on the queue
+    JOB_LEASE_SECONDS: float = 60
+    # Streaming ingestion: chunks flow through in micro-batches that commit one by one
+    INGEST_BATCH_SIZE: int = 64
+    INGEST_QUEUE_DEPTH: int = 4  # batches buffered between stages; bounds memory
+    # Document writes: "copy" (binary COPY) or "insert" (multi-row INSERT)
+    BULK_WRITE_METHOD: str = "copy"
+    BULK_WRITE_BATCH_SIZE: int = 5000  # rows per COPY / INSERT round
+    UPLOAD_SPOOL_DIR: str = ""  # where uploads wait for a worker; "" = system temp dir
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 @lru_cache
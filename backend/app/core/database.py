@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Index
+from sqlalchemy import create_engine, func, Column, Computed, Integer, String, Text, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -15,6 +17,19 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (asyncpg) used by the API request path so DB waits
+# don't block the event loop
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 # Dependency to get DB session
@@ -25,17 +40,92 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def embedding_type(dim: int = None, storage: str = None):
+    """Column type for documents.embedding as configured in settings"""
+    dim = dim or settings.EMBEDDING_DIM
+    storage = storage or settings.EMBEDDING_STORAGE
+    if storage == "halfvec":
+        return HALFVEC(dim)
+    if storage == "vector":
+        return Vector(dim)
+    raise ValueError(f"Unknown embedding storage: {storage}")
+
+def binary_quantize_sql(column: str, dim: int) -> str:
+    """SQL for pgvector's binary_quantize(column)::bit(dim): 1 where a
+    component is > 0. Built from the vector's text form, so it also works
+    on pgvector < 0.7 and is immutable enough for a generated column."""
+    return (
+        "CAST(translate(regexp_replace(regexp_replace(regexp_replace("
+        f"({column})::text, "
+        # Rewrite whole elements only: "1e-05" is positive despite its "-"
+        r"'(?<=[\[,])-[^,\]]*', 'N', 'g'), "  # negatives
+        r"'(?<=[\[,])0(?=[,\]])', 'N', 'g'), "  # exact zeros
+        r"'(?<=[\[,])[^,\]N][^,\]]*', '1', 'g'), "  # the rest are positive
+        f"'N[],', '0') AS bit({dim}))"
+    )
+
 class Document(Base):
     __tablename__ = "documents"
     
     id = Column(Integer, primary_key=True)
     content = Column(Text, nullable=False)
-    embedding = Column(Vector(768))  # Gemini embedding dim
-    doc_metadata = Column(Text)  # JSON string
+    embedding = Column(embedding_type())
+    doc_metadata = Column(JSONB)
     source = Column(String(500))
     created_at = Column(DateTime)
+    # sha256 of content; unique so re-ingested chunks are skipped
+    content_hash = Column(String(64))
+    # Tokenized once at write time instead of on every keyword query
+    content_tsv = Column(
+        TSVECTOR,
+        Computed("to_tsvector('english', content)", persisted=True)
+    )
+    if settings.EMBEDDING_BINARY_RESCORE:
+        # Sign bits of embedding for the coarse Hamming pass (32x smaller)
+        embedding_bits = Column(
+            BIT(settings.EMBEDDING_DIM),
+            Computed(binary_quantize_sql("embedding", settings.EMBEDDING_DIM), persisted=True)
+        )
     
-    # Create index for fast similarity search
+    # The ANN index on embedding is managed by app.core.migrations.build_ann_index
+    # (its type and parameters come from settings, and IVFFlat must be built
+    # after data is loaded)
     __table_args__ = (
-        Index('embedding_idx', embedding, postgresql_using='ivfflat'),
+        Index('content_tsv_idx', content_tsv, postgresql_using='gin'),
+        # A chunk is stored once per source; the same text in another file is kept
+        Index('source_content_hash_idx', source, content_hash, unique=True),
+        # Serve the retrieval filters: @> containment / @? jsonpath, and source IN
+        Index('doc_metadata_idx', doc_metadata, postgresql_using='gin',
+              postgresql_ops={'doc_metadata': 'jsonb_path_ops'}),
+        Index('source_idx', source),
     )
+
+class IngestionCheckpoint(Base):
+    """Last micro-batch an ingestion job committed, written in the same
+    transaction as the batch so a resumed job never re-inserts it"""
+    __tablename__ = "ingestion_checkpoints"
+
+    job_id = Column(String(64), primary_key=True)
+    batches_committed = Column(Integer, nullable=False, default=0)
+    rows_written = Column(Integer, nullable=False, default=0)
+
+class IngestedFile(Base):
+    """Registry of uploaded files (by sha256 of their bytes) that ingested fully"""
+    __tablename__ = "ingested_files"
+
+    file_hash = Column(String(64), primary_key=True)
+    filename = Column(String(500))
+    created_at = Column(DateTime, server_default=func.now())
+
+class CorpusVersion(Base):
+    """Single-row counter bumped in every write that adds documents, so each
+    API process can tell its semantic cache predates the current corpus"""
+    __tablename__ = "corpus_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
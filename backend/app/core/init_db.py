@@ -1,5 +1,6 @@
 from sqlalchemy import text
 from app.core.database import engine, Base
+from app.core.migrations import build_ann_index, scope_content_hash_index
 
 def init_db():
     """Initialize database with pgvector extension"""
@@ -10,6 +11,12 @@ def init_db():
     
     # Create tables
     Base.metadata.create_all(bind=engine)
+    # Tables created before dedupe was per source still have the global index
+    scope_content_hash_index(engine)
+    
+    # Create the ANN index (and the Hamming index on embedding_bits, if that
+    # column exists) when missing; no-op for IVFFlat on an empty table
+    build_ann_index(engine)
 
 if __name__ == "__main__":
     print("Initializing database...")
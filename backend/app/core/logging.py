@@ -1,6 +1,7 @@
 import logging
 import sys
 from pythonjsonlogger import jsonlogger
+from app.core.tracing import RequestIdFilter
 
 def setup_logging():
     """Configure structured JSON logging for the application"""
@@ -19,6 +20,8 @@ def setup_logging():
         rename_fields={"asctime": "timestamp", "levelname": "level"}
     )
     handler.setFormatter(formatter)
+    # Correlate every line of a request by its request_id
+    handler.addFilter(RequestIdFilter())
     
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
@@ -0,0 +1,325 @@
+"""In-process counters and latency histograms, rendered in the Prometheus
+text format at GET /metrics.
+
+Metrics are per process: with several uvicorn workers each one keeps and
+serves its own, so scrape them per worker (or run one worker per port).
+A timed stage costs two perf_counter calls, a bisect over the buckets and
+an uncontended lock, so the timers stay on in production.
+"""
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from app.core.tracing import current_trace
+
+# Seconds; spans cache hits (sub-ms) to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names.
+
+    labels(...) returns the child for one combination of label values;
+    callers on hot paths can keep that child instead of looking it up again.
+    """
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **labels):
+        key = tuple(str(v) for v in values) or tuple(str(labels[n]) for n in self.labelnames)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    """A total that only goes up (requests, tokens, rows)"""
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self.labels(**labels).inc(amount)
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(child.value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow; cumulated when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+
+    def time(self) -> "Timer":
+        return Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(Metric):
+    """Observations (usually seconds) counted into cumulative buckets"""
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels) -> "Timer":
+        return Timer(self.labels(**labels))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, key, child) -> List[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="{}"'.format(_number(bound))
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Timer:
+    """Observe elapsed seconds into a histogram child.
+
+    Use as a context manager (`with timed("hydrate"):`) or as a decorator
+    on a sync or async function.
+    """
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+        self.start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.finish(self.start)
+
+    def finish(self, start: float) -> None:
+        self.child.observe(time.perf_counter() - start)
+
+    def __call__(self, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.finish(start)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed_sync(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.finish(start)
+        return timed_sync
+
+
+class StageTimer(Timer):
+    """Timer that also adds a span to the request's trace, if one is active"""
+
+    def __init__(self, child: _HistogramChild, stage: str):
+        super().__init__(child)
+        self.stage = stage
+
+    def finish(self, start: float) -> None:
+        seconds = time.perf_counter() - start
+        self.child.observe(seconds)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_span(self.stage, start, seconds)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_stage_seconds",
+    "Time spent in each query pipeline stage",
+    ["stage"]
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "rag_http_request_seconds",
+    "HTTP request latency until the response starts, by endpoint function",
+    ["method", "endpoint", "status"]
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "rag_llm_tokens_total",
+    "LLM tokens used, by caller and kind",
+    ["caller", "kind"]
+))
+CONTEXT_TOKENS_SAVED = REGISTRY.register(Counter(
+    "rag_context_tokens_saved_total",
+    "Prompt tokens removed by context packing"
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "rag_cache_lookups_total",
+    "Cache lookups, by cache and result (hit or miss)",
+    ["cache", "result"]
+))
+DB_ROWS = REGISTRY.register(Counter(
+    "rag_db_rows_total",
+    "Rows returned by retrieval queries, by query",
+    ["query"]
+))
+EMBEDDING_REQUESTS = REGISTRY.register(Counter(
+    "rag_embedding_requests_total",
+    "Embedding provider calls (one per batch), by provider and task",
+    ["provider", "task"]
+))
+EMBEDDING_TEXTS = REGISTRY.register(Counter(
+    "rag_embedding_texts_total",
+    "Texts sent to the embedding provider, by provider and task",
+    ["provider", "task"]
+))
+
+
+def timed(stage: str) -> StageTimer:
+    """Timer for one pipeline stage (rag_stage_seconds{stage=...}); the
+    stage is also a span of the current trace"""
+    return StageTimer(STAGE_SECONDS.labels(stage=stage), stage)
+
+
+def observe_stage(stage: str, start: float) -> None:
+    """Record a stage that began at perf_counter() value start and ends now"""
+    timed(stage).finish(start)
+
+
+# The helpers below update a counter and the current trace together
+
+def record_llm_usage(caller: str, usage) -> None:
+    """Count an OpenAI-style usage object's tokens (no-op when absent)"""
+    if usage is None:
+        return
+    prompt, completion = usage.prompt_tokens or 0, usage.completion_tokens or 0
+    LLM_TOKENS.labels(caller=caller, kind="prompt").inc(prompt)
+    LLM_TOKENS.labels(caller=caller, kind="completion").inc(completion)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_tokens(caller, prompt, completion)
+
+
+def record_cache_lookup(cache: str, hits: int = 0, misses: int = 0) -> None:
+    if hits:
+        CACHE_LOOKUPS.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache=cache, result="miss").inc(misses)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_cache(cache, hits, misses)
+
+
+def record_rows(query: str, rows: int) -> None:
+    DB_ROWS.labels(query=query).inc(rows)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_rows(query, rows)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
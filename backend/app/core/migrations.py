@@ -0,0 +1,287 @@
+import math
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.core.config import get_settings
+from app.core.database import binary_quantize_sql, engine as default_engine
+
+settings = get_settings()
+
+ANN_INDEX_NAME = "embedding_idx"
+BITS_INDEX_NAME = "embedding_bits_idx"
+
+@lru_cache
+def pgvector_version(engine: Engine = default_engine) -> Tuple[int, ...]:
+    """Installed pgvector extension version, e.g. (0, 7, 4); () if missing"""
+    with engine.connect() as conn:
+        version = conn.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        ).scalar()
+    return tuple(int(part) for part in version.split(".")) if version else ()
+
+
+def backfill_tsvector(engine: Engine = default_engine):
+    """Add the stored content_tsv column and its GIN index to an existing table.
+
+    Adding a STORED generated column rewrites the table, which computes the
+    tsvector for every existing row in one pass.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('english', content)) STORED"
+        ))
+    # CONCURRENTLY can't run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS content_tsv_idx "
+            "ON documents USING gin (content_tsv)"
+        ))
+        conn.execute(text("ANALYZE documents"))
+
+
+def backfill_content_hash(engine: Engine = default_engine) -> int:
+    """Add documents.content_hash, fill it for existing rows and make it
+    unique per source.
+
+    Rows whose content is already stored for the same source under a lower
+    id are deleted first, since the unique index can't be built over
+    duplicates. Returns how many duplicates were removed.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash varchar(64)"))
+        # Same digest as app.services.bulk_writer.content_hash
+        conn.execute(text(
+            "UPDATE documents SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') "
+            "WHERE content_hash IS NULL"
+        ))
+        removed = conn.execute(text(
+            "DELETE FROM documents d USING documents keep "
+            "WHERE d.source = keep.source AND d.content_hash = keep.content_hash AND d.id > keep.id"
+        )).rowcount
+    _build_source_hash_index(engine)
+    return removed
+
+
+def scope_content_hash_index(engine: Engine = default_engine) -> bool:
+    """Replace the old content_hash_idx (unique across all sources) with
+    source_content_hash_idx, so the same chunk text can be stored once per
+    source. Returns False when there is no old index to replace.
+
+    The old index already made every hash unique, so the new one builds
+    without removing rows.
+    """
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT to_regclass('content_hash_idx') IS NOT NULL")).scalar():
+            return False
+    _build_source_hash_index(engine)
+    return True
+
+
+def _build_source_hash_index(engine: Engine) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS source_content_hash_idx "
+            "ON documents (source, content_hash)"
+        ))
+        conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS content_hash_idx"))
+
+
+def migrate_metadata_jsonb(engine: Engine = default_engine):
+    """Convert documents.doc_metadata from JSON text to jsonb and index it.
+
+    The ALTER rewrites the table under an exclusive lock; the GIN index
+    (jsonb_path_ops, for @> and @? filters) and the source index are then
+    built concurrently.
+    """
+    with engine.begin() as conn:
+        column_type = conn.execute(text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'documents'::regclass AND attname = 'doc_metadata'"
+        )).scalar()
+        if column_type != "jsonb":
+            conn.execute(text(
+                "ALTER TABLE documents ALTER COLUMN doc_metadata TYPE jsonb USING doc_metadata::jsonb"
+            ))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS doc_metadata_idx "
+            "ON documents USING gin (doc_metadata jsonb_path_ops)"
+        ))
+        conn.execute(text("CREATE INDEX CONCURRENTLY IF NOT EXISTS source_idx ON documents (source)"))
+        conn.execute(text("ANALYZE documents"))
+
+
+def ivfflat_lists(row_count: int) -> int:
+    """pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond"""
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+def ann_index_ddl(
+    index_type: str,
+    name: str,
+    row_count: int,
+    concurrently: bool = True,
+    storage: Optional[str] = None
+) -> str:
+    """CREATE INDEX statement for the configured ANN index (cosine opclass
+    for the column's storage type, "vector" or "halfvec")"""
+    opclass = f"{storage or settings.EMBEDDING_STORAGE}_cosine_ops"
+    if index_type == "hnsw":
+        using = "hnsw"
+        params = f"m = {settings.HNSW_M}, ef_construction = {settings.HNSW_EF_CONSTRUCTION}"
+    elif index_type == "ivfflat":
+        using = "ivfflat"
+        params = f"lists = {settings.IVFFLAT_LISTS or ivfflat_lists(row_count)}"
+    else:
+        raise ValueError(f"Unknown ANN index type: {index_type}")
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} "
+        f"ON documents USING {using} (embedding {opclass}) WITH ({params})"
+    )
+
+def build_ann_index(
+    engine: Engine = default_engine,
+    index_type: Optional[str] = None,
+    rebuild: bool = False
+) -> Optional[str]:
+    """Build (or rebuild) the ANN index, typically after a bulk load.
+
+    A rebuild creates the new index alongside the old one and swaps names,
+    so queries keep an index to use while it builds. Returns the DDL used,
+    or None when nothing was done.
+    """
+    build_bits_index(engine)
+    index_type = index_type or settings.ANN_INDEX_TYPE
+    if index_type == "none":
+        return None
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        exists = conn.execute(
+            text("SELECT to_regclass(:name) IS NOT NULL"), {"name": ANN_INDEX_NAME}
+        ).scalar()
+        if exists and not rebuild:
+            return None
+
+        row_count = conn.execute(text("SELECT count(*) FROM documents")).scalar()
+        storage, _ = _embedding_column(conn)
+        if index_type == "ivfflat" and row_count == 0:
+            # IVFFlat centroids are trained on existing rows; an index built
+            # on an empty table is useless, so wait for data
+            return None
+
+        if settings.ANN_BUILD_MAINTENANCE_WORK_MEM:
+            conn.execute(text("SELECT set_config('maintenance_work_mem', :v, false)"),
+                         {"v": settings.ANN_BUILD_MAINTENANCE_WORK_MEM})
+
+        target = f"{ANN_INDEX_NAME}_new" if exists else ANN_INDEX_NAME
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {ANN_INDEX_NAME}_new"))
+        ddl = ann_index_ddl(index_type, target, row_count, storage=storage)
+        conn.execute(text(ddl))
+        if exists:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY {ANN_INDEX_NAME}"))
+            conn.execute(text(f"ALTER INDEX {target} RENAME TO {ANN_INDEX_NAME}"))
+        conn.execute(text("ANALYZE documents"))
+        return ddl
+
+
+def build_bits_index(engine: Engine = default_engine) -> bool:
+    """Create the HNSW Hamming index on embedding_bits if the column exists
+    and the index doesn't. Without it the binary rescoring shortlist scans
+    every row. Needs pgvector >= 0.7 (the retriever skips binary rescoring
+    on older servers). Returns whether the index was built."""
+    if pgvector_version(engine) < (0, 7):
+        return False
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        has_bits = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'documents' AND column_name = 'embedding_bits')"
+        )).scalar()
+        exists = conn.execute(
+            text("SELECT to_regclass(:name) IS NOT NULL"), {"name": BITS_INDEX_NAME}
+        ).scalar()
+        if not has_bits or exists:
+            return False
+        conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY {BITS_INDEX_NAME} ON documents "
+            "USING hnsw (embedding_bits bit_hamming_ops)"
+        ))
+    return True
+
+
+def _embedding_column(conn) -> Tuple[str, int]:
+    """documents.embedding as it is in the database, e.g. ("vector", 768)"""
+    column_type = conn.execute(text(
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = 'documents'::regclass AND attname = 'embedding'"
+    )).scalar()
+    storage, dim = column_type.rstrip(")").split("(")
+    return storage, int(dim)
+
+
+def _relation_sizes(conn) -> Dict[str, int]:
+    sizes = {"table_bytes": conn.execute(text("SELECT pg_total_relation_size('documents')")).scalar()}
+    for name in (ANN_INDEX_NAME, BITS_INDEX_NAME):
+        sizes[f"{name}_bytes"] = conn.execute(
+            text("SELECT coalesce(pg_relation_size(to_regclass(:name)), 0)"), {"name": name}
+        ).scalar()
+    return sizes
+
+
+def compact_embeddings(
+    engine: Engine = default_engine,
+    dim: Optional[int] = None,
+    storage: Optional[str] = None,
+    binary: Optional[bool] = None
+) -> Dict[str, Dict[str, int]]:
+    """Convert documents.embedding to the configured dimension and storage type.
+
+    Truncation keeps the leading `dim` components (cosine distance doesn't
+    need them renormalised). With `binary` a generated embedding_bits
+    column is added, plus an HNSW Hamming index where pgvector >= 0.7
+    supports one. The ALTERs rewrite the table under an exclusive lock and
+    the ANN and Hamming indexes are built afterwards (see build_ann_index).
+    Returns relation sizes before and after.
+    """
+    dim = dim or settings.EMBEDDING_DIM
+    storage = storage or settings.EMBEDDING_STORAGE
+    binary = settings.EMBEDDING_BINARY_RESCORE if binary is None else binary
+    version = pgvector_version(engine)
+    if storage not in ("vector", "halfvec"):
+        raise ValueError(f"Unknown embedding storage: {storage}")
+    if storage == "halfvec" and version < (0, 7):
+        raise RuntimeError(
+            f"halfvec needs pgvector >= 0.7, the server has {'.'.join(map(str, version))}"
+        )
+
+    with engine.begin() as conn:
+        before = _relation_sizes(conn)
+        current_storage, current_dim = _embedding_column(conn)
+        if dim > current_dim:
+            raise ValueError(f"Can't grow embeddings from {current_dim} to {dim} dimensions")
+
+        # Both depend on the column being altered
+        conn.execute(text(f"DROP INDEX IF EXISTS {ANN_INDEX_NAME}"))
+        conn.execute(text("ALTER TABLE documents DROP COLUMN IF EXISTS embedding_bits"))
+
+        target = f"{storage}({dim})"
+        if dim < current_dim:
+            using = f"CAST((embedding::real[])[1:{dim}] AS {target})"
+        else:
+            using = f"embedding::{target}"
+        if (storage, dim) != (current_storage, current_dim):
+            conn.execute(text(f"ALTER TABLE documents ALTER COLUMN embedding TYPE {target} USING {using}"))
+
+        if binary:
+            conn.execute(text(
+                "ALTER TABLE documents ADD COLUMN embedding_bits bit({dim}) "
+                "GENERATED ALWAYS AS ({expr}) STORED".format(dim=dim, expr=binary_quantize_sql("embedding", dim))
+            ))
+
+    build_ann_index(engine)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE documents"))
+        after = _relation_sizes(conn)
+    return {"before": before, "after": after}
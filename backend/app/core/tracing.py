@@ -0,0 +1,128 @@
+"""Per-request traces: stage spans, row counts, cache results and tokens.
+
+A request id is bound for every HTTP request (see main.py) and stamped on
+each log record by RequestIdFilter. Query endpoints also start a Trace; the
+stage timers from app.core.metrics add spans to it and the metric helpers
+add row counts, cache hits/misses and token usage. Both live in
+contextvars, so tasks and threads started from the request (speculative
+rewrites, index scans) report into the same trace. Candidate scores are
+only kept for debug traces, since they are the expensive part.
+"""
+import logging
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+trace_var: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    def __init__(self, request_id: Optional[str] = None, detailed: bool = False):
+        self.request_id = request_id or new_request_id()
+        # Keep candidate scores (debug requests only)
+        self.detailed = detailed
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.cache: Dict[str, Dict[str, int]] = {}
+        self.tokens: Dict[str, Dict[str, int]] = {}
+        self.retrievals: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, start: float, seconds: float) -> None:
+        span = {
+            "stage": stage,
+            "start_ms": round((start - self.start) * 1000, 2),
+            "duration_ms": round(seconds * 1000, 2)
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def add_rows(self, query: str, rows: int) -> None:
+        with self._lock:
+            self.rows[query] = self.rows.get(query, 0) + rows
+
+    def add_cache(self, cache: str, hits: int, misses: int) -> None:
+        with self._lock:
+            counts = self.cache.setdefault(cache, {"hit": 0, "miss": 0})
+            counts["hit"] += hits
+            counts["miss"] += misses
+
+    def add_tokens(self, caller: str, prompt: int, completion: int) -> None:
+        with self._lock:
+            counts = self.tokens.setdefault(caller, {"prompt": 0, "completion": 0})
+            counts["prompt"] += prompt
+            counts["completion"] += completion
+
+    def add_retrieval(self, query: str, ranked: List[Dict[str, Any]], semantic=None, keyword=None) -> None:
+        """Candidate scores before (semantic, keyword) and after fusion (ranked).
+        Fused mode ranks inside the database, so only ranked is known there."""
+        if not self.detailed:
+            return
+        retrieval = {"query": query, "ranked": [_scores(c) for c in ranked]}
+        if semantic is not None:
+            retrieval["semantic"] = [_scores(c) for c in semantic]
+        if keyword is not None:
+            retrieval["keyword"] = [_scores(c) for c in keyword]
+        with self._lock:
+            self.retrievals.append(retrieval)
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            trace = {
+                "request_id": self.request_id,
+                "total_ms": self.elapsed_ms(),
+                "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+                "rows": dict(self.rows),
+                "cache": {k: dict(v) for k, v in self.cache.items()},
+                "tokens": {k: dict(v) for k, v in self.tokens.items()},
+            }
+            if self.detailed:
+                trace["retrievals"] = list(self.retrievals)
+        return trace
+
+
+def _scores(candidate: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: candidate[k] for k in ("id", "score", "final_score") if candidate.get(k) is not None}
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_trace() -> Optional[Trace]:
+    return trace_var.get()
+
+
+def start_trace(detailed: bool = False) -> Trace:
+    """Begin a trace for the current request (and anything it spawns)"""
+    trace = Trace(request_id_var.get(), detailed=detailed)
+    trace_var.set(trace)
+    return trace
+
+
+def finish_trace(trace: Trace, slow_ms: float, message: str = "Query trace", **fields) -> Dict[str, Any]:
+    """Log the trace if it was requested (detailed) or the request was slow
+    (slow_ms > 0), and return it as a dict"""
+    data = trace.to_dict()
+    if trace.detailed or (slow_ms > 0 and data["total_ms"] >= slow_ms):
+        logger.info(message, extra={**fields, **data})
+    return data
+
+
+class RequestIdFilter(logging.Filter):
+    """Add the current request id (when there is one) to every log record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        if request_id is not None and not hasattr(record, "request_id"):
+            record.request_id = request_id
+        return True
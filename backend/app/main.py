@@ -1,14 +1,68 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import get_settings
+from app.core.metrics import HTTP_REQUEST_SECONDS, render_metrics
+from app.core.tracing import new_request_id, request_id_var
 from app.api.api import api_router
 from app.core.init_db import init_db
+from app.core.database import async_engine
+from app.core.migrations import pgvector_version
+from app.core.logging import setup_logging
+from app.services.registry import ServiceRegistry
+from app.services.document_loader import shutdown_pdf_pool
+from app.services.jobs import IngestionQueue, build_job_store
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
+
+def _sync_vector_index(services: ServiceRegistry):
+    """Catch the in-process index up with rows written while it wasn't running"""
+    index = services.vector_index
+    if index is None:
+        return None
+
+    def log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Vector index sync failed", extra={"error": str(task.exception())})
+
+    task = asyncio.create_task(asyncio.to_thread(index.sync_from_db))
+    task.add_done_callback(log_failure)
+    return task
+
+# Initialize DB, logging, shared services and ingestion workers on startup
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    init_db()
+    version = pgvector_version()
+    if settings.EMBEDDING_BINARY_RESCORE and version < (0, 7):
+        logger.warning(
+            "EMBEDDING_BINARY_RESCORE needs pgvector >= 0.7 for its Hamming index; using plain ANN search",
+            extra={"pgvector_version": ".".join(map(str, version))}
+        )
+    app.state.services = ServiceRegistry(pgvector_version=version)
+    app.state.jobs = IngestionQueue(build_job_store(), app.state.services)
+    app.state.jobs.start()
+    # Until this finishes, "front" mode keeps serving semantic search from pgvector
+    app.state.vector_index_sync = _sync_vector_index(app.state.services)
+    try:
+        yield
+    finally:
+        await app.state.jobs.stop()
+        await app.state.services.aclose()
+        shutdown_pdf_pool()
+        await async_engine.dispose()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -20,13 +74,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from app.core.logging import setup_logging
-
-# Initialize DB and Logging on startup
-@app.on_event("startup")
-def startup_event():
-    setup_logging()
-    init_db()
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    # Reuse the caller's id (e.g. from a proxy) so logs line up across services
+    request_id = request.headers.get("x-request-id") or new_request_id()
+    request_id_var.set(request_id)
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    # Label by endpoint, not the raw path, to keep the series bounded
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        endpoint=getattr(route, "name", "unmatched"),
+        status=response.status_code
+    )
+    return response
 
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -34,3 +98,8 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.get("/")
 def root():
     return {"message": "Welcome to RAG System API"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint (this worker's metrics)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,10 +1,38 @@
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 
+class NumericRange(BaseModel):
+    gte: Optional[float] = Field(None, allow_inf_nan=False)
+    lte: Optional[float] = Field(None, allow_inf_nan=False)
+
+class MetadataFilter(BaseModel):
+    """Restrict retrieval to chunks matching every condition given"""
+    # Any of these sources (uploaded file names)
+    source: Optional[List[str]] = None
+    # doc_metadata contains these key/values, e.g. {"collection": "handbook"}
+    metadata: Optional[Dict[str, Any]] = None
+    # Numeric metadata bounds, e.g. {"page": {"gte": 3, "lte": 9}}
+    ranges: Optional[Dict[str, NumericRange]] = None
+
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 5
     optimize_query: bool = True
+    # ANN recall/latency knobs for this query (server defaults when unset)
+    probes: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    filters: Optional[MetadataFilter] = None
+    # Return a timing/candidate trace with the answer
+    debug: bool = False
+
+class BatchQueryRequest(BaseModel):
+    """Many queries sharing one set of retrieval options. Queries are
+    answered as written (no rewriting)."""
+    queries: List[str] = Field(..., min_length=1)
+    top_k: int = 5
+    probes: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    filters: Optional[MetadataFilter] = None
 
 class SourceDocument(BaseModel):
     source: str
@@ -21,8 +49,27 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[SourceDocument]
     tokens_used: int
+    cached: bool = False
+    trace: Optional[Dict[str, Any]] = None
 
 class StatsResponse(BaseModel):
     total_documents: int
     embedding_model: str
     llm_model: str
+    embedding_cache: Optional[Dict[str, Dict[str, int]]] = None
+    embedding_throughput: Optional[Dict[str, float]] = None
+    semantic_cache: Optional[Dict[str, int]] = None
+    vector_index: Optional[Dict[str, Any]] = None
+    context_packing: Optional[Dict[str, int]] = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    files: List[str]
+    progress: Dict[str, int]
+    stage: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: str
+    updated_at: str
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+DOCUMENT_COLUMNS = ("content", "embedding", "doc_metadata", "source", "content_hash")
+_COLUMN_LIST = ", ".join(DOCUMENT_COLUMNS)
+
+# COPY can't skip conflicting rows, so it fills a per-connection staging
+# table that is merged with ON CONFLICT and emptied at commit
+_CREATE_STAGING = (
+    "CREATE TEMP TABLE IF NOT EXISTS documents_staging ("
+    f"content text, embedding {settings.EMBEDDING_STORAGE}, doc_metadata jsonb, "
+    "source varchar(500), content_hash varchar(64)"
+    ") ON COMMIT DELETE ROWS"
+)
+_MERGE_STAGING = (
+    f"INSERT INTO documents ({_COLUMN_LIST}) SELECT {_COLUMN_LIST} FROM documents_staging "
+    "ON CONFLICT (source, content_hash) DO NOTHING RETURNING id, content_hash"
+)
+
+# Postgres caps a statement at 32767 bind parameters
+_MAX_INSERT_PARAMS = 32767
+
+_UPSERT_CHECKPOINT = (
+    "INSERT INTO ingestion_checkpoints (job_id, batches_committed, rows_written) "
+    "VALUES ($1, $2, $3) ON CONFLICT (job_id) DO UPDATE "
+    "SET batches_committed = EXCLUDED.batches_committed, rows_written = EXCLUDED.rows_written"
+)
+_BUMP_CORPUS_VERSION = (
+    "INSERT INTO corpus_version (id, version) VALUES (1, 1) "
+    "ON CONFLICT (id) DO UPDATE SET version = corpus_version.version + 1"
+)
+
+
+class BulkWriter:
+    """Bulk Document writer over its own asyncpg pool.
+
+    method "copy" streams rows with COPY ... FROM STDIN in binary format
+    (vectors go over the wire as packed float32, not text); "insert" sends
+    multi-row INSERT statements instead, for servers or poolers without
+    COPY support. Either way a chunk whose content_hash is already stored
+    for the same source is skipped, not duplicated. The pool registers pgvector's binary codec, which is why
+    it is kept apart from the SQLAlchemy engine: that one binds vectors as
+    text.
+    """
+
+    def __init__(self, dsn: str = None, method: str = None, batch_size: int = None):
+        self.dsn = dsn or settings.DATABASE_URL
+        self.method = method or settings.BULK_WRITE_METHOD
+        self.batch_size = batch_size or settings.BULK_WRITE_BATCH_SIZE
+        if self.method not in ("copy", "insert"):
+            raise ValueError(f"Unknown bulk write method: {self.method}")
+        self.rows_written = 0
+        self.rows_processed = 0
+        self.write_seconds = 0.0
+        self._pool: Optional[asyncpg.Pool] = None
+        self._lock = asyncio.Lock()
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            async with self._lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        self.dsn, min_size=1, max_size=settings.DB_POOL_SIZE, init=register_vector
+                    )
+        return self._pool
+
+    async def write(
+        self,
+        rows: Sequence[Tuple],
+        checkpoint: Optional[Tuple[str, int, int]] = None
+    ) -> int:
+        """Insert rows of DOCUMENT_COLUMNS in one transaction; returns how many
+        were new (the rest already existed by source and content_hash).
+
+        checkpoint is (job_id, batches_committed, rows written before this
+        call) and is upserted in the same transaction as the rows. When any
+        row is new, the shared corpus version is bumped in it too.
+        """
+        return len(await self.write_returning(rows, checkpoint))
+
+    async def write_returning(
+        self,
+        rows: Sequence[Tuple],
+        checkpoint: Optional[Tuple[str, int, int]] = None
+    ) -> List[Tuple[int, str]]:
+        """Like write, but returns (id, content_hash) of every inserted row"""
+        pool = await self._get_pool()
+        start = time.perf_counter()
+        inserted: List[Tuple[int, str]] = []
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if self.method == "copy":
+                    await conn.execute(_CREATE_STAGING)
+                for i in range(0, len(rows), self.batch_size):
+                    part = rows[i:i + self.batch_size]
+                    if self.method == "copy":
+                        await conn.copy_records_to_table(
+                            "documents_staging", records=part, columns=DOCUMENT_COLUMNS
+                        )
+                        inserted.extend(tuple(r) for r in await conn.fetch(_MERGE_STAGING))
+                        await conn.execute("TRUNCATE documents_staging")
+                    else:
+                        inserted.extend(await self._insert(conn, part))
+                if checkpoint is not None:
+                    job_id, batches_committed, rows_before = checkpoint
+                    await conn.execute(_UPSERT_CHECKPOINT, job_id, batches_committed, rows_before + len(inserted))
+                if inserted:
+                    # Last, so the row lock is held only until the commit
+                    await conn.execute(_BUMP_CORPUS_VERSION)
+        self.rows_written += len(inserted)
+        self.rows_processed += len(rows)
+        self.write_seconds += time.perf_counter() - start
+        return inserted
+
+    async def existing_keys(self, keys: Sequence[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """The subset of (source, content_hash) pairs already stored"""
+        if not keys:
+            return set()
+        pool = await self._get_pool()
+        sources, hashes = zip(*keys)
+        rows = await pool.fetch(
+            "SELECT d.source, d.content_hash FROM documents d "
+            "JOIN unnest($1::varchar[], $2::varchar[]) AS k(source, content_hash) "
+            "ON d.source = k.source AND d.content_hash = k.content_hash",
+            list(sources), list(hashes)
+        )
+        return {(r["source"], r["content_hash"]) for r in rows}
+
+    async def _insert(self, conn: asyncpg.Connection, rows: Sequence[Tuple]) -> List[Tuple[int, str]]:
+        width = len(DOCUMENT_COLUMNS)
+        per_statement = max(1, _MAX_INSERT_PARAMS // width)
+        inserted = []
+        for i in range(0, len(rows), per_statement):
+            part = rows[i:i + per_statement]
+            values = ", ".join(
+                "(" + ", ".join(f"${r * width + c + 1}" for c in range(width)) + ")"
+                for r in range(len(part))
+            )
+            inserted.extend(tuple(r) for r in await conn.fetch(
+                f"INSERT INTO documents ({_COLUMN_LIST}) VALUES {values} "
+                "ON CONFLICT (source, content_hash) DO NOTHING RETURNING id, content_hash",
+                *[value for row in part for value in row]
+            ))
+        return inserted
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rows_written": self.rows_written,
+            "rows_deduplicated": self.rows_processed - self.rows_written,
+            "write_seconds": round(self.write_seconds, 3),
+            "rows_per_sec": round(self.rows_processed / self.write_seconds, 1) if self.write_seconds else 0.0,
+        }
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+        self._pool = None
+
+
+def content_hash(content: str) -> str:
+    """Chunk identity for deduplication (matches the SQL backfill in migrations)"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def document_rows(chunks: list, embeddings: List[List[float]]) -> List[Tuple]:
+    """Chunks and their embeddings as rows in DOCUMENT_COLUMNS order"""
+    return [
+        (
+            chunk.page_content,
+            embedding,
+            json.dumps(chunk.metadata),
+            chunk.metadata.get("source", "unknown"),
+            content_hash(chunk.page_content)
+        )
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
@@ -1,27 +1,55 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from functools import lru_cache
 import tiktoken
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence, Tuple
+import numpy as np
 from langchain_core.documents import Document
 
+# Split points in priority order; any token boundary is the last resort
+SEPARATORS = ["\n\n", "\n", ". ", " "]
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-4") -> tiktoken.Encoding:
+    """Resolve a tiktoken encoding once per process"""
+    return tiktoken.encoding_for_model(model)
+
+
+@lru_cache(maxsize=None)
+def token_byte_lengths(encoding_name: str) -> np.ndarray:
+    """UTF-8 byte length of every token id, so offsets need no per-token decode"""
+    encoding = tiktoken.get_encoding(encoding_name)
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass  # unused id
+    return lengths
+
+
 class SmartChunker:
-    """Intelligent document chunking with token awareness"""
-    
-    def __init__(self, chunk_size=1000, chunk_overlap=200):
+    """Intelligent document chunking with token awareness.
+
+    Each document is encoded once. Chunks are token windows of at most
+    chunk_size tokens that end on the highest-priority separator inside
+    the window, and consecutive chunks share up to chunk_overlap tokens.
+    """
+
+    def __init__(self, chunk_size=1000, chunk_overlap=200, separators: Sequence[str] = SEPARATORS):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.encoding = tiktoken.encoding_for_model("gpt-4")
-    
+        self.separators = list(separators)
+        self.encoding = get_encoding()
+
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=self._token_length,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        
+        # tiktoken encodes a batch on its own thread pool
+        token_lists = self.encoding.encode_ordinary_batch([doc.page_content for doc in documents])
+
         chunked_docs = []
-        for doc in documents:
-            splits = splitter.split_text(doc.page_content)
+        for doc, tokens in zip(documents, token_lists):
+            splits = self.split_tokens(tokens)
             for i, chunk_content in enumerate(splits):
                 new_metadata = doc.metadata.copy()
                 new_metadata.update({
@@ -33,6 +61,90 @@ class SmartChunker:
                     metadata=new_metadata
                 ))
         return chunked_docs
-    
-    def _token_length(self, text: str) -> int:
-        return len(self.encoding.encode(text))
+
+    def split_text(self, text: str) -> List[str]:
+        return self.split_tokens(self.encoding.encode_ordinary(text))
+
+    def split_tokens(self, tokens: List[int]) -> List[str]:
+        if not tokens:
+            return []
+        text, char_at = self._decode_with_offsets(tokens)
+        levels = self._boundary_levels(text, char_at)
+        n = len(tokens)
+
+        chunks = []
+        start = 0
+        while start < n:
+            end = n if start + self.chunk_size >= n else self._best_cut(levels, start + 1, start + self.chunk_size)
+            piece = text[char_at[start]:char_at[end]].strip()
+            if piece:
+                chunks.append(piece)
+            if end >= n:
+                break
+            start = self._overlap_start(levels, start, end)
+        return chunks
+
+    def _decode_with_offsets(self, tokens: List[int]) -> Tuple[str, np.ndarray]:
+        """Text plus the char offset of every cut position 0..len(tokens).
+
+        Same offsets as Encoding.decode_with_offsets (a token starting inside
+        a multi-byte character maps to that character), computed with numpy
+        from per-token byte lengths instead of decoding token by token.
+        """
+        raw = self.encoding.decode_bytes(tokens)
+        text = raw.decode("utf-8")
+        byte_at = np.zeros(len(tokens) + 1, dtype=np.int64)
+        np.cumsum(token_byte_lengths(self.encoding.name)[tokens], out=byte_at[1:])
+        if len(raw) == len(text):
+            return text, byte_at
+        data = np.frombuffer(raw, dtype=np.uint8)
+        continuation = (data & 0xC0) == 0x80
+        chars_before = np.zeros(len(raw) + 1, dtype=np.int64)
+        np.cumsum(~continuation, out=chars_before[1:])
+        char_at = chars_before[byte_at]
+        char_at[:-1] -= continuation[byte_at[:-1]]
+        return text, char_at
+
+    def _boundary_levels(self, text: str, char_at: np.ndarray) -> np.ndarray:
+        """Priority of cutting before each token: the index of the best separator
+        touching the cut, len(separators) for a plain token boundary, or one more
+        for a cut inside a multi-byte character"""
+        plain = len(self.separators)
+        levels = np.full(len(char_at), plain, dtype=np.int8)
+        levels[1:][np.diff(char_at) == 0] = plain + 1
+        codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+        # Lowest priority first so better separators overwrite
+        for level in range(plain - 1, -1, -1):
+            sep = self.separators[level]
+            width = len(sep)
+            if width > len(codepoints):
+                continue
+            match = np.ones(len(codepoints) - width + 1, dtype=bool)
+            for k, ch in enumerate(sep):
+                match &= codepoints[k:len(codepoints) - width + 1 + k] == ord(ch)
+            starts = np.flatnonzero(match)
+            if not len(starts):
+                continue
+            # The separator may end at, start at or straddle the cut
+            j = np.searchsorted(starts, char_at - width)
+            touching = (j < len(starts)) & (starts[np.minimum(j, len(starts) - 1)] <= char_at)
+            touching &= levels <= plain
+            levels[touching] = level
+        return levels
+
+    @staticmethod
+    def _best_cut(levels: np.ndarray, lo: int, hi: int) -> int:
+        """Furthest cut in [lo, hi] among those with the best separator"""
+        window = levels[lo:hi + 1]
+        return lo + int(np.flatnonzero(window == window.min())[-1])
+
+    def _overlap_start(self, levels: np.ndarray, start: int, end: int) -> int:
+        """Start of the next chunk: back off up to chunk_overlap tokens from
+        end, snapped forward to the first separator so words stay whole"""
+        lo = end - self.chunk_overlap
+        if lo <= start:
+            # The chunk ended early on a strong separator; don't repeat it
+            return end
+        at_separator = np.flatnonzero(levels[lo:end] < len(self.separators))
+        return lo + int(at_separator[0]) if len(at_separator) else lo
@@ -0,0 +1,200 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.services.chunker import get_encoding
+
+settings = get_settings()
+
+# Shortest shared text treated as chunk overlap rather than coincidence
+MIN_OVERLAP_CHARS = 32
+
+# (source, page, chunk_id): chunk ids restart on every page of a PDF
+ChunkKey = Tuple[str, Any, int]
+
+
+@dataclass
+class PackedContext:
+    """Context blocks for the prompt, best first, and what packing saved"""
+    docs: List[Dict[str, Any]]
+    tokens: int = 0
+    # Tokens the unpacked context (every chunk, verbatim) would have used
+    tokens_unpacked: int = 0
+    chunks_merged: int = 0
+    chunks_dropped: int = 0
+    stats: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_unpacked - self.tokens
+
+
+def overlap_length(prev: str, cur: str) -> int:
+    """Length of the longest suffix of prev that cur starts with, if at least
+    MIN_OVERLAP_CHARS long (SmartChunker overlaps are whole, stripped text)"""
+    head = cur[:MIN_OVERLAP_CHARS]
+    if len(head) < MIN_OVERLAP_CHARS:
+        return 0
+    pos = prev.find(head, max(0, len(prev) - len(cur)))
+    while pos != -1:
+        if cur.startswith(prev[pos:]):
+            return len(prev) - pos
+        pos = prev.find(head, pos + 1)
+    return 0
+
+
+class ContextPacker:
+    """Fit retrieved chunks into a token budget for the prompt.
+
+    Chunks that follow each other in a source document (same source and
+    page, consecutive chunk_id; SmartChunker numbers chunks per page) are
+    merged into one block with their shared overlap cut out. Chunks are
+    taken best score first while the packed context, counted with the
+    chunker's tiktoken encoder, stays within budget_tokens; a chunk's cost
+    is what it adds after merging, so neighbours of chosen chunks are
+    cheap. Token counts are per segment, so a merged block can be off by a
+    token at each seam.
+    """
+
+    def __init__(self, budget_tokens: Optional[int] = None):
+        self.budget_tokens = settings.CONTEXT_TOKEN_BUDGET if budget_tokens is None else budget_tokens
+        self.encoding = get_encoding()
+        # "[Doc N]" label and separators _format_context adds per block
+        self.block_overhead = len(self.encoding.encode_ordinary("[Doc 10]\n\n\n"))
+        self.packed = 0
+        self.tokens_packed = 0
+        self.tokens_saved = 0
+
+    def pack(self, docs: List[Dict[str, Any]]) -> PackedContext:
+        ranked = sorted(docs, key=_score, reverse=True)
+        tokens = [self._count(d.get('content', '')) for d in ranked]
+        keys = [_chunk_key(d) for d in ranked]
+        position = {key: i for i, key in enumerate(keys) if key is not None}
+
+        def novel_tokens(i: int, prev: int) -> int:
+            cut = overlap_length(ranked[prev].get('content', ''), ranked[i].get('content', ''))
+            return self._count(ranked[i].get('content', '')[cut:]) if cut else tokens[i]
+
+        chosen: List[int] = []
+        used = 0
+        for i in range(len(ranked)):
+            prev = next_ = None
+            if keys[i] is not None:
+                source, page, chunk_id = keys[i]
+                prev = position.get((source, page, chunk_id - 1))
+                next_ = position.get((source, page, chunk_id + 1))
+            prev = prev if prev in chosen else None
+            next_ = next_ if next_ in chosen else None
+
+            # Joining a block costs only the new text; bridging two blocks
+            # also saves one block's label
+            added = novel_tokens(i, prev) if prev is not None else tokens[i]
+            if next_ is not None:
+                added += novel_tokens(next_, i) - tokens[next_]
+            if prev is None and next_ is None:
+                added += self.block_overhead
+            elif prev is not None and next_ is not None:
+                added -= self.block_overhead
+
+            if self.budget_tokens and used + added > self.budget_tokens:
+                if chosen:
+                    continue
+                # Never send an empty context: cut the best chunk to fit,
+                # and keep it out of merges since its tail is gone
+                ranked[i] = {**ranked[i], 'content': self._truncate(
+                    ranked[i].get('content', ''), self.budget_tokens - self.block_overhead
+                )}
+                tokens[i] = self._count(ranked[i]['content'])
+                position.pop(keys[i], None)
+                keys[i] = None
+                added = tokens[i] + self.block_overhead
+            chosen.append(i)
+            used += added
+
+        blocks = self._merge([(ranked[i], keys[i]) for i in chosen])
+        unpacked = sum(tokens) + self.block_overhead * len(ranked)
+        packed = PackedContext(
+            docs=blocks,
+            tokens=used,
+            tokens_unpacked=unpacked,
+            chunks_merged=len(chosen) - len(blocks),
+            chunks_dropped=len(ranked) - len(chosen)
+        )
+        packed.stats = {
+            "context_tokens": packed.tokens,
+            "context_tokens_saved": packed.tokens_saved,
+            "chunks_merged": packed.chunks_merged,
+            "chunks_dropped": packed.chunks_dropped,
+        }
+        self.packed += 1
+        self.tokens_packed += packed.tokens
+        self.tokens_saved += packed.tokens_saved
+        return packed
+
+    def _merge(self, chosen: List[Tuple[Dict[str, Any], Optional[ChunkKey]]]) -> List[Dict[str, Any]]:
+        """Join runs of consecutive chunks; blocks are ordered by their best score"""
+        runs: List[List[Tuple[Dict[str, Any], ChunkKey]]] = []
+        # Pages may be missing (non-PDF sources), so they sort as text
+        ordered = sorted(
+            (c for c in chosen if c[1] is not None),
+            key=lambda c: (c[1][0], str(c[1][1]), c[1][2])
+        )
+        for doc, (source, page, chunk_id) in ordered:
+            if runs and runs[-1][-1][1] == (source, page, chunk_id - 1):
+                runs[-1].append((doc, (source, page, chunk_id)))
+            else:
+                runs.append([(doc, (source, page, chunk_id))])
+        runs += [[c] for c in chosen if c[1] is None]
+
+        blocks = []
+        for run in runs:
+            content = run[0][0].get('content', '')
+            for doc, _ in run[1:]:
+                text = doc.get('content', '')
+                content += text[overlap_length(content, text):]
+            best = max((doc for doc, _ in run), key=_score)
+            blocks.append({
+                **run[0][0],
+                'content': content,
+                'score': best.get('score'),
+                'final_score': best.get('final_score'),
+                'chunk_ids': [key[2] for _, key in run] if len(run) > 1 else None,
+            })
+        return sorted(blocks, key=_score, reverse=True)
+
+    def _count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text)) if text else 0
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        return self.encoding.decode(self.encoding.encode_ordinary(text)[:max(0, max_tokens)])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "contexts_packed": self.packed,
+            "tokens_packed": self.tokens_packed,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+def _score(doc: Dict[str, Any]) -> float:
+    score = doc.get('final_score')
+    if score is None:
+        score = doc.get('score')
+    return score if score is not None else 0.0
+
+
+def _chunk_key(doc: Dict[str, Any]) -> Optional[ChunkKey]:
+    """(source, page, chunk_id) when the doc came from SmartChunker, else None.
+    page is None for sources that aren't split into pages"""
+    meta = doc.get('metadata') or {}
+    if isinstance(meta, str):
+        try:
+            meta = json.loads(meta)
+        except ValueError:
+            meta = {}
+    source = doc.get('source') or meta.get('source')
+    chunk_id = meta.get('chunk_id')
+    if source is None or not isinstance(chunk_id, int):
+        return None
+    return source, meta.get('page'), chunk_id
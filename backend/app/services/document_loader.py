@@ -1,19 +1,183 @@
 import os
 import tempfile
 import shutil
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
 from fastapi import UploadFile, HTTPException
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pypdf import PdfReader
+from app.core.config import get_settings
+
+settings = get_settings()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def pdf_pool_size() -> int:
+    return settings.PDF_PARSE_WORKERS or os.cpu_count() or 1
+
+
+def get_pdf_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared process pool for PDF text extraction, or None when parsing in-process"""
+    global _pool
+    if pdf_pool_size() <= 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that holds DB pools and threads is unsafe
+                _pool = ProcessPoolExecutor(
+                    max_workers=pdf_pool_size(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _pool
+
+
+def shutdown_pdf_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def _pdf_metadata(reader: PdfReader, file_path: str) -> Dict[str, Any]:
+    # Same document-level metadata PyPDFLoader attaches to every page
+    raw = {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+    raw.update(reader.metadata or {})
+    metadata = {}
+    for key, value in raw.items():
+        key = key.lstrip("/").lower()
+        value = value if isinstance(value, (str, int)) else str(value)
+        if key in ("creationdate", "moddate"):
+            try:
+                value = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                pass
+        metadata[key] = value.strip() if isinstance(value, str) else value
+    metadata["source"] = file_path
+    metadata["total_pages"] = len(reader.pages)
+    return metadata
+
+
+def extract_pdf_pages(file_path: str, start: int, stop: int) -> List[Document]:
+    """Extract pages [start, stop) as one Document per page.
+
+    Top-level so it can run in a pool worker; every range reopens the file.
+    """
+    reader = PdfReader(file_path)
+    base = _pdf_metadata(reader, file_path)
+    labels = reader.page_labels
+    return [
+        Document(
+            page_content=reader.pages[i].extract_text().strip(),
+            metadata={**base, "page": i, "page_label": labels[i]}
+        )
+        for i in range(start, min(stop, len(reader.pages)))
+    ]
+
+
+def page_ranges(total_pages: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    return [
+        (start, min(start + pages_per_task, total_pages))
+        for start in range(0, total_pages, pages_per_task)
+    ]
+
 
 class DocumentLoader:
     """Wrapper for document loading"""
-    
+
+    def __init__(
+        self,
+        pool: Optional[ProcessPoolExecutor] = None,
+        pages_per_task: int = None,
+        pool_size: int = None,
+        text_block_chars: int = None
+    ):
+        self._pool = pool
+        self.pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+        self.text_block_chars = text_block_chars or settings.TEXT_BLOCK_CHARS
+        # Workers in the pool; bounds how many page ranges are in flight
+        self.pool_size = pool_size or pdf_pool_size()
+
+    @property
+    def pool(self) -> Optional[ProcessPoolExecutor]:
+        return self._pool or get_pdf_pool()
+
     def load_pdf(self, file_path: str) -> List[Document]:
-        loader = PyPDFLoader(file_path)
-        return loader.load()
+        return [page for _, pages in self.iter_pages([file_path]) for page in pages]
+
+    def iter_pages(self, file_paths: List[str]) -> Iterator[Tuple[int, List[Document]]]:
+        """Yield (file index, pages) batches in file order and page order.
+
+        PDFs are split into page ranges that run on the pool; only a small
+        window of ranges is in flight, across files, so memory stays bounded
+        while large and small files still share the cores. Other files are
+        read in blocks (see iter_text) that share the same window.
+        """
+        pool = self.pool
+        if pool is None:
+            for i, path in enumerate(file_paths):
+                if not path.lower().endswith(".pdf"):
+                    for block in self.iter_text(path):
+                        yield i, block
+                    continue
+                for start, stop in page_ranges(len(PdfReader(path).pages), self.pages_per_task):
+                    yield i, extract_pdf_pages(path, start, stop)
+            return
+
+        def submit() -> Iterator[Tuple[int, Future]]:
+            for i, path in enumerate(file_paths):
+                if not path.lower().endswith(".pdf"):
+                    for block in self.iter_text(path):
+                        done = Future()
+                        done.set_result(block)
+                        yield i, done
+                    continue
+                for start, stop in page_ranges(len(PdfReader(path).pages), self.pages_per_task):
+                    yield i, pool.submit(extract_pdf_pages, path, start, stop)
+
+        window = 2 * self.pool_size
+        pending = deque()
+        for item in submit():
+            pending.append(item)
+            if len(pending) > window:
+                index, future = pending.popleft()
+                yield index, future.result()
+        while pending:
+            index, future = pending.popleft()
+            yield index, future.result()
 
     def load_text(self, file_path: str) -> List[Document]:
-        loader = TextLoader(file_path)
-        return loader.load()
+        return [block for pages in self.iter_text(file_path) for block in pages]
+
+    def iter_text(self, file_path: str) -> Iterator[List[Document]]:
+        """Yield a text file as one Document per block of about
+        text_block_chars characters, so a large file is never read whole.
+
+        Blocks end after the last paragraph (or line) break they contain;
+        the rest is carried into the next block, so chunks are only split
+        across blocks inside a single overlong line.
+        """
+        carry, block_no = "", 0
+        with open(file_path) as f:
+            while True:
+                data = f.read(self.text_block_chars)
+                text = carry + data
+                if not text:
+                    return
+                if data:
+                    cut = text.rfind("\n\n") + 2
+                    if cut < 2:
+                        cut = text.rfind("\n") + 1 or len(text)
+                else:
+                    cut = len(text)
+                text, carry = text[:cut], text[cut:]
+                yield [Document(page_content=text, metadata={"source": file_path, "block": block_no})]
+                block_no += 1
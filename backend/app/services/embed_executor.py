@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+import httpx
+import openai
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+EmbedBatch = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` tokens a minute, holding at most `capacity`.
+
+    acquire() reserves tokens before it sleeps, so concurrent callers queue
+    up behind each other instead of waking together. It never awaits between
+    reading and updating the bucket, which keeps it safe without a lock and
+    usable from any event loop. A rate of 0 means unlimited.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(rate_per_minute / 60.0, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, n: float = 1.0) -> float:
+        """Take n tokens and return how long to wait until they are covered"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        # A request bigger than the bucket is charged in full and goes
+        # through once its excess has refilled, so the long-run rate holds
+        self._tokens -= n
+        return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self, n: float = 1.0) -> float:
+        wait = self.reserve(n)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limits (429), server errors (5xx) and dropped connections"""
+    # Client libraries wrap transport failures in their own types, which
+    # don't derive from ConnectionError (TimeoutException covers ReadTimeout)
+    if isinstance(exc, (
+        asyncio.TimeoutError, ConnectionError,
+        httpx.ConnectError, httpx.TimeoutException, openai.APIConnectionError
+    )):
+        return True
+    # google.api_core exceptions carry the HTTP status in .code, openai/httpx in .status_code
+    for attr in ("status_code", "code"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int):
+            return status == 429 or 500 <= status < 600
+    return False
+
+
+class EmbeddingExecutor:
+    """Runs embedding batches concurrently under request and text rate limits.
+
+    Up to `concurrency` batches are in flight at once; each one waits on the
+    requests/min and texts/min buckets before it is sent and is retried with
+    exponential backoff and full jitter when the provider answers 429/5xx.
+    Results come back in input order whatever order the batches finish in.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = None,
+        requests_per_minute: float = None,
+        texts_per_minute: float = None,
+        retries: int = None,
+        backoff: float = None,
+        max_backoff: float = 30.0
+    ):
+        self.concurrency = max(1, concurrency or settings.EMBED_CONCURRENCY)
+        self.retries = settings.EMBED_RETRIES if retries is None else retries
+        self.backoff = settings.EMBED_RETRY_BACKOFF if backoff is None else backoff
+        self.max_backoff = max_backoff
+        rpm = settings.EMBED_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+        tpm = settings.EMBED_TEXTS_PER_MINUTE if texts_per_minute is None else texts_per_minute
+        self.request_bucket = TokenBucket(rpm)
+        self.text_bucket = TokenBucket(tpm)
+
+        self.requests = 0
+        self.texts = 0
+        self.retried = 0
+        self.failures = 0
+        self.throttled_seconds = 0.0
+        self.busy_seconds = 0.0
+
+    async def _run_batch(self, embed: EmbedBatch, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            self.throttled_seconds += await self.request_bucket.acquire()
+            self.throttled_seconds += await self.text_bucket.acquire(len(batch))
+            self.requests += 1
+            try:
+                vectors = await embed(batch)
+            except Exception as e:
+                if attempt >= self.retries or not is_retryable(e):
+                    self.failures += 1
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                attempt += 1
+                self.retried += 1
+                logger.warning(
+                    "Embedding batch failed, retrying",
+                    extra={"attempt": attempt, "texts": len(batch), "delay": round(delay, 3), "error": str(e)}
+                )
+                await asyncio.sleep(delay)
+                continue
+            if len(vectors) != len(batch):
+                self.failures += 1
+                raise ValueError(f"Provider returned {len(vectors)} embeddings for {len(batch)} texts")
+            self.texts += len(batch)
+            return vectors
+
+    async def run(self, embed: EmbedBatch, texts: Sequence[str], batch_size: int) -> List[List[float]]:
+        """Embed texts in batches of batch_size; the first batch that
+        exhausts its retries cancels the rest and its error is raised."""
+        batches = [list(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        if not batches:
+            return []
+        # Created per call so the executor isn't tied to one event loop
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(batch):
+            async with semaphore:
+                return await self._run_batch(embed, batch)
+
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(bounded(b)) for b in batches]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            self.busy_seconds += time.perf_counter() - start
+        return [vector for batch in results for vector in batch]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "texts_embedded": self.texts,
+            "retries": self.retried,
+            "failures": self.failures,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+            "texts_per_sec": round(self.texts / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+        }
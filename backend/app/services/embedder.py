@@ -1,74 +1,136 @@
-import google.generativeai as genai
+import asyncio
+import logging
+import numpy as np
 from typing import List, Dict
 from app.core.config import get_settings
+from app.core.metrics import record_cache_lookup, timed
+from app.services.embed_executor import EmbeddingExecutor
+from app.services.embedding_cache import EmbeddingCache, build_embedding_cache, make_cache_key
+from app.services.providers import EmbeddingProvider, build_embedding_provider
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
 class EmbeddingService:
-    """Generate embeddings using Google Gemini API"""
+    """Generate embeddings through the configured provider (Gemini by default)"""
     
-    def __init__(self):
-        # Configure Gemini
-        if not settings.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is not set in configuration")
-            
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = settings.EMBEDDING_MODEL
-        self.cache: Dict[str, List[float]] = {}
+    def __init__(
+        self,
+        cache: EmbeddingCache = None,
+        executor: EmbeddingExecutor = None,
+        provider: EmbeddingProvider = None
+    ):
+        self.provider = provider or build_embedding_provider()
+        self.model = self.provider.model
+        self.dim = settings.EMBEDDING_DIM
+        # Keyed by (model, task_type, text hash); see embedding_cache.py
+        self.cache = cache or build_embedding_cache()
+        # Concurrency, rate limits and retries for document batches
+        self.executor = executor or EmbeddingExecutor()
+    
+    def _fit(self, vector: List[float]) -> List[float]:
+        """Truncate to the stored dimension, keeping the leading components.
+
+        The cache holds full-size vectors, so changing EMBEDDING_DIM never
+        serves stale shapes.
+        """
+        if len(vector) == self.dim:
+            return vector
+        if len(vector) < self.dim:
+            raise ValueError(f"Embedding has {len(vector)} dimensions, EMBEDDING_DIM is {self.dim}")
+        head = np.asarray(vector[:self.dim], dtype=np.float32)
+        norm = np.linalg.norm(head)
+        return (head / norm if norm else head).tolist()
+    
+    def _key(self, text: str, task_type: str) -> str:
+        return make_cache_key(self.model, task_type, text)
+    
+    async def _alookup(self, texts: List[str], task_type: str):
+        """Split texts into cache hits and the unique texts still to embed"""
+        keys = [self._key(t, task_type) for t in texts]
+        cached = await self.cache.aget_many(keys)
+        hits = sum(k in cached for k in keys)
+        record_cache_lookup("embedding", hits=hits, misses=len(keys) - hits)
+        uncached = list(dict.fromkeys(
+            t for t, k in zip(texts, keys) if k not in cached
+        ))
+        return keys, cached, uncached
+    
+    async def _astore(self, texts: List[str], vectors: List[List[float]], task_type: str, cached: Dict[str, List[float]]):
+        fresh = {
+            self._key(text, task_type): vec
+            for text, vec in zip(texts, vectors)
+        }
+        await self.cache.aset_many(fresh)
+        cached.update(fresh)
     
     def embed_texts(self, texts: List[str], batch_size: int = 20) -> List[List[float]]: # Batch size limited for Gemini
-        embeddings = []
+        """Blocking wrapper around aembed_texts, for scripts only.
+
+        It runs its own event loop, so it can't be called from code already
+        inside one (request handlers, ingestion jobs); await aembed_texts there.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aembed_texts(texts, batch_size))
+        raise RuntimeError("embed_texts() is for scripts; await aembed_texts() inside an event loop")
+    
+    async def aembed_texts(self, texts: List[str], batch_size: int = 20) -> List[List[float]]:
+        """Embed texts for storage, in input order.
+
+        Only texts missing from the cache are sent; their batches run
+        concurrently through the executor, which rate-limits and retries them.
+        """
+        keys, cached, uncached = await self._alookup(texts, "retrieval_document")
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            
-            # Check cache
-            uncached = [t for t in batch if t not in self.cache]
-            
-            if uncached:
-                try:
-                    # Gemini embedding call
-                    # Task types: 'retrieval_document' (for corpus), 'retrieval_query' (for queries)
-                    # We default to 'retrieval_document' for bulk storage
-                    result = genai.embed_content(
-                        model=self.model,
-                        content=uncached,
-                        task_type="retrieval_document",
-                        title="RAG Document" # Required for retrieval_document
-                    )
-                    
-                    # Result is dict with 'embedding' key which is a list (if single) or list of lists
-                    # embed_content returns dict: {'embedding': [values]} for single
-                    # or list of values for multiple? API behavior varies by version
-                    # Checking docs: embed_content helper returns dict with 'embedding'. 
-                    # For list input, it's 'embedding': [ [v1], [v2] ]
-                    
-                    batch_vectors = result['embedding']
-                    
-                    for j, vec in enumerate(batch_vectors):
-                        self.cache[uncached[j]] = vec
-                        
-                except Exception as e:
-                    print(f"Embedding failed: {e}")
-                    # Fallback or retry? Raising for now to be safe
-                    raise e
-            
-            # Get from cache
-            batch_embeddings = [self.cache[t] for t in batch]
-            embeddings.extend(batch_embeddings)
+        if uncached:
+            try:
+                vectors = await self.executor.run(self.provider.aembed_documents, uncached, batch_size)
+            except Exception as e:
+                logger.error("Embedding failed", extra={"texts": len(uncached), "error": str(e)})
+                raise
+            await self._astore(uncached, vectors, "retrieval_document", cached)
         
-        return embeddings
+        return [self._fit(cached[k]) for k in keys]
     
     def embed_query(self, query: str) -> List[float]:
-        if query in self.cache:
-            return self.cache[query]
+        key = self._key(query, "retrieval_query")
+        cached = self.cache.get(key)
+        record_cache_lookup("embedding", hits=cached is not None, misses=cached is None)
+        if cached is not None:
+            return self._fit(cached)
+        
+        with timed("embed_query"):
+            embedding = self.provider.embed_query(query)
+        self.cache.set_many({key: embedding})
+        return self._fit(embedding)
+    
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async variant of embed_query"""
+        key = self._key(query, "retrieval_query")
+        cached = await self.cache.aget(key)
+        record_cache_lookup("embedding", hits=cached is not None, misses=cached is None)
+        if cached is not None:
+            return self._fit(cached)
+        
+        with timed("embed_query"):
+            embedding = await self.provider.aembed_query(query)
+        await self.cache.aset_many({key: embedding})
+        return self._fit(embedding)
+    
+    async def aembed_queries(self, queries: List[str], batch_size: int = 100) -> List[List[float]]:
+        """Embed many queries, in input order, with one provider call per
+        batch_size uncached queries (Gemini accepts up to 100 per request)"""
+        keys, cached, uncached = await self._alookup(queries, "retrieval_query")
         
-        result = genai.embed_content(
-            model=self.model,
-            content=query,
-            task_type="retrieval_query"
-        )
+        if uncached:
+            try:
+                with timed("embed_queries"):
+                    vectors = await self.executor.run(self.provider.aembed_queries, uncached, batch_size)
+            except Exception as e:
+                logger.error("Query embedding failed", extra={"queries": len(uncached), "error": str(e)})
+                raise
+            await self._astore(uncached, vectors, "retrieval_query", cached)
         
-        embedding = result['embedding']
-        self.cache[query] = embedding
-        return embedding
+        return [self._fit(cached[k]) for k in keys]
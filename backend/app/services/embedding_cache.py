@@ -0,0 +1,308 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(model: str, task_type: str, text: str) -> str:
+    """Key embeddings by model and task so query/document vectors never mix"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{task_type}:{digest}"
+
+
+def _to_bytes(vector: Sequence[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _from_bytes(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype=np.float32).tolist()
+
+
+class CacheTier:
+    """A single storage layer of the embedding cache.
+
+    Tiers that do disk or network I/O set blocking, and their async
+    variants run in a worker thread so the event loop keeps serving.
+    """
+
+    name = "base"
+    blocking = False
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        raise NotImplementedError
+
+    async def aget_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if self.blocking:
+            return await asyncio.to_thread(self.get_many, keys)
+        return self.get_many(keys)
+
+    async def aset_many(self, items: Dict[str, List[float]]) -> None:
+        if self.blocking:
+            await asyncio.to_thread(self.set_many, items)
+        else:
+            self.set_many(items)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class MemoryCacheTier(CacheTier):
+    """Size-bounded LRU held in process memory"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000):
+        super().__init__()
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vec = self._data.get(key)
+                if vec is None:
+                    self.misses += 1
+                    continue
+                self._data.move_to_end(key)
+                self.hits += 1
+                found[key] = vec
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for key, vec in items.items():
+                self._data[key] = vec
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCacheTier(CacheTier):
+    """Persistent on-disk tier storing float32 blobs in a SQLite file.
+
+    Reads don't write: hit keys are queued and their accessed_at (the LRU
+    order for eviction) is updated with the next write, or once touch_batch
+    keys are waiting. The row count is read once at open and then kept up
+    to date by this process's writes, so writes never count the table
+    (other processes sharing the file can make it drift; it only decides
+    when to evict).
+    """
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 1_000_000, touch_batch: int = 256):
+        super().__init__()
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self._touched: set = set()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+            "accessed_at REAL NOT NULL DEFAULT (julianday('now')))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_accessed_idx ON embeddings (accessed_at)"
+        )
+        self._conn.commit()
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            self._touched.update(key for key, _ in rows)
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+                self._conn.commit()
+            # Counted under the lock: async reads call this from worker threads
+            self.hits += len(rows)
+            self.misses += len(keys) - len(rows)
+        return {key: _from_bytes(blob) for key, blob in rows}
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        keys = list(items)
+        with self._lock:
+            self._flush_touched()
+            # Primary-key lookups: only keys not stored yet grow the table
+            (replaced,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM embeddings WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchone()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, _to_bytes(vec)) for key, vec in items.items()],
+            )
+            self._count += len(keys) - replaced
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                # Drop least recently used rows
+                evicted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+                self._count -= evicted
+                self.evictions += evicted
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        """Stamp queued hits as just accessed (caller holds the lock and commits)"""
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET accessed_at = julianday('now') WHERE key = ?",
+            [(key,) for key in self._touched],
+        )
+        self._touched.clear()
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+
+class RedisCacheTier(CacheTier):
+    """Shared tier in Redis so every worker (and restarts) reuse vectors"""
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, host: str, port: int, ttl_seconds: int = 0, prefix: str = "emb:"):
+        super().__init__()
+        import redis
+
+        self._client = redis.Redis(host=host, port=port)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+        try:
+            blobs = self._client.mget([self.prefix + k for k in keys])
+        except Exception as e:
+            # A cache outage should only cost us the lookup
+            logger.warning("Redis embedding cache read failed", extra={"error": str(e)})
+            self.misses += len(keys)
+            return {}
+        found = {k: _from_bytes(b) for k, b in zip(keys, blobs) if b is not None}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key, vec in items.items():
+                pipe.set(self.prefix + key, _to_bytes(vec), ex=self.ttl_seconds or None)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Redis embedding cache write failed", extra={"error": str(e)})
+
+
+class EmbeddingCache:
+    """Read-through chain of cache tiers, fastest first.
+
+    Hits in a slower tier are promoted into the faster tiers above it.
+    """
+
+    def __init__(self, tiers: List[CacheTier]):
+        self.tiers = tiers
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        missing = list(dict.fromkeys(keys))
+        for depth, tier in enumerate(self.tiers):
+            if not missing:
+                break
+            tier_hits = tier.get_many(missing)
+            if tier_hits:
+                for upper in self.tiers[:depth]:
+                    upper.set_many(tier_hits)
+                found.update(tier_hits)
+                missing = [k for k in missing if k not in tier_hits]
+        return found
+
+    def get(self, key: str) -> Optional[List[float]]:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: Dict[str, List[float]]) -> None:
+        for tier in self.tiers:
+            tier.set_many(items)
+
+    async def aget_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """get_many for the event loop: disk and Redis tiers run in a thread"""
+        found: Dict[str, List[float]] = {}
+        missing = list(dict.fromkeys(keys))
+        for depth, tier in enumerate(self.tiers):
+            if not missing:
+                break
+            tier_hits = await tier.aget_many(missing)
+            if tier_hits:
+                for upper in self.tiers[:depth]:
+                    await upper.aset_many(tier_hits)
+                found.update(tier_hits)
+                missing = [k for k in missing if k not in tier_hits]
+        return found
+
+    async def aget(self, key: str) -> Optional[List[float]]:
+        return (await self.aget_many([key])).get(key)
+
+    async def aset_many(self, items: Dict[str, List[float]]) -> None:
+        for tier in self.tiers:
+            await tier.aset_many(items)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {tier.name: tier.stats() for tier in self.tiers}
+
+
+def build_embedding_cache() -> EmbeddingCache:
+    """Assemble the cache tiers enabled in settings"""
+    settings = get_settings()
+    tiers: List[CacheTier] = [MemoryCacheTier(settings.EMBEDDING_CACHE_SIZE)]
+    if settings.EMBEDDING_CACHE_PATH:
+        tiers.append(SQLiteCacheTier(settings.EMBEDDING_CACHE_PATH))
+    if settings.EMBEDDING_CACHE_REDIS:
+        tiers.append(
+            RedisCacheTier(
+                settings.REDIS_HOST,
+                settings.REDIS_PORT,
+                ttl_seconds=settings.EMBEDDING_CACHE_TTL,
+            )
+        )
+    return EmbeddingCache(tiers)
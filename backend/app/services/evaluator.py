@@ -2,6 +2,7 @@ from typing import List, Dict, Any, Union
 import numpy as np
 from openai import OpenAI
 from app.core.config import get_settings
+from app.services.providers import llm_client_kwargs
 
 class RAGEvaluator:
     """Evaluate RAG system performance using OpenRouter (LLM-as-a-Judge)"""
@@ -9,14 +10,7 @@ class RAGEvaluator:
     def __init__(self):
         self.settings = get_settings()
         
-        api_key = self.settings.OPENROUTER_API_KEY
-        if not api_key:
-            print("Warning: OPENROUTER_API_KEY not set")
-            
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
-        )
+        self.client = OpenAI(**llm_client_kwargs())
         self.model = self.settings.MODEL_NAME
 
     def evaluate_retrieval(
@@ -1,7 +1,11 @@
-from openai import OpenAI
-from typing import List, Dict, Any
+from openai import OpenAI, AsyncOpenAI
+from typing import AsyncIterator, List, Dict, Any, Optional
 from app.core.config import get_settings
+from app.core.metrics import CONTEXT_TOKENS_SAVED, observe_stage, record_llm_usage, timed
+from app.services.context_packer import ContextPacker, PackedContext
+from app.services.providers import llm_client_kwargs
 import os
+import time
 
 settings = get_settings()
 
@@ -15,23 +19,116 @@ class RAGGenerator:
     Always cite your sources by referencing [Doc X] where X is the 
     document number."""
     
-    def __init__(self):
-        # Initialize OpenAI client with OpenRouter base URL
-        api_key = settings.OPENROUTER_API_KEY
-        if not api_key:
-            print("Warning: OPENROUTER_API_KEY not set")
-            
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key,
-        )
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        async_client: Optional[AsyncOpenAI] = None,
+        packer: Optional[ContextPacker] = None
+    ):
+        # Reuse a shared (pooled) client when one is provided
+        self.client = client or OpenAI(**llm_client_kwargs())
+        self.async_client = async_client or AsyncOpenAI(**llm_client_kwargs())
         self.model = settings.MODEL_NAME
+        self.packer = packer or ContextPacker()
     
     def generate_answer(
         self,
         query: str,
         context_docs: List[Dict[str, Any]],
         temperature: float = 0.1
+    ) -> Dict[str, Any]:
+        try:
+            packed = self._pack(context_docs)
+            # Generate
+            with timed("generate"):
+                response = self.client.chat.completions.create(
+                    **self._completion_args(query, packed.docs, temperature)
+                )
+            return self._to_result(response, packed)
+        except Exception as e:
+            print(f"Generation failed: {e}")
+            return self._error_result(e)
+    
+    async def agenerate_answer(
+        self,
+        query: str,
+        context_docs: List[Dict[str, Any]],
+        temperature: float = 0.1
+    ) -> Dict[str, Any]:
+        """Async variant of generate_answer"""
+        try:
+            packed = self._pack(context_docs)
+            with timed("generate"):
+                response = await self.async_client.chat.completions.create(
+                    **self._completion_args(query, packed.docs, temperature)
+                )
+            return self._to_result(response, packed)
+        except Exception as e:
+            print(f"Generation failed: {e}")
+            return self._error_result(e)
+    
+    async def astream_answer(
+        self,
+        query: str,
+        context_docs: List[Dict[str, Any]],
+        temperature: float = 0.1
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the answer as token deltas, then a final usage/timing record.
+
+        Yields {"type": "context", "sources": [...]} with the packed context
+        first, {"type": "token", "delta": str} for each content delta and ends
+        with {"type": "usage", ...} (or {"type": "error", ...} on failure).
+        """
+        start = time.perf_counter()
+        ttft_ms = None
+        usage = None
+        packed = self._pack(context_docs)
+        yield {"type": "context", "sources": packed.docs}
+        try:
+            stream = await self.async_client.chat.completions.create(
+                **self._completion_args(query, packed.docs, temperature),
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                        observe_stage("first_token", start)
+                    yield {"type": "token", "delta": delta}
+        except Exception as e:
+            print(f"Generation failed: {e}")
+            yield {"type": "error", "error": f"Error generating answer: {str(e)}"}
+            return
+        
+        observe_stage("generate", start)
+        record_llm_usage("generator", usage)
+        yield {
+            "type": "usage",
+            "tokens_used": usage.total_tokens if usage else 0,
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "ttft_ms": round(ttft_ms, 2) if ttft_ms is not None else None,
+            "generation_ms": round((time.perf_counter() - start) * 1000, 2),
+            **packed.stats
+        }
+    
+    def _pack(self, context_docs: List[Dict[str, Any]]) -> PackedContext:
+        with timed("context_pack"):
+            packed = self.packer.pack(context_docs)
+        CONTEXT_TOKENS_SAVED.inc(packed.tokens_saved)
+        return packed
+    
+    def _completion_args(
+        self,
+        query: str,
+        context_docs: List[Dict[str, Any]],
+        temperature: float
     ) -> Dict[str, Any]:
         # Format context
         context = self._format_context(context_docs)
@@ -44,36 +141,38 @@ Question: {query}
 
 Answer:"""
         
-        try:
-            # Generate
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=temperature,
-                max_tokens=500,
-                extra_headers={
-                    "HTTP-Referer": "https://github.com/your-repo", # Recommended by OpenRouter
-                    "X-Title": "RAG System"
-                }
-            )
-            
-            answer = response.choices[0].message.content
-            
-            return {
-                "answer": answer,
-                "sources": context_docs,
-                "tokens_used": response.usage.total_tokens
-            }
-        except Exception as e:
-            print(f"Generation failed: {e}")
-            return {
-                "answer": f"Error generating answer: {str(e)}",
-                "sources": [],
-                "tokens_used": 0
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": 500,
+            "extra_headers": {
+                "HTTP-Referer": "https://github.com/your-repo", # Recommended by OpenRouter
+                "X-Title": "RAG System"
             }
+        }
+    
+    def _to_result(self, response, packed: PackedContext) -> Dict[str, Any]:
+        answer = response.choices[0].message.content
+        record_llm_usage("generator", response.usage)
+        
+        return {
+            "answer": answer,
+            "sources": packed.docs,
+            "tokens_used": response.usage.total_tokens,
+            "context": packed.stats
+        }
+    
+    def _error_result(self, e: Exception) -> Dict[str, Any]:
+        return {
+            "answer": f"Error generating answer: {str(e)}",
+            "sources": [],
+            "tokens_used": 0,
+            "error": str(e)
+        }
     
     def _format_context(self, docs: List[Dict[str, Any]]) -> str:
         formatted = []
@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal, IngestedFile, IngestionCheckpoint
+from app.services.bulk_writer import BulkWriter, content_hash, document_rows
+from app.services.chunker import SmartChunker
+from app.services.document_loader import DocumentLoader
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+ProgressCallback = Callable[..., Awaitable[None]]
+
+
+class StageError(Exception):
+    """A pipeline stage kept failing after all of its retries"""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"{stage} failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class IngestionPipeline:
+    """Streaming parse -> chunk -> embed -> write for one ingestion job.
+
+    Stages are connected by bounded queues and hand each other fixed-size
+    micro-batches of chunks, so memory stays flat however large the upload
+    is. Every batch commits on its own together with the job's checkpoint,
+    and running the same job again resumes after the last committed batch.
+    Parse, embed and write are retried with exponential backoff before the
+    job fails.
+    """
+
+    def __init__(
+        self,
+        services,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        retries: int = None,
+        backoff: float = None,
+        batch_size: int = None,
+        queue_depth: int = None,
+        writer: BulkWriter = None
+    ):
+        self.services = services
+        self.session_factory = session_factory
+        self.writer = writer or BulkWriter()
+        self.retries = settings.JOB_STAGE_RETRIES if retries is None else retries
+        self.backoff = settings.JOB_RETRY_BACKOFF if backoff is None else backoff
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.queue_depth = queue_depth or settings.INGEST_QUEUE_DEPTH
+        self.loader = DocumentLoader()
+        self.chunker = SmartChunker()
+
+    async def _stage(self, name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        for attempt in range(self.retries + 1):
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt == self.retries:
+                    raise StageError(name, e) from e
+                delay = self.backoff * (2 ** attempt)
+                logger.warning("Ingestion stage failed, retrying", extra={
+                    "stage": name, "attempt": attempt + 1, "error": str(e), "retry_in_s": delay
+                })
+                await asyncio.sleep(delay)
+
+    async def run(self, job: Dict[str, Any], report: ProgressCallback) -> Dict[str, Any]:
+        files = await self._unseen_files(job["files"])
+        skip, rows_written = await self._load_checkpoint(job["id"])
+        if skip:
+            logger.info("Resuming ingestion job", extra={"job_id": job["id"], "batches_committed": skip})
+        progress = {
+            "files_parsed": 0,
+            "files_deduplicated": len(job["files"]) - len(files),
+            "chunks_created": 0,
+            "chunks_embedded": rows_written,
+            "chunks_deduplicated": 0,
+            "rows_written": rows_written,
+            "batches_committed": skip,
+        }
+        # (source, content_hash) of chunks seen in this run; earlier uploads are checked in the DB
+        seen_keys = set()
+        chunk_queue: asyncio.Queue = asyncio.Queue(self.queue_depth)
+        embed_queue: asyncio.Queue = asyncio.Queue(self.queue_depth)
+
+        # A failing stage stops the stages upstream of it, but batches that are
+        # already downstream still get written so a retry has less to redo.
+        # Batches are cut before deduplication so a resumed run numbers them the same
+        errors: List[Exception] = []
+        write_time = {"rows": 0, "seconds": 0.0}
+        vector_index = getattr(self.services, "vector_index", None)
+
+        paths = [f["path"] for f in files]
+        parsed = {"iter": None, "items": 0}
+
+        async def next_pages():
+            # A generator that raised is finished, so a retry starts parsing
+            # over and skips the page batches that were already chunked
+            if parsed["iter"] is None:
+                parsed["iter"] = self.loader.iter_pages(paths)
+                for _ in range(parsed["items"]):
+                    await run_in_threadpool(next, parsed["iter"])
+            try:
+                item = await run_in_threadpool(next, parsed["iter"], None)
+            except Exception:
+                parsed["iter"] = None
+                raise
+            parsed["items"] += item is not None
+            return item
+
+        async def parse_and_chunk():
+            try:
+                batch, batch_no = [], 0
+                while True:
+                    item = await self._stage("parse", next_pages)
+                    if item is None:
+                        break
+                    index, pages = item
+                    progress["files_parsed"] = index  # files before this one are done
+                    # Chunking is pure CPU work on pages already read, so a
+                    # failure would only repeat; it isn't retried
+                    chunks = await run_in_threadpool(self.chunker.chunk_documents, pages)
+                    for chunk in chunks:
+                        # The loader records the spool path; keep the uploaded name instead
+                        chunk.metadata["source"] = files[index]["filename"]
+                    batch.extend(chunks)
+                    progress["chunks_created"] += len(chunks)
+                    while len(batch) >= self.batch_size:
+                        await emit(batch_no, batch[:self.batch_size])
+                        batch, batch_no = batch[self.batch_size:], batch_no + 1
+                    await report(**progress)
+                if batch:
+                    await emit(batch_no, batch)
+                progress["files_parsed"] = len(files)
+            except Exception as e:
+                errors.append(e if isinstance(e, StageError) else StageError("parse", e))
+            await chunk_queue.put(None)
+
+        async def emit(batch_no: int, chunks: list):
+            # Batches committed by an earlier run are neither embedded nor written again
+            if batch_no >= skip:
+                await chunk_queue.put((batch_no, chunks))
+
+        async def embed():
+            try:
+                while (item := await chunk_queue.get()) is not None:
+                    batch_no, batch = item
+                    chunks = await self._stage("dedupe", lambda: self._new_chunks(batch, seen_keys))
+                    progress["chunks_deduplicated"] += len(batch) - len(chunks)
+                    texts = [c.page_content for c in chunks]
+                    embeddings = (
+                        await self._stage("embed", lambda: self.services.embedder.aembed_texts(texts))
+                        if texts else []
+                    )
+                    progress["chunks_embedded"] += len(chunks)
+                    await embed_queue.put((batch_no, chunks, embeddings))
+            except Exception as e:
+                errors.append(e)
+                producer.cancel()
+            await embed_queue.put(None)
+
+        async def write():
+            try:
+                while (item := await embed_queue.get()) is not None:
+                    batch_no, chunks, embeddings = item
+                    started = time.perf_counter()
+                    rows = document_rows(chunks, embeddings)
+                    written = await self._stage("write", lambda: self.writer.write_returning(
+                        rows,
+                        # Shares the rows' transaction so it never runs ahead of them
+                        checkpoint=(job["id"], batch_no + 1, progress["rows_written"])
+                    ))
+                    inserted = len(written)
+                    if written and vector_index is not None:
+                        await self._index_rows(vector_index, rows, written)
+                    write_time["rows"] += len(chunks)
+                    write_time["seconds"] += time.perf_counter() - started
+                    # Rows another upload stored since the dedupe check are skipped too
+                    progress["chunks_deduplicated"] += len(chunks) - inserted
+                    progress["rows_written"] += inserted
+                    progress["batches_committed"] = batch_no + 1
+                    await report(**progress)
+                    # Cached answers were generated against the old corpus
+                    if inserted and self.services.semantic_cache is not None:
+                        self.services.semantic_cache.bump_corpus_version()
+            except Exception as e:
+                errors.append(e)
+                producer.cancel()
+                embedder.cancel()
+
+        producer = asyncio.create_task(parse_and_chunk())
+        embedder = asyncio.create_task(embed())
+        writer = asyncio.create_task(write())
+        await asyncio.gather(producer, embedder, writer, return_exceptions=True)
+        if errors:
+            await report(**progress)
+            raise errors[0]
+
+        await report(**progress)
+        await self._register_files(files)
+        await self._clear_checkpoint(job["id"])
+        return {
+            "documents_processed": len(files),
+            "chunks_created": progress["chunks_created"],
+            "chunks_new": progress["rows_written"],
+            "chunks_deduplicated": progress["chunks_deduplicated"],
+            "files_deduplicated": progress["files_deduplicated"],
+            "files": [f["filename"] for f in job["files"]],
+            "batches": progress["batches_committed"],
+            "resumed_from_batch": skip,
+            "write_rows_per_sec": (
+                round(write_time["rows"] / write_time["seconds"], 1) if write_time["seconds"] else None
+            )
+        }
+
+    async def _index_rows(self, vector_index, rows: list, written: list) -> None:
+        """Append committed rows to the in-process vector index"""
+        vectors = {row[4]: row[1] for row in rows}
+        try:
+            await asyncio.to_thread(
+                vector_index.append, [i for i, _ in written], [vectors[h] for _, h in written]
+            )
+        except Exception as e:
+            # The rows are committed; the next sync_from_db picks them up
+            logger.warning("Vector index append failed", extra={"rows": len(written), "error": str(e)})
+
+    async def _new_chunks(self, chunks: list, seen_keys: set) -> list:
+        """Drop chunks whose content is already stored for their source, or
+        came earlier in this run"""
+        keys = [(c.metadata.get("source", "unknown"), content_hash(c.page_content)) for c in chunks]
+        stored = await self.writer.existing_keys(list(set(keys) - seen_keys))
+        new = []
+        for chunk, key in zip(chunks, keys):
+            if key in seen_keys or key in stored:
+                continue
+            seen_keys.add(key)
+            new.append(chunk)
+        return new
+
+    async def _unseen_files(self, files: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Files of the job not ingested before (or earlier in the same upload)"""
+        hashes = [f.get("sha256") for f in files]
+        async with self.session_factory() as db:
+            known = set(await db.scalars(
+                select(IngestedFile.file_hash).where(IngestedFile.file_hash.in_([h for h in hashes if h]))
+            ))
+        unseen = []
+        for f, digest in zip(files, hashes):
+            if digest is not None and digest in known:
+                continue
+            known.add(digest)
+            unseen.append(f)
+        return unseen
+
+    async def _register_files(self, files: List[Dict[str, str]]) -> None:
+        hashed = [{"file_hash": f["sha256"], "filename": f["filename"]} for f in files if f.get("sha256")]
+        if not hashed:
+            return
+        async with self.session_factory() as db:
+            await db.execute(insert(IngestedFile).values(hashed).on_conflict_do_nothing())
+            await db.commit()
+
+    async def _load_checkpoint(self, job_id: str) -> Tuple[int, int]:
+        async with self.session_factory() as db:
+            checkpoint = await db.get(IngestionCheckpoint, job_id)
+        if checkpoint is None:
+            return 0, 0
+        return checkpoint.batches_committed, checkpoint.rows_written
+
+    async def _clear_checkpoint(self, job_id: str) -> None:
+        async with self.session_factory() as db:
+            await db.execute(delete(IngestionCheckpoint).where(IngestionCheckpoint.job_id == job_id))
+            await db.commit()
+
+
+def cleanup_spooled(job: Dict[str, Any]) -> None:
+    for f in job["files"]:
+        if os.path.exists(f["path"]):
+            os.unlink(f["path"])
@@ -0,0 +1,485 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+
+from app.core.config import get_settings
+from app.services.registry import get_services
+from app.services.bulk_writer import BulkWriter
+from app.services.ingestion import IngestionPipeline, StageError, cleanup_spooled
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore:
+    """Persistence for job records plus the FIFO queue of pending job ids"""
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def requeue(self, job: Dict[str, Any]) -> None:
+        """Save a job that should run again and put it back on the queue"""
+        raise NotImplementedError
+
+    async def dequeue(self, timeout: float) -> Optional[str]:
+        """Claim the next queued job id, waiting up to timeout seconds"""
+        raise NotImplementedError
+
+    async def stale_jobs(self, stale_before: float) -> List[Dict[str, Any]]:
+        """Claimed or running jobs whose heartbeat_at is older than stale_before
+        (their worker is gone)"""
+        raise NotImplementedError
+
+    async def reclaim(self, job: Dict[str, Any], stale_before: float) -> bool:
+        """Requeue job if it is still stale; False when another worker got to it
+        first or it has come back to life"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+def _heartbeat(job: Dict[str, Any]) -> float:
+    return job.get("heartbeat_at") or 0.0
+
+
+def _requeued(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **job,
+        "status": QUEUED,
+        "error": "Worker stopped responding; requeued",
+        "heartbeat_at": time.time(),
+        "updated_at": _now(),
+    }
+
+
+class MemoryJobStore(JobStore):
+    """In-process store; jobs are lost on restart"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def create(self, job):
+        self._jobs[job["id"]] = job
+        await self.queue.put(job["id"])
+
+    async def get(self, job_id):
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def save(self, job):
+        self._jobs[job["id"]] = dict(job)
+
+    async def requeue(self, job):
+        await self.save(job)
+        await self.queue.put(job["id"])
+
+    async def dequeue(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def stale_jobs(self, stale_before):
+        return [
+            dict(job) for job in self._jobs.values()
+            if job["status"] == RUNNING and _heartbeat(job) < stale_before
+        ]
+
+    async def reclaim(self, job, stale_before):
+        current = self._jobs.get(job["id"])
+        if current is None or current["status"] != RUNNING or _heartbeat(current) >= stale_before:
+            return False
+        await self.requeue(_requeued(current))
+        return True
+
+
+class SQLiteJobStore(JobStore):
+    """Durable single-host store for local runs"""
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, "
+            "queued_at REAL NOT NULL DEFAULT (julianday('now')))"
+        )
+        self._conn.commit()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    async def create(self, job):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO jobs (id, status, data) VALUES (?, ?, ?)",
+            (job["id"], job["status"], json.dumps(job)),
+        )
+
+    async def get(self, job_id):
+        rows = await asyncio.to_thread(self._execute, "SELECT data FROM jobs WHERE id = ?", (job_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    async def save(self, job):
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = ?, data = ? WHERE id = ?",
+            (job["status"], json.dumps(job), job["id"]),
+        )
+
+    async def requeue(self, job):
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = ?, data = ?, queued_at = julianday('now') WHERE id = ?",
+            (job["status"], json.dumps(job), job["id"]),
+        )
+
+    async def dequeue(self, timeout):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            # Claim atomically so concurrent workers never share a job; the
+            # claim starts the lease, so a crash before run_job is reclaimed too
+            rows = await asyncio.to_thread(
+                self._execute,
+                "UPDATE jobs SET status = 'running', data = json_set(data, '$.heartbeat_at', ?) WHERE id = ("
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY queued_at LIMIT 1"
+                ") RETURNING id",
+                (time.time(),),
+            )
+            if rows:
+                return rows[0][0]
+            if asyncio.get_running_loop().time() >= deadline:
+                return None
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+    async def stale_jobs(self, stale_before):
+        # The status column is 'running' from the claim on, whatever data says
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT data FROM jobs WHERE status = 'running' "
+            "AND COALESCE(json_extract(data, '$.heartbeat_at'), 0) < ?",
+            (stale_before,),
+        )
+        return [json.loads(data) for data, in rows]
+
+    async def reclaim(self, job, stale_before):
+        rows = await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = 'queued', data = ?, queued_at = julianday('now') "
+            "WHERE id = ? AND status = 'running' "
+            "AND COALESCE(json_extract(data, '$.heartbeat_at'), 0) < ? RETURNING id",
+            (json.dumps(_requeued(job)), job["id"], stale_before),
+        )
+        return bool(rows)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisJobStore(JobStore):
+    """Shared store so API processes and separate worker processes
+    (python -m app.worker) can hand jobs to each other.
+
+    BLPOP has no acknowledgement, so unfinished jobs are also kept in an
+    "active" set: a queued job that is neither on the list nor heartbeating
+    was popped by a worker that died before starting it.
+    """
+
+    def __init__(self, host: str, port: int, prefix: str = "rag:"):
+        import redis.asyncio as redis
+
+        self._client = redis.Redis(host=host, port=port)
+        self._prefix = prefix
+        self._queue = f"{prefix}jobs"
+        self._active = f"{prefix}jobs:active"
+
+    def _key(self, job_id: str) -> str:
+        return f"{self._prefix}job:{job_id}"
+
+    async def create(self, job):
+        await self.save(job)
+        await self._client.rpush(self._queue, job["id"])
+
+    async def get(self, job_id):
+        data = await self._client.get(self._key(job_id))
+        return json.loads(data) if data else None
+
+    async def save(self, job):
+        async with self._client.pipeline() as pipe:
+            pipe.set(self._key(job["id"]), json.dumps(job))
+            if job["status"] in (SUCCEEDED, FAILED):
+                pipe.srem(self._active, job["id"])
+            else:
+                pipe.sadd(self._active, job["id"])
+            await pipe.execute()
+
+    async def requeue(self, job):
+        await self.save(job)
+        await self._client.rpush(self._queue, job["id"])
+
+    async def _is_stale(self, job, stale_before) -> bool:
+        if job["status"] not in (QUEUED, RUNNING) or _heartbeat(job) >= stale_before:
+            return False
+        if job["status"] == RUNNING:
+            return True
+        # Still waiting on the list is not stale, however long it has waited
+        return await self._client.lpos(self._queue, job["id"]) is None
+
+    async def stale_jobs(self, stale_before):
+        ids = [i.decode() for i in await self._client.smembers(self._active)]
+        if not ids:
+            return []
+        jobs = [json.loads(d) for d in await self._client.mget([self._key(i) for i in ids]) if d]
+        return [job for job in jobs if await self._is_stale(job, stale_before)]
+
+    async def reclaim(self, job, stale_before):
+        from redis.exceptions import WatchError
+
+        key = self._key(job["id"])
+        async with self._client.pipeline() as pipe:
+            try:
+                # Only requeue if nobody touched the job since we looked
+                await pipe.watch(key)
+                data = await pipe.get(key)
+                current = json.loads(data) if data else None
+                if current is None or not await self._is_stale(current, stale_before):
+                    return False
+                pipe.multi()
+                pipe.set(key, json.dumps(_requeued(current)))
+                pipe.rpush(self._queue, job["id"])
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def dequeue(self, timeout):
+        item = await self._client.blpop([f"{self._prefix}jobs"], timeout=max(1, int(timeout)))
+        return item[1].decode() if item else None
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def build_job_store() -> JobStore:
+    if settings.JOB_BACKEND == "redis":
+        return RedisJobStore(settings.REDIS_HOST, settings.REDIS_PORT)
+    if settings.JOB_BACKEND == "sqlite":
+        return SQLiteJobStore(settings.JOB_SQLITE_PATH)
+    return MemoryJobStore()
+
+
+class IngestionQueue:
+    """Queue of upload jobs drained by a bounded pool of async workers"""
+
+    def __init__(self, store: JobStore, services, workers: int = None):
+        self.store = store
+        self.services = services
+        self.workers = settings.JOB_WORKERS if workers is None else workers
+        self.lease_seconds = settings.JOB_LEASE_SECONDS
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        # One bulk-write pool shared by every job this queue runs
+        self.writer = BulkWriter()
+
+    async def submit(self, files: List[Dict[str, str]], job_id: str = None) -> Dict[str, Any]:
+        """Record a new job for already-spooled files and queue it"""
+        job = {
+            "id": job_id or uuid.uuid4().hex,
+            "status": QUEUED,
+            "files": files,
+            "progress": {
+                "files_total": len(files),
+                "files_parsed": 0,
+                "files_deduplicated": 0,
+                "chunks_created": 0,
+                "chunks_embedded": 0,
+                "chunks_deduplicated": 0,
+                "rows_written": 0,
+                "batches_committed": 0,
+            },
+            "stage": None,
+            "attempts": 0,
+            "error": None,
+            "result": None,
+            "created_at": _now(),
+            "updated_at": _now(),
+            "heartbeat_at": time.time(),
+        }
+        await self.store.create(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    def is_stale(self, job: Dict[str, Any]) -> bool:
+        """Running, but its worker stopped heartbeating (e.g. the process died)"""
+        return job["status"] == RUNNING and _heartbeat(job) < time.time() - self.lease_seconds
+
+    async def retry(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Queue a failed or stale job again; it resumes after its last
+        committed batch. None if a stale job turned out to be alive."""
+        if job["status"] == RUNNING:
+            if not await self.store.reclaim(job, time.time() - self.lease_seconds):
+                return None
+            return await self.store.get(job["id"])
+        job.update(status=QUEUED, stage=None, error=None, heartbeat_at=time.time(), updated_at=_now())
+        await self.store.requeue(job)
+        return job
+
+    async def reclaim_stale(self) -> int:
+        """Requeue jobs whose worker died; returns how many were requeued"""
+        stale_before = time.time() - self.lease_seconds
+        reclaimed = 0
+        for job in await self.store.stale_jobs(stale_before):
+            if await self.store.reclaim(job, stale_before):
+                reclaimed += 1
+                logger.warning("Stale ingestion job requeued", extra={"job_id": job["id"]})
+        return reclaimed
+
+    def start(self) -> None:
+        self._stopping = False
+        if self.workers and not self._tasks:
+            self._tasks.append(asyncio.create_task(self._reclaimer(), name="ingest-reclaimer"))
+        running = sum(t.get_name().startswith("ingest-worker") for t in self._tasks)
+        for i in range(running, self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(), name=f"ingest-worker-{i}"))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.store.close()
+        await self.writer.close()
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                job_id = await self.store.dequeue(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job queue unavailable", extra={"error": str(e)})
+                await asyncio.sleep(1.0)
+                continue
+            if job_id is None:
+                continue
+            try:
+                await self.run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. the store failed while recording the outcome; the job
+                # stops heartbeating and is reclaimed once its lease runs out
+                logger.error("Ingestion worker error", extra={"job_id": job_id, "error": str(e)}, exc_info=True)
+
+    async def _reclaimer(self) -> None:
+        """Check for jobs abandoned by dead workers, at startup and then every
+        half lease"""
+        while not self._stopping:
+            try:
+                await self.reclaim_stale()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Reclaiming stale jobs failed", extra={"error": str(e)})
+            await asyncio.sleep(self.lease_seconds / 2)
+
+    async def _heartbeat(self, job: Dict[str, Any]) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            job["heartbeat_at"] = time.time()
+            try:
+                await self.store.save(job)
+            except Exception as e:
+                logger.warning("Job heartbeat failed", extra={"job_id": job["id"], "error": str(e)})
+
+    async def run_job(self, job_id: str) -> None:
+        job = await self.store.get(job_id)
+        # A job requeued twice (e.g. reclaimed while its worker recovered) is
+        # already being handled once it is no longer queued
+        if job is None or job["status"] != QUEUED:
+            return
+        job.update(status=RUNNING, attempts=job["attempts"] + 1, heartbeat_at=time.time(), updated_at=_now())
+        await self.store.save(job)
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._run(job)
+        finally:
+            heartbeat.cancel()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+
+        async def report(**progress):
+            job["progress"].update(progress)
+            job["updated_at"] = _now()
+            await self.store.save(job)
+
+        logger.info("Ingestion job started", extra={"job_id": job_id, "files": len(job["files"])})
+        try:
+            result = await IngestionPipeline(self.services, writer=self.writer).run(job, report)
+        except Exception as e:
+            job.update(
+                status=FAILED,
+                stage=e.stage if isinstance(e, StageError) else None,
+                error=str(e),
+                updated_at=_now(),
+            )
+            await self.store.save(job)
+            # Spooled files are kept so the job can be retried and resumed
+            logger.error("Ingestion job failed", extra={"job_id": job_id, "error": str(e)}, exc_info=True)
+            return
+
+        job.update(status=SUCCEEDED, result=result, updated_at=_now())
+        await self.store.save(job)
+        cleanup_spooled(job)
+        logger.info("Ingestion job finished", extra={"job_id": job_id, **result})
+
+
+# Dependency to get the app-scoped ingestion queue
+async def get_jobs(request: Request) -> IngestionQueue:
+    jobs = getattr(request.app.state, "jobs", None)
+    if jobs is None:
+        # App was started without lifespan (e.g. bare TestClient)
+        jobs = IngestionQueue(build_job_store(), await get_services(request))
+        jobs.start()
+        request.app.state.jobs = jobs
+    return jobs
@@ -0,0 +1,150 @@
+"""Embedding and completion providers, chosen by EMBEDDING_PROVIDER and LLM_PROVIDER.
+
+The "hash" embedding provider and the "stub" LLM provider need no network
+access or credentials, so the whole pipeline can be load-tested locally
+(see benchmarks/stub_llm_server.py and benchmarks/load_test.py).
+"""
+import hashlib
+import re
+from typing import Any, Dict, List
+
+import google.generativeai as genai
+import numpy as np
+
+from app.core.config import get_settings
+from app.core.metrics import EMBEDDING_REQUESTS, EMBEDDING_TEXTS
+
+settings = get_settings()
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class EmbeddingProvider:
+    """Turns texts into vectors; `model` namespaces the embedding cache"""
+
+    model = "base"
+
+    def embed_query(self, text: str) -> List[float]:
+        raise NotImplementedError
+
+    async def aembed_query(self, text: str) -> List[float]:
+        raise NotImplementedError
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """Google Gemini embeddings"""
+
+    def __init__(self, model: str = None):
+        if not settings.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY is not set in configuration")
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.model = model or settings.EMBEDDING_MODEL
+
+    def _record(self, task_type: str, texts: int):
+        EMBEDDING_REQUESTS.labels(provider="gemini", task=task_type).inc()
+        EMBEDDING_TEXTS.labels(provider="gemini", task=task_type).inc(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._record("retrieval_query", 1)
+        result = genai.embed_content(model=self.model, content=text, task_type="retrieval_query")
+        return result['embedding']
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self._record("retrieval_query", 1)
+        result = await genai.embed_content_async(
+            model=self.model, content=text, task_type="retrieval_query"
+        )
+        return result['embedding']
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        # One request for the whole list, like aembed_documents
+        self._record("retrieval_query", len(texts))
+        result = await genai.embed_content_async(
+            model=self.model, content=texts, task_type="retrieval_query"
+        )
+        return result['embedding']
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Task types: 'retrieval_document' (for corpus), 'retrieval_query' (for queries)
+        # For list input the result is {'embedding': [[v1], [v2], ...]}
+        self._record("retrieval_document", len(texts))
+        result = await genai.embed_content_async(
+            model=self.model,
+            content=texts,
+            task_type="retrieval_document",
+            title="RAG Document" # Required for retrieval_document
+        )
+        return result['embedding']
+
+
+class HashEmbeddingProvider(EmbeddingProvider):
+    """Deterministic offline embeddings for tests and benchmarks.
+
+    Each lower-cased word and word bigram is hashed (keyed by the seed) to
+    a dimension and a sign, and the counts are L2-normalised: texts sharing
+    vocabulary land close together, so retrieval still behaves sensibly.
+    Queries and documents share one space.
+    """
+
+    def __init__(self, dim: int = 768, seed: int = None):
+        self.dim = dim
+        self.seed = settings.HASH_EMBEDDING_SEED if seed is None else seed
+        self.model = f"hash-{self.dim}-seed{self.seed}"
+        self._key = str(self.seed).encode()
+
+    def _bucket(self, feature: str):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8, key=self._key).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, text: str) -> List[float]:
+        words = _TOKEN_RE.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed(text)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed(t) for t in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed(t) for t in texts]
+
+
+def build_embedding_provider() -> EmbeddingProvider:
+    if settings.EMBEDDING_PROVIDER == "gemini":
+        return GeminiEmbeddingProvider()
+    if settings.EMBEDDING_PROVIDER == "hash":
+        return HashEmbeddingProvider()
+    raise ValueError(f"Unknown embedding provider: {settings.EMBEDDING_PROVIDER}")
+
+
+def llm_client_kwargs() -> Dict[str, Any]:
+    """base_url and api_key for the OpenAI-compatible chat client"""
+    if settings.LLM_PROVIDER == "openrouter":
+        if not settings.OPENROUTER_API_KEY:
+            print("Warning: OPENROUTER_API_KEY not set")
+        return {"base_url": OPENROUTER_URL, "api_key": settings.OPENROUTER_API_KEY}
+    if settings.LLM_PROVIDER == "stub":
+        # The stand-in server ignores the key, but the client insists on one
+        return {"base_url": settings.STUB_LLM_URL, "api_key": "stub"}
+    raise ValueError(f"Unknown LLM provider: {settings.LLM_PROVIDER}")
@@ -1,8 +1,27 @@
-from openai import OpenAI
+import re
+import threading
+from collections import OrderedDict
+from openai import OpenAI, AsyncOpenAI
+from typing import Optional
 from app.core.config import get_settings
+from app.core.metrics import record_cache_lookup, record_llm_usage, timed
+from app.services.providers import llm_client_kwargs
 
 settings = get_settings()
 
+# Words that suggest a conversational question worth rewriting
+_FILLER_WORDS = {
+    "what", "how", "why", "when", "where", "who", "which", "whose",
+    "is", "are", "was", "were", "do", "does", "did", "can", "could",
+    "would", "should", "will", "i", "me", "my", "we", "you", "please",
+    "tell", "explain", "about", "the", "a", "an", "of", "to",
+}
+
+def normalize_query(query: str) -> str:
+    """Canonical form used as the rewrite cache key"""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?.! ")
+
 class QueryOptimizer:
     """Optimize queries for better retrieval using OpenRouter"""
     
@@ -11,30 +30,94 @@ class QueryOptimizer:
     Remove filler words, fix typos, and focus on keywords.
     Output ONLY the optimized query. Do not explain."""
     
-    def __init__(self):
-        # Switch to OpenRouter
-        api_key = settings.OPENROUTER_API_KEY
-        if not api_key:
-            print("Warning: OPENROUTER_API_KEY not set")
-            
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
-        )
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        async_client: Optional[AsyncOpenAI] = None
+    ):
+        # Reuse a shared (pooled) client when one is provided
+        self.client = client or OpenAI(**llm_client_kwargs())
+        self.async_client = async_client or AsyncOpenAI(**llm_client_kwargs())
         self.model = settings.MODEL_NAME
+        
+        # Bounded LRU of normalized query -> rewrite
+        self.cache_size = settings.QUERY_REWRITE_CACHE_SIZE
+        self._rewrites: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def should_rewrite(self, query: str) -> bool:
+        """Short, keyword-like queries are already good search queries"""
+        if "?" in query:
+            return True
+        words = normalize_query(query).split()
+        if len(words) > settings.QUERY_REWRITE_SKIP_MAX_WORDS:
+            return True
+        return any(w in _FILLER_WORDS for w in words)
+    
+    def peek(self, query: str) -> Optional[str]:
+        """Rewrite available without an LLM call, or None if one is needed"""
+        if not self.should_rewrite(query):
+            return query
+        rewrite = self._cached(query)
+        record_cache_lookup("query_rewrite", hits=rewrite is not None, misses=rewrite is None)
+        return rewrite
+    
+    def _cached(self, query: str) -> Optional[str]:
+        key = normalize_query(query)
+        with self._lock:
+            rewrite = self._rewrites.get(key)
+            if rewrite is not None:
+                self._rewrites.move_to_end(key)
+            return rewrite
+    
+    def _remember(self, query: str, rewrite: str):
+        with self._lock:
+            self._rewrites[normalize_query(query)] = rewrite
+            while len(self._rewrites) > self.cache_size:
+                self._rewrites.popitem(last=False)
     
     def optimize(self, query: str) -> str:
+        known = query if not self.should_rewrite(query) else self._cached(query)
+        if known is not None:
+            return known
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": query}
-                ],
-                temperature=0,
-                max_tokens=100
-            )
-            return response.choices[0].message.content.strip()
+            with timed("optimize"):
+                response = self.client.chat.completions.create(
+                    **self._completion_args(query)
+                )
+            record_llm_usage("optimizer", getattr(response, "usage", None))
+            rewrite = response.choices[0].message.content.strip()
+            self._remember(query, rewrite)
+            return rewrite
         except Exception as e:
             print(f"Query optimization failed: {e}")
             return query # Fallback as-is
+    
+    async def aoptimize(self, query: str) -> str:
+        """Async variant of optimize"""
+        known = query if not self.should_rewrite(query) else self._cached(query)
+        if known is not None:
+            return known
+        try:
+            with timed("optimize"):
+                response = await self.async_client.chat.completions.create(
+                    **self._completion_args(query)
+                )
+            record_llm_usage("optimizer", getattr(response, "usage", None))
+            rewrite = response.choices[0].message.content.strip()
+            self._remember(query, rewrite)
+            return rewrite
+        except Exception as e:
+            print(f"Query optimization failed: {e}")
+            return query # Fallback as-is
+    
+    def _completion_args(self, query: str) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            "temperature": 0,
+            "max_tokens": 100
+        }
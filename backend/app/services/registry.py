@@ -0,0 +1,156 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from fastapi import Request
+from openai import AsyncOpenAI, OpenAI
+
+from app.core.config import get_settings
+from app.services.embedder import EmbeddingService
+from app.services.generator import RAGGenerator
+from app.services.providers import llm_client_kwargs
+from app.services.query_optimizer import QueryOptimizer
+from app.services.semantic_cache import SemanticCache, build_semantic_cache
+from app.services.vector_index import MmapVectorIndex
+
+settings = get_settings()
+
+
+class ServiceRegistry:
+    """Long-lived service instances shared by every request in the app.
+
+    Services are built lazily on first use so a missing API key only fails
+    the requests that actually need that service.
+    """
+
+    def __init__(self, pgvector_version: Tuple[int, ...] = ()):
+        self._lock = threading.Lock()
+        # Looked up once at startup so the request path never queries it;
+        # () makes the retriever use SQL every pgvector version supports
+        self.pgvector_version = pgvector_version
+        self._llm_client: Optional[OpenAI] = None
+        self._async_llm_client: Optional[AsyncOpenAI] = None
+        self._embedder: Optional[EmbeddingService] = None
+        self._generator: Optional[RAGGenerator] = None
+        self._optimizer: Optional[QueryOptimizer] = None
+        self._vector_index: Optional[MmapVectorIndex] = None
+        # Cheap to build and needs no credentials, so create it up front
+        self.semantic_cache: Optional[SemanticCache] = build_semantic_cache()
+
+    @staticmethod
+    def _http_limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+        )
+
+    @property
+    def llm_client(self) -> OpenAI:
+        # One pooled client shared by the generator and the optimizer
+        if self._llm_client is None:
+            with self._lock:
+                if self._llm_client is None:
+                    self._llm_client = OpenAI(
+                        **llm_client_kwargs(),
+                        http_client=httpx.Client(
+                            limits=self._http_limits(), timeout=settings.HTTP_TIMEOUT
+                        ),
+                    )
+        return self._llm_client
+
+    @property
+    def async_llm_client(self) -> AsyncOpenAI:
+        # Async counterpart used on the request path
+        if self._async_llm_client is None:
+            with self._lock:
+                if self._async_llm_client is None:
+                    self._async_llm_client = AsyncOpenAI(
+                        **llm_client_kwargs(),
+                        http_client=httpx.AsyncClient(
+                            limits=self._http_limits(), timeout=settings.HTTP_TIMEOUT
+                        ),
+                    )
+        return self._async_llm_client
+
+    @property
+    def embedder(self) -> EmbeddingService:
+        if self._embedder is None:
+            with self._lock:
+                if self._embedder is None:
+                    self._embedder = EmbeddingService()
+        return self._embedder
+
+    def embedding_cache_stats(self) -> Optional[Dict[str, Dict[str, int]]]:
+        """Cache counters, without forcing the embedder to be built"""
+        if self._embedder is None:
+            return None
+        return self._embedder.cache.stats()
+
+    def embedding_throughput_stats(self) -> Optional[Dict[str, float]]:
+        """Cumulative embedding executor counters, if the embedder exists"""
+        if self._embedder is None:
+            return None
+        return self._embedder.executor.stats()
+
+    def context_packing_stats(self) -> Optional[Dict[str, int]]:
+        """Prompt packing counters, if the generator exists"""
+        if self._generator is None:
+            return None
+        return self._generator.packer.stats()
+
+    @property
+    def vector_index(self) -> Optional[MmapVectorIndex]:
+        """The in-process vector index; None when VECTOR_INDEX_MODE is off"""
+        if settings.VECTOR_INDEX_MODE == "off":
+            return None
+        if self._vector_index is None:
+            with self._lock:
+                if self._vector_index is None:
+                    self._vector_index = MmapVectorIndex()
+        return self._vector_index
+
+    @property
+    def generator(self) -> RAGGenerator:
+        if self._generator is None:
+            client, async_client = self.llm_client, self.async_llm_client
+            with self._lock:
+                if self._generator is None:
+                    self._generator = RAGGenerator(client=client, async_client=async_client)
+        return self._generator
+
+    @property
+    def optimizer(self) -> QueryOptimizer:
+        if self._optimizer is None:
+            client, async_client = self.llm_client, self.async_llm_client
+            with self._lock:
+                if self._optimizer is None:
+                    self._optimizer = QueryOptimizer(client=client, async_client=async_client)
+        return self._optimizer
+
+    def close(self):
+        """Release pooled connections"""
+        with self._lock:
+            if self._llm_client is not None:
+                self._llm_client.close()
+            self._llm_client = None
+            self._async_llm_client = None
+            self._embedder = None
+            self._generator = None
+            self._optimizer = None
+            self._vector_index = None
+
+    async def aclose(self):
+        """Release sync and async pooled connections (called on app shutdown)"""
+        if self._async_llm_client is not None:
+            await self._async_llm_client.close()
+        self.close()
+
+
+# Dependency to get the app-scoped service registry
+async def get_services(request: Request) -> ServiceRegistry:
+    services = getattr(request.app.state, "services", None)
+    if services is None:
+        # App was started without lifespan (e.g. bare TestClient)
+        services = ServiceRegistry()
+        request.app.state.services = services
+    return services
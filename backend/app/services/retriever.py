@@ -1,94 +1,583 @@
-from sqlalchemy import func, text
+import asyncio
+import json
+import logging
+from sqlalchemy import Float, Integer, Text, any_, case, cast, func, literal, select, true, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, JSONPATH
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from pgvector.sqlalchemy import BIT
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from app.services.embedder import EmbeddingService
-from app.core.database import Document
+from app.services.vector_index import MmapVectorIndex
+from app.core.config import get_settings
+from app.core.database import Document, AsyncSessionLocal, embedding_type
+from app.core.metrics import record_rows, timed
+from app.core.tracing import current_trace
+from app.models.rag import MetadataFilter
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
 
 class HybridRetriever:
     """Combine semantic and keyword search"""
     
-    def __init__(self, db_session: Session, embedder: EmbeddingService):
+    def __init__(
+        self,
+        db_session: Session,
+        embedder: EmbeddingService,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        vector_index: Optional[MmapVectorIndex] = None,
+        pgvector_version: Tuple[int, ...] = ()
+    ):
+        # db_session may be a sync Session (retrieve) or an AsyncSession (aretrieve)
         self.db = db_session
         self.embedder = embedder
+        # Used to open extra connections when searches run in parallel
+        self.session_factory = session_factory
+        # When set (see VECTOR_INDEX_MODE), semantic candidates come from
+        # this in-process index and only their rows are read from Postgres
+        self.vector_index = vector_index
+        # Server's pgvector version, looked up once at startup (see
+        # ServiceRegistry); () means unknown and picks SQL every version runs
+        self.pgvector_version = pgvector_version
+        # The Hamming shortlist is only fast with an HNSW bit index (>= 0.7);
+        # older servers would scan every row, so they use the plain ANN search
+        self.binary_rescore = settings.EMBEDDING_BINARY_RESCORE and pgvector_version >= (0, 7)
     
     def retrieve(
         self, 
         query: str, 
         top_k: int = 5,
-        semantic_weight: float = 0.7
+        semantic_weight: float = 0.7,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[MetadataFilter] = None
     ) -> List[Dict[str, Any]]:
+        semantic_k, keyword_k = self._pool_sizes(top_k)
         try:
             # Get query embedding
             query_emb = self.embedder.embed_query(query)
             
+            where = self._filter_clauses(filters)
+            hits = None
+            if not where:
+                with timed("index_search"):
+                    hits = self._index_hits(query_emb, semantic_k, probes)
+            knobs = self._ann_knobs_stmt(probes, ef_search, filtered=bool(where), k=semantic_k)
+            if knobs is not None and hits is None:
+                self.db.execute(knobs)
+
             # Semantic search using cosine similarity
-            semantic_results = self._semantic_search(query_emb, top_k * 2)
+            with timed("semantic_search"):
+                semantic_results = self._semantic_search(query_emb, semantic_k, hits, where)
             
             # Keyword search using PostgreSQL FTS
-            keyword_results = self._keyword_search(query, top_k * 2)
+            with timed("keyword_search"):
+                keyword_results = self._keyword_search(query, keyword_k, where)
+
+            # Combine and rerank
+            with timed("hybrid_rerank"):
+                ranked = self._hybrid_rerank(
+                    semantic_results,
+                    keyword_results,
+                    semantic_weight
+                )[:top_k]
+            self._trace_candidates(query, ranked, semantic_results, keyword_results)
+
+            with timed("hydrate"):
+                rows = self._count_rows("hydrate", self.db.execute(self._hydrate_stmt(ranked)).all())
+        except Exception:
+            logger.exception("Retrieval failed", extra={"top_k": top_k})
+            raise
+
+        return self._hydrated(ranked, rows)
+
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        semantic_weight: float = 0.7,
+        mode: Optional[str] = None,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        query_emb: Optional[List[float]] = None,
+        filters: Optional[MetadataFilter] = None
+    ) -> List[Dict[str, Any]]:
+        """Async variant of retrieve; requires an AsyncSession.
+
+        mode "fused" ranks both searches server-side in one statement,
+        "parallel" runs them concurrently on separate connections and
+        "sequential" runs them one after the other on the request session.
+        probes / ef_search trade ANN recall for latency on this query only
+        (probes is also the partition count for the in-process index).
+        Pass query_emb when the caller already embedded the query. filters
+        are applied inside both searches (the in-process index has no
+        metadata, so filtered queries always go to pgvector).
+
+        The searches only return ids and scores; content and metadata are
+        read for the final top_k afterwards (in fused mode, by the same
+        statement).
+        """
+        mode = mode or settings.RETRIEVAL_MODE
+        semantic_k, keyword_k = self._pool_sizes(top_k)
+        where = self._filter_clauses(filters)
+        knobs = self._ann_knobs_stmt(probes, ef_search, filtered=bool(where), k=semantic_k)
+        try:
+            if query_emb is None:
+                query_emb = await self.embedder.aembed_query(query)
+
+            hits = None
+            if self._use_index() and not where:
+                # NumPy releases the GIL, so the scan doesn't stall the event loop
+                with timed("index_search"):
+                    hits = await asyncio.to_thread(self._index_hits, query_emb, semantic_k, probes)
+            if hits is not None:
+                knobs = None
+
+            if knobs is not None and mode != "parallel":
+                await self.db.execute(knobs)
+
+            if mode == "fused":
+                # Searches, fusion and hydration are one statement here
+                with timed("fused_search"):
+                    rows = (await self.db.execute(self._fused_stmt(
+                        query, query_emb, semantic_k, keyword_k, top_k, semantic_weight, hits, where
+                    ))).all()
+                results = self._fused_results(self._count_rows("fused", rows))
+                self._trace_candidates(query, results)
+                return results
+
+            db: AsyncSession = self.db
+            if hits is not None:
+                # The in-process index already scored the semantic candidates
+                semantic = self._hit_candidates(hits)
+                keyword_rows = await self._timed_rows("keyword", self._all(self._keyword_stmt(query, keyword_k, where)))
+            elif mode == "parallel":
+                semantic_rows, keyword_rows = await asyncio.gather(
+                    self._timed_rows("semantic", self._run_isolated(self._semantic_stmt(query_emb, semantic_k, where), knobs)),
+                    self._timed_rows("keyword", self._run_isolated(self._keyword_stmt(query, keyword_k, where)))
+                )
+                semantic = self._candidates(semantic_rows)
+            else:
+                semantic = self._candidates(
+                    await self._timed_rows("semantic", self._all(self._semantic_stmt(query_emb, semantic_k, where)))
+                )
+                keyword_rows = await self._timed_rows("keyword", self._all(self._keyword_stmt(query, keyword_k, where)))
+
+            keyword = self._candidates(keyword_rows)
+            with timed("hybrid_rerank"):
+                ranked = self._hybrid_rerank(
+                    semantic,
+                    keyword,
+                    semantic_weight
+                )[:top_k]
+            self._trace_candidates(query, ranked, semantic, keyword)
+
+            with timed("hydrate"):
+                rows = self._count_rows("hydrate", (await db.execute(self._hydrate_stmt(ranked))).all())
+        except Exception:
+            logger.exception("Retrieval failed", extra={"top_k": top_k})
+            raise
+
+        return self._hydrated(ranked, rows)
+
+    def _pool_sizes(self, top_k: int) -> Tuple[int, int]:
+        """(semantic, keyword) candidate counts for a top_k query"""
+        return (
+            settings.SEMANTIC_CANDIDATES or top_k * 2,
+            settings.KEYWORD_CANDIDATES or top_k * 2
+        )
+
+    async def aretrieve_batch(
+        self,
+        queries: List[str],
+        query_embs: List[List[float]],
+        top_k: int = 5,
+        semantic_weight: float = 0.7,
+        probes: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[MetadataFilter] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Retrieve for many queries at once; requires an AsyncSession.
+
+        query_embs are the queries' embeddings, in the same order. Candidates
+        for every query come from one statement (see _batch_candidates_stmt),
+        then a single hydration query loads the final rows of all of them.
+        Returns one result list per query, as aretrieve would.
+        """
+        if not queries:
+            return []
+        semantic_k, keyword_k = self._pool_sizes(top_k)
+        where = self._filter_clauses(filters)
+        knobs = self._ann_knobs_stmt(probes, ef_search, filtered=bool(where), k=semantic_k)
+        try:
+            hits = None
+            if self._use_index() and not where:
+                with timed("index_search"):
+                    hits = await asyncio.to_thread(self._index_hits_many, query_embs, semantic_k, probes)
+
+            db: AsyncSession = self.db
+            if knobs is not None and hits is None:
+                await db.execute(knobs)
+
+            with timed("batch_search"):
+                rows = (await db.execute(self._batch_candidates_stmt(
+                    queries, query_embs if hits is None else None, semantic_k, keyword_k, where
+                ))).all()
+            self._count_rows("batch", rows)
+            semantic = [self._hit_candidates(h) for h in hits] if hits is not None else [[] for _ in queries]
+            keyword = [[] for _ in queries]
+            for r in rows:
+                (semantic if r.kind == "semantic" else keyword)[r.qi].append({"id": r.id, "score": r.score})
+
+            with timed("hybrid_rerank"):
+                ranked = [
+                    self._hybrid_rerank(s, k, semantic_weight)[:top_k]
+                    for s, k in zip(semantic, keyword)
+                ]
+            with timed("hydrate"):
+                rows = (await db.execute(self._hydrate_stmt([c for r in ranked for c in r]))).all()
+            self._count_rows("hydrate", rows)
+        except Exception:
+            logger.exception("Retrieval failed", extra={"top_k": top_k})
+            raise
+
+        return [self._hydrated(r, rows) for r in ranked]
+
+    def _batch_candidates_stmt(
+        self,
+        queries: List[str],
+        query_embs: Optional[List[List[float]]],
+        semantic_k: int,
+        keyword_k: int,
+        where: Sequence = ()
+    ):
+        """(qi, kind, id, score) candidates for every query in one statement.
+
+        The query texts and vectors are unnested into rows and each row
+        drives a LATERAL vector search and a LATERAL keyword search, so the
+        planner runs the usual indexed searches once per query. Vectors
+        travel as one text[] parameter cast server-side. Without query_embs
+        only the keyword searches run (the in-process index did the rest).
+        """
+        columns = [
+            func.unnest(literal(list(range(len(queries))), ARRAY(Integer))).label('qi'),
+            func.unnest(literal(queries, ARRAY(Text))).label('qtext'),
+        ]
+        if query_embs is not None:
+            dim = len(query_embs[0])
+            vectors = ["[" + ",".join(map(str, e)) + "]" for e in query_embs]
+            columns.append(func.unnest(
+                cast(literal(vectors, ARRAY(Text)), ARRAY(embedding_type(dim)))
+            ).label('qemb'))
+            if self.binary_rescore:
+                columns.append(func.unnest(
+                    cast(literal([self._query_bits(e) for e in query_embs], ARRAY(Text)), ARRAY(BIT(dim)))
+                ).label('qbits'))
+        batch = select(*columns).cte('queries')
+
+        parts = []
+        if query_embs is not None:
+            query_bits = batch.c.qbits if self.binary_rescore else None
+            nearest = self._nearest(batch.c.qemb, semantic_k, where, query_bits).lateral('semantic')
+            parts.append(select(
+                batch.c.qi, literal("semantic").label('kind'), nearest.c.id, nearest.c.score
+            ).select_from(batch.join(nearest, true())))
+        keyword = self._keyword_stmt(batch.c.qtext, keyword_k, where).lateral('keyword')
+        parts.append(select(
+            batch.c.qi, literal("keyword").label('kind'), keyword.c.id, keyword.c.score
+        ).select_from(batch.join(keyword, true())))
+        return union_all(*parts)
+
+    async def _timed_rows(self, search: str, pending):
+        """Await a search's rows, timed as the {search}_search stage"""
+        with timed(f"{search}_search"):
+            rows = await pending
+        return self._count_rows(search, rows)
+
+    async def _all(self, stmt):
+        return (await self.db.execute(stmt)).all()
+
+    def _trace_candidates(self, query: str, ranked, semantic=None, keyword=None):
+        trace = current_trace()
+        if trace is not None:
+            trace.add_retrieval(query, ranked, semantic, keyword)
+
+    def _count_rows(self, query: str, rows):
+        record_rows(query, len(rows))
+        return rows
+
+    async def _run_isolated(self, stmt, knobs=None):
+        # An AsyncSession can't run two statements at once, so each
+        # concurrent search gets its own pooled connection
+        async with self.session_factory() as session:
+            if knobs is not None:
+                await session.execute(knobs)
+            return (await session.execute(stmt)).all()
+
+    def _use_index(self) -> bool:
+        # "front" waits for the startup sync; "replace" trusts whatever is there
+        if self.vector_index is None:
+            return False
+        return settings.VECTOR_INDEX_MODE == "replace" or self.vector_index.ready
+
+    def _index_hits(
+        self,
+        query_emb: List[float],
+        k: int,
+        probes: Optional[int] = None
+    ) -> Optional[Tuple[List[int], List[float]]]:
+        """(ids, scores) from the in-process index, or None to use pgvector"""
+        hits = self._index_hits_many([query_emb], k, probes)
+        return None if hits is None else hits[0]
+
+    def _index_hits_many(
+        self,
+        query_embs: List[List[float]],
+        k: int,
+        probes: Optional[int] = None
+    ) -> Optional[List[Tuple[List[int], List[float]]]]:
+        """_index_hits for a batch of queries, searched together"""
+        if not self._use_index():
+            return None
+        try:
+            ids, scores = self.vector_index.search(query_embs, k, nprobe=probes)
         except Exception as e:
-            print(f"Retriever Error: {e}")
-            raise e
-        
-        # Combine and rerank
-        combined = self._hybrid_rerank(
-            semantic_results, 
-            keyword_results,
-            semantic_weight
+            if settings.VECTOR_INDEX_MODE == "replace":
+                raise
+            logger.warning("Vector index search failed, using pgvector", extra={"error": str(e)})
+            return None
+        # Drop the padding of queries with fewer than k candidates
+        return [
+            (row_ids[row_ids >= 0].tolist(), row_scores[row_ids >= 0].astype(float).tolist())
+            for row_ids, row_scores in zip(ids, scores)
+        ]
+
+    def _hits_select(self, hits: Tuple[List[int], List[float]]):
+        # Index candidates as an (id, score) relation; the unnests zip row by row
+        ids, scores = hits
+        return select(
+            func.unnest(literal(ids, ARRAY(Integer))).label('id'),
+            func.unnest(literal(scores, ARRAY(Float))).label('score')
         )
-        
-        return combined[:top_k]
-    
-    def _semantic_search(self, query_emb: List[float], k: int) -> List[Dict[str, Any]]:
-        # Using pgvector cosine distance operator
-        results = self.db.query(
+
+    def _ann_knobs_stmt(
+        self,
+        probes: Optional[int],
+        ef_search: Optional[int],
+        filtered: bool = False,
+        k: int = 0
+    ):
+        """Transaction-local ANN search settings, or None to keep server defaults.
+
+        The index returns its ef_search / probes-limited candidates before a
+        filter is applied, so a selective filter can leave fewer than k rows.
+        Filtered queries turn on iterative scans where pgvector has them
+        (>= 0.8) and otherwise search FILTERED_SEARCH_FACTOR times wider.
+        With binary rescoring, ef_search also covers the k * BINARY_RESCORE_FACTOR
+        shortlist, which an HNSW scan would otherwise cut at ef_search rows.
+        """
+        knobs = {
+            'ivfflat.probes': probes or settings.IVFFLAT_PROBES,
+            'hnsw.ef_search': ef_search or settings.HNSW_EF_SEARCH,
+        }
+        if filtered and self.pgvector_version >= (0, 8):
+            if settings.ANN_ITERATIVE_SCAN != "off":
+                knobs['hnsw.iterative_scan'] = settings.ANN_ITERATIVE_SCAN
+                knobs['ivfflat.iterative_scan'] = "relaxed_order"
+        elif filtered:
+            # Server defaults: ivfflat.probes = 1, hnsw.ef_search = 40
+            knobs['ivfflat.probes'] = (knobs['ivfflat.probes'] or 1) * settings.FILTERED_SEARCH_FACTOR
+            knobs['hnsw.ef_search'] = min(1000, (knobs['hnsw.ef_search'] or 40) * settings.FILTERED_SEARCH_FACTOR)
+        if self.binary_rescore and k:
+            shortlist = k * settings.BINARY_RESCORE_FACTOR
+            knobs['hnsw.ef_search'] = min(1000, max(knobs['hnsw.ef_search'] or 40, shortlist))
+        calls = [
+            func.set_config(name, value if isinstance(value, str) else str(int(value)), True)
+            for name, value in knobs.items() if value
+        ]
+        return select(*calls) if calls else None
+
+    def _filter_clauses(self, filters: Optional[MetadataFilter]) -> list:
+        """WHERE clauses for a MetadataFilter, shaped for the source B-tree and
+        the doc_metadata GIN (jsonb_path_ops) indexes; empty when unfiltered"""
+        if filters is None:
+            return []
+        clauses = []
+        if filters.source:
+            clauses.append(Document.source.in_(filters.source))
+        if filters.metadata:
+            clauses.append(Document.doc_metadata.contains(filters.metadata))
+        for key, bounds in (filters.ranges or {}).items():
+            conditions = [
+                f"@ {op} {value!r}" for op, value in ((">=", bounds.gte), ("<=", bounds.lte))
+                if value is not None
+            ]
+            if conditions:
+                # jsonpath comparisons skip non-numeric values instead of
+                # failing the query the way a ::numeric cast would
+                path = f"$.{json.dumps(key)} ? ({' && '.join(conditions)})"
+                clauses.append(Document.doc_metadata.op('@?')(cast(literal(path), JSONPATH)))
+        return clauses
+
+    def _fused_stmt(
+        self,
+        query: str,
+        query_emb: List[float],
+        semantic_k: int,
+        keyword_k: int,
+        top_k: int,
+        weight: float,
+        hits: Optional[Tuple[List[int], List[float]]] = None,
+        where: Sequence = ()
+    ):
+        """Both searches as CTEs, fused and ranked in a single round trip.
+
+        Mirrors _hybrid_rerank: a row's score is its semantic similarity when
+        it has one, otherwise its normalized keyword score. With index hits
+        the semantic CTE is just those candidates.
+        """
+        if hits is not None:
+            semantic = self._hits_select(hits).cte('semantic')
+        else:
+            semantic = self._nearest(query_emb, semantic_k, where).cte('semantic')
+        keyword = self._keyword_stmt(query, keyword_k, where).cte('keyword')
+
+        final_score = (
+            func.coalesce(semantic.c.score * weight, 0)
+            + func.coalesce(keyword.c.score * (1 - weight), 0)
+        )
+        fused = select(
+            func.coalesce(semantic.c.id, keyword.c.id).label('id'),
+            func.coalesce(semantic.c.score, keyword.c.score).label('score'),
+            final_score.label('final_score')
+        ).select_from(
+            semantic.join(keyword, semantic.c.id == keyword.c.id, full=True)
+        ).order_by(final_score.desc()).limit(top_k).cte('fused')
+
+        return select(
             Document.id,
             Document.content,
             Document.doc_metadata,
-            Document.embedding.cosine_distance(query_emb).label('distance')
-        ).order_by(
-            Document.embedding.cosine_distance(query_emb)
-        ).limit(k).all()
-        
+            Document.source,
+            fused.c.score,
+            fused.c.final_score
+        ).join(fused, Document.id == fused.c.id).order_by(fused.c.final_score.desc())
+
+    def _fused_results(self, rows) -> List[Dict[str, Any]]:
         return [
             {
                 "id": r.id,
                 "content": r.content,
                 "metadata": r.doc_metadata,
-                "score": 1 - r.distance  # Convert distance to similarity
+                "source": r.source,
+                "score": r.score,
+                "final_score": r.final_score
             }
-            for r in results
+            for r in rows
         ]
-    
-    def _keyword_search(self, query: str, k: int) -> List[Dict[str, Any]]:
-        # PostgreSQL full-text search
-        # english config is standard
-        ts_query = func.plainto_tsquery('english', query)
-        
-        results = self.db.query(
+
+    def _hydrate_stmt(self, ranked: List[Dict[str, Any]]):
+        # One indexed lookup for the rows that made the final cut
+        ids = [c['id'] for c in ranked]
+        return select(
             Document.id,
             Document.content,
             Document.doc_metadata,
-            func.ts_rank(
-                func.to_tsvector('english', Document.content),
-                ts_query
-            ).label('rank')
-        ).filter(
-            func.to_tsvector('english', Document.content).op('@@')(ts_query)
-        ).order_by(text('rank DESC')).limit(k).all()
-        
+            Document.source
+        ).where(Document.id == any_(literal(ids, ARRAY(Integer))))
+
+    def _hydrated(self, ranked: List[Dict[str, Any]], rows) -> List[Dict[str, Any]]:
+        """Ranked candidates with their content, in rank order (rows deleted
+        since the candidate phase are dropped)"""
+        by_id = {r.id: r for r in rows}
         return [
-            {
-                "id": r.id,
-                "content": r.content,
-                "metadata": r.doc_metadata,
-                # Normalize raw rank loosely to 0-1 range for combination 
-                # (simple implementation, real world might need better normalization)
-                "score": 0.5 + (r.rank / 2) if r.rank < 1 else 1.0 
-            }
-            for r in results
+            {**candidate, "content": row.content, "metadata": row.doc_metadata, "source": row.source}
+            for candidate in ranked
+            if (row := by_id.get(candidate['id'])) is not None
         ]
-    
+
+    def _semantic_stmt(self, query_emb: List[float], k: int, where: Sequence = ()):
+        # Using pgvector cosine distance operator
+        return self._nearest(query_emb, k, where)
+
+    def _nearest(self, query_emb, k: int, where: Sequence = (), query_bits=None):
+        """(id, score) of the k rows matching where that are closest to
+        query_emb by cosine similarity.
+
+        query_emb is a list, or a column of an outer query (batch retrieval,
+        which then passes the query's bit(dim) column as query_bits too).
+        """
+        distance = Document.embedding.cosine_distance(query_emb)
+        nearest = select(Document.id.label('id'), (1 - distance).label('score')).where(*where)
+        if self.binary_rescore:
+            if query_bits is None:
+                bits = self._query_bits(query_emb)
+                query_bits = cast(literal(bits), BIT(len(bits)))
+            # Coarse pass over the 1-bit copy, exact rescoring of the shortlist
+            shortlist = select(Document.id).where(*where).order_by(
+                self._hamming_distance(query_bits)
+            ).limit(k * settings.BINARY_RESCORE_FACTOR)
+            nearest = nearest.where(Document.id.in_(shortlist))
+        return nearest.order_by(distance).limit(k)
+
+    def _query_bits(self, query_emb: List[float]) -> str:
+        return "".join("1" if x > 0 else "0" for x in query_emb)
+
+    def _hamming_distance(self, query_bits):
+        # Operator form, so the HNSW bit_hamming_ops index can serve it
+        return Document.embedding_bits.op('<~>')(query_bits)
+
+    def _candidates(self, rows) -> List[Dict[str, Any]]:
+        return [{"id": r.id, "score": r.score} for r in rows]
+
+    def _hit_candidates(self, hits: Tuple[List[int], List[float]]) -> List[Dict[str, Any]]:
+        return [{"id": id, "score": score} for id, score in zip(*hits)]
+
+    def _semantic_search(self, query_emb: List[float], k: int, hits=None, where=()) -> List[Dict[str, Any]]:
+        if hits is not None:
+            return self._hit_candidates(hits)
+        results = self.db.execute(self._semantic_stmt(query_emb, k, where)).all()
+        return self._candidates(self._count_rows("semantic", results))
+
+    def _keyword_stmt(self, query: str, k: int, where: Sequence = ()):
+        # PostgreSQL full-text search
+        # english config is standard
+        ts_query = func.plainto_tsquery('english', query)
+        rank = self._keyword_rank(ts_query)
+
+        return select(
+            Document.id.label('id'),
+            # Normalize raw rank loosely to 0-1 range for combination
+            # (simple implementation, real world might need better normalization)
+            case((rank < 1, 0.5 + rank / 2), else_=literal(1.0)).label('score')
+        ).filter(
+            Document.content_tsv.op('@@')(ts_query), *where
+        ).order_by(rank.desc()).limit(k)
+
+    def _keyword_rank(self, ts_query):
+        # Cover density rank over the stored, GIN-indexed tsvector.
+        # Normalization 32 maps rank into [0, 1) like ts_rank's usual range
+        return func.ts_rank_cd(Document.content_tsv, ts_query, 32)
+
+    def _keyword_search(self, query: str, k: int, where=()) -> List[Dict[str, Any]]:
+        results = self.db.execute(self._keyword_stmt(query, k, where)).all()
+        return self._candidates(self._count_rows("keyword", results))
+
+    @staticmethod
+    def merge_results(
+        first: List[Dict[str, Any]],
+        second: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """Union two ranked result lists, keeping each doc's best final_score"""
+        best = {}
+        for result in first + second:
+            current = best.get(result['id'])
+            if current is None or result['final_score'] > current['final_score']:
+                best[result['id']] = result
+        return sorted(best.values(), key=lambda x: x['final_score'], reverse=True)[:top_k]
+
     def _hybrid_rerank(self, semantic, keyword, weight):
         # Combine scores with weighted average
         combined = {}
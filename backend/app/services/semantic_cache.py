@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal, CorpusVersion
+from app.core.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Answer cache matched by query-embedding similarity.
+
+    Entries are scoped (e.g. by top_k) and stamped with the corpus version
+    they were generated against; bump_corpus_version() makes every existing
+    entry stale after new documents are ingested. Vectors live in one
+    preallocated matrix so a lookup is a single matrix-vector product.
+
+    Ingestion in another process (app.worker, another API worker) can't
+    call bump_corpus_version() here, so alookup() also polls version_source,
+    the shared version, at most every check_interval seconds and drops every
+    entry when it has moved.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        dim: int = 768,
+        version_source: Optional[Callable[[], Awaitable[int]]] = None,
+        check_interval: float = 1.0
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.version_source = version_source
+        self.check_interval = check_interval
+        self.corpus_version = 0
+        self.shared_version: Optional[int] = None
+        self._checked_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._valid = np.zeros(max_entries, dtype=bool)
+        # slot -> (scope, corpus_version, expires_at, payload), in LRU order
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    async def refresh_version(self) -> None:
+        """Drop every entry if the shared corpus version moved since the last
+        check. A failed check keeps the cache as it is."""
+        now = time.monotonic()
+        if self.version_source is None or now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            shared = await self.version_source()
+        except Exception as e:
+            logger.warning("Corpus version check failed", extra={"error": str(e)})
+            return
+        with self._lock:
+            if self.shared_version is not None and shared != self.shared_version:
+                self._invalidate()
+            self.shared_version = shared
+
+    async def alookup(self, query_emb: List[float], scope: str) -> Optional[Dict[str, Any]]:
+        """lookup(), after checking the shared corpus version"""
+        await self.refresh_version()
+        return self.lookup(query_emb, scope)
+
+    def lookup(self, query_emb: List[float], scope: str) -> Optional[Dict[str, Any]]:
+        """Return the payload of the most similar live entry above threshold"""
+        query = self._normalize(query_emb)
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                record_cache_lookup("semantic", misses=1)
+                return None
+            scores = self._vectors @ query
+            scores[~self._valid] = -np.inf
+            now = time.monotonic()
+            # Walk candidates best-first, dropping stale ones on the way
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.threshold:
+                    break
+                slot = int(slot)
+                entry_scope, version, expires_at, payload = self._entries[slot]
+                if version != self.corpus_version or expires_at < now:
+                    self._release(slot)
+                    continue
+                if entry_scope != scope:
+                    continue
+                self._entries.move_to_end(slot)
+                self.hits += 1
+                record_cache_lookup("semantic", hits=1)
+                return {**payload, "similarity": float(scores[slot])}
+            self.misses += 1
+            record_cache_lookup("semantic", misses=1)
+            return None
+
+    def store(
+        self,
+        query_emb: List[float],
+        scope: str,
+        payload: Dict[str, Any],
+        version: Optional[int] = None
+    ) -> None:
+        """Cache payload for query_emb. Pass the corpus_version read at lookup
+        time as version: if the cache was invalidated since, the answer was
+        generated against the old corpus and is dropped instead of stored."""
+        vector = self._normalize(query_emb)
+        with self._lock:
+            if version is not None and version != self.corpus_version:
+                return
+            if not self._free:
+                # Evict the least recently used entry
+                self._release(next(iter(self._entries)))
+            slot = self._free.pop()
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = (
+                scope, self.corpus_version, time.monotonic() + self.ttl_seconds, payload
+            )
+
+    def bump_corpus_version(self) -> int:
+        """Invalidate every cached answer (called when the corpus changes)"""
+        with self._lock:
+            return self._invalidate()
+
+    def _invalidate(self) -> int:
+        self.corpus_version += 1
+        for slot in list(self._entries):
+            self._release(slot)
+        return self.corpus_version
+
+    def _release(self, slot: int) -> None:
+        del self._entries[slot]
+        self._valid[slot] = False
+        self._free.append(slot)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "corpus_version": self.corpus_version,
+        }
+
+
+async def shared_corpus_version() -> int:
+    """The corpus version every document write bumps (see BulkWriter)"""
+    async with AsyncSessionLocal() as db:
+        version = await db.scalar(select(CorpusVersion.version).where(CorpusVersion.id == 1))
+    return version or 0
+
+
+def build_semantic_cache() -> Optional[SemanticCache]:
+    settings = get_settings()
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticCache(
+        max_entries=settings.SEMANTIC_CACHE_SIZE,
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds=settings.SEMANTIC_CACHE_TTL,
+        dim=settings.EMBEDDING_DIM,
+        version_source=shared_corpus_version,
+        check_interval=settings.SEMANTIC_CACHE_VERSION_CHECK_SECONDS,
+    )
@@ -0,0 +1,369 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.core.database import Document, engine as default_engine
+from app.core.migrations import ivfflat_lists
+
+try:  # POSIX only; elsewhere appends are only safe from a single process
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Rows scored per matrix product; bounds temporary memory to BLOCK x queries
+_BLOCK_ROWS = 65536
+_SYNC_FETCH = 10000
+
+
+def _as_array(embedding) -> np.ndarray:
+    # vector columns load as ndarrays, halfvec ones as pgvector HalfVector
+    if hasattr(embedding, "to_numpy"):
+        embedding = embedding.to_numpy()
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k columns per query row, unordered (argpartition, no full sort)"""
+    if scores.shape[1] <= k:
+        return scores, rows
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, part, axis=1), np.take_along_axis(rows, part, axis=1)
+
+
+class MmapVectorIndex:
+    """Document embeddings in memory-mapped files, searched in-process.
+
+    `<path>.vectors` holds unit-normalised rows (float32 or float16) and
+    `<path>.ids` the matching document ids; `<path>.meta.json` records how
+    many rows are valid. The OS page cache backs the maps, so every worker
+    process on a host shares one copy. Appends take an exclusive file lock,
+    write past the last valid row and only then publish the new count, so
+    readers never see a half-written row; other processes pick the rows up
+    on their next search.
+
+    Small corpora are scanned exactly in blocks with argpartition top-k.
+    Once an IVF partitioning has been trained (`build_ivf`, stored in
+    `<path>.ivf.npz`) searches only score the `nprobe` closest partitions,
+    plus an exact scan of rows appended since training. Deleted documents
+    stay until the next sync_from_db, which rebuilds the index when it holds
+    ids the table no longer has; until then callers join results back to
+    `documents`, which drops them.
+    """
+
+    def __init__(self, path: str = None, dim: int = None, dtype: str = None):
+        self.path = path or settings.VECTOR_INDEX_PATH
+        self.dim = dim or settings.EMBEDDING_DIM
+        self.dtype = np.dtype(dtype or settings.VECTOR_INDEX_DTYPE)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported vector index dtype: {self.dtype}")
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.count = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.ids: Optional[np.ndarray] = None
+        self.ivf = None  # (centroids, order, offsets, rows covered)
+        # Set once the index has caught up with the documents table
+        self.ready = False
+        self._meta_stamp = None
+        self._ivf_stamp = None
+        self._lock = threading.RLock()
+
+        meta = self._read_meta()
+        if meta and (meta["dim"] != self.dim or meta["dtype"] != self.dtype.name):
+            raise ValueError(
+                f"Vector index at {self.path} is {meta['dim']}-dim {meta['dtype']}, "
+                f"expected {self.dim}-dim {self.dtype.name}"
+            )
+        self.refresh()
+
+    def _file(self, suffix: str) -> str:
+        return f"{self.path}.{suffix}"
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, count: int):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "count": count}, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    @staticmethod
+    def _stamp(path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # Files are replaced rather than rewritten, so the inode changes too
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def refresh(self) -> None:
+        """Remap if another process (or this one) published more rows"""
+        with self._lock:
+            stamp = self._stamp(self._file("meta.json"))
+            if stamp != self._meta_stamp:
+                self._meta_stamp = stamp
+                meta = self._read_meta()
+                count = meta["count"] if meta else 0
+                if count != self.count or self.vectors is None:
+                    self.count = count
+                    if count:
+                        self.vectors = np.memmap(
+                            self._file("vectors"), dtype=self.dtype, mode="r", shape=(count, self.dim)
+                        )
+                        self.ids = np.memmap(self._file("ids"), dtype=np.int64, mode="r", shape=(count,))
+                    else:
+                        self.vectors = np.empty((0, self.dim), dtype=self.dtype)
+                        self.ids = np.empty(0, dtype=np.int64)
+
+            ivf_stamp = self._stamp(self._file("ivf.npz"))
+            if ivf_stamp != self._ivf_stamp:
+                self._ivf_stamp = ivf_stamp
+                self.ivf = None
+                if ivf_stamp is not None:
+                    with np.load(self._file("ivf.npz")) as data:
+                        self.ivf = (
+                            data["centroids"], data["order"], data["offsets"], int(data["rows"])
+                        )
+
+    @contextlib.contextmanager
+    def _exclusive(self):
+        # Thread lock for this process, flock for other workers on the host
+        with self._lock:
+            with open(self._file("lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self.refresh()
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, ids: Sequence[int], vectors) -> int:
+        """Add rows for new documents; ids already present are skipped"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return 0
+        vectors = _normalize(vectors)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"Expected {len(ids)} vectors of dim {self.dim}, got {vectors.shape}")
+        with self._exclusive():
+            fresh = ~np.isin(ids, self.ids)
+            ids, vectors = ids[fresh], vectors[fresh]
+            if not len(ids):
+                return 0
+            for suffix, data, width in (
+                ("vectors", vectors.astype(self.dtype), self.dim * self.dtype.itemsize),
+                ("ids", ids, 8),
+            ):
+                # Anything past `count` is left over from an interrupted append
+                with open(self._file(suffix), "r+b" if os.path.exists(self._file(suffix)) else "w+b") as f:
+                    f.seek(self.count * width)
+                    f.write(data.tobytes())
+                    f.truncate()
+            self._write_meta(self.count + len(ids))
+            self.refresh()
+        return len(ids)
+
+    def reset(self) -> None:
+        """Drop every row and the IVF partitioning"""
+        with self._exclusive():
+            for suffix in ("ivf.npz", "vectors", "ids"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._file(suffix))
+            self._write_meta(0)
+            self.refresh()
+            self.ready = False
+
+    # Search
+
+    def search(
+        self,
+        queries,
+        k: int,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine top-k for a batch of queries.
+
+        Returns (ids, scores), each (n_queries, k) and sorted best first;
+        missing slots (fewer than k candidates) hold id -1 and score -inf.
+        """
+        self.refresh()
+        queries = _normalize(queries)
+        # Snapshot, so a concurrent remap can't mix two generations
+        vectors, row_ids, count, ivf = self.vectors, self.ids, self.count, self.ivf
+        if exact or ivf is None or count < settings.VECTOR_INDEX_IVF_MIN_ROWS:
+            scores, rows = self._scan(vectors, queries, k, 0, count)
+        else:
+            scores, rows = self._ivf_search(vectors, ivf, queries, k, nprobe or settings.VECTOR_INDEX_NPROBE)
+            if ivf[3] < count:
+                tail_scores, tail_rows = self._scan(vectors, queries, k, ivf[3], count)
+                scores, rows = _top_k(np.hstack([scores, tail_scores]), np.hstack([rows, tail_rows]), k)
+
+        order = np.argsort(-scores, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        if scores.shape[1] < k:
+            pad = k - scores.shape[1]
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+            rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+        ids = np.where(rows >= 0, row_ids[np.maximum(rows, 0)] if count else -1, -1)
+        return ids, scores
+
+    def search_one(self, query: Sequence[float], k: int, nprobe: Optional[int] = None) -> Tuple[List[int], List[float]]:
+        """search() for a single query, as plain lists without padding"""
+        ids, scores = self.search([query], k, nprobe)
+        keep = ids[0] >= 0
+        return ids[0][keep].tolist(), scores[0][keep].astype(float).tolist()
+
+    def _scan(self, vectors, queries, k: int, start: int, stop: int):
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for begin in range(start, stop, _BLOCK_ROWS):
+            end = min(begin + _BLOCK_ROWS, stop)
+            block = np.asarray(vectors[begin:end], dtype=np.float32)
+            scores = queries @ block.T
+            rows = np.broadcast_to(np.arange(begin, end, dtype=np.int64), scores.shape)
+            best_scores, best_rows = _top_k(np.hstack([best_scores, scores]), np.hstack([best_rows, rows]), k)
+        return best_scores, best_rows
+
+    def _ivf_search(self, vectors, ivf, queries, k: int, nprobe: int):
+        centroids, order, offsets, _ = ivf
+        nprobe = min(nprobe, len(centroids))
+        probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, (query, lists) in enumerate(zip(queries, probes)):
+            rows = np.sort(np.concatenate([order[offsets[l]:offsets[l + 1]] for l in lists]))
+            if not len(rows):
+                continue
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+            if len(rows) > k:
+                part = np.argpartition(-scores, k - 1)[:k]
+                scores, rows = scores[part], rows[part]
+            all_scores[i, :len(rows)] = scores
+            all_rows[i, :len(rows)] = rows
+        return all_scores, all_rows
+
+    # Maintenance
+
+    def build_ivf(self, nlist: int = None, iterations: int = 10, seed: int = 0) -> int:
+        """Train spherical k-means partitions over the current rows; returns nlist"""
+        with self._exclusive():
+            count = self.count
+            if not count:
+                return 0
+            nlist = max(1, min(nlist or settings.VECTOR_INDEX_NLIST or ivfflat_lists(count), count))
+            rng = np.random.default_rng(seed)
+            sample = np.asarray(
+                self.vectors[np.sort(rng.choice(count, min(count, nlist * 256), replace=False))],
+                dtype=np.float32
+            )
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                empty = np.bincount(labels, minlength=nlist) == 0
+                # Re-seed empty partitions from random sample rows
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+                centroids = _normalize(sums)
+
+            labels = np.concatenate([
+                np.argmax(np.asarray(self.vectors[b:b + _BLOCK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+                for b in range(0, count, _BLOCK_ROWS)
+            ])
+            order = np.argsort(labels, kind="stable").astype(np.int64)
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))]).astype(np.int64)
+
+            tmp = self._file("ivf.tmp.npz")
+            with open(tmp, "wb") as f:
+                np.savez(f, centroids=centroids, order=order, offsets=offsets, rows=count)
+            os.replace(tmp, self._file("ivf.npz"))
+            self.refresh()
+        logger.info("Vector index partitioned", extra={"rows": count, "nlist": nlist})
+        return nlist
+
+    def ivf_stale(self) -> bool:
+        """No partitioning yet for a large index, or too many rows added since"""
+        if self.count < settings.VECTOR_INDEX_IVF_MIN_ROWS:
+            return False
+        return self.ivf is None or self.count - self.ivf[3] > 0.2 * self.ivf[3]
+
+    def sync_from_db(self, engine=default_engine) -> int:
+        """Append every embedded document missing from the index; returns how many.
+
+        Run at startup so rows written while no process was appending (or
+        before the index existed) are picked up. If the index holds ids the
+        table no longer has (documents deleted, or the table recreated by
+        reset_db.py so ids restart and would point at unrelated rows), it is
+        rebuilt from scratch. Retrains the IVF partitioning when it has gone
+        stale.
+        """
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            db_ids = np.fromiter(
+                conn.execute(select(Document.id).where(Document.embedding.isnot(None))).scalars(),
+                dtype=np.int64
+            )
+            self.refresh()
+            stale = np.setdiff1d(self.ids, db_ids)
+            if len(stale):
+                logger.warning(
+                    "Vector index holds deleted document ids, rebuilding",
+                    extra={"stale_rows": len(stale), "rows": self.count}
+                )
+                self.reset()
+            missing = np.setdiff1d(db_ids, self.ids)
+            added = 0
+            for i in range(0, len(missing), _SYNC_FETCH):
+                part = missing[i:i + _SYNC_FETCH].tolist()
+                rows = conn.execute(
+                    select(Document.id, Document.embedding).where(Document.id.in_(part))
+                ).all()
+                if not rows:
+                    # Deleted since the id scan
+                    continue
+                added += self.append([r.id for r in rows], np.stack([_as_array(r.embedding) for r in rows]))
+        if self.ivf_stale():
+            self.build_ivf()
+        self.ready = True
+        logger.info(
+            "Vector index synced",
+            extra={"rows": self.count, "added": added, "seconds": round(time.perf_counter() - start, 2)}
+        )
+        return added
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.count,
+            "dtype": self.dtype.name,
+            "ivf_lists": len(self.ivf[0]) if self.ivf is not None else 0,
+            "ivf_rows": self.ivf[3] if self.ivf is not None else 0,
+            "ready": self.ready,
+        }
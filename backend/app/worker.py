@@ -0,0 +1,47 @@
+"""Standalone ingestion worker.
+
+Drains the shared job queue (JOB_BACKEND=redis or sqlite) so ingestion can
+run outside the API processes, e.g. with JOB_WORKERS=0 on the API side:
+
+    python -m app.worker
+"""
+import asyncio
+import logging
+import signal
+
+from app.core.config import get_settings
+from app.core.database import async_engine
+from app.core.init_db import init_db
+from app.core.logging import setup_logging
+from app.services.jobs import IngestionQueue, build_job_store
+from app.services.registry import ServiceRegistry
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def main():
+    setup_logging()
+    if settings.JOB_BACKEND == "memory":
+        raise SystemExit("JOB_BACKEND=memory jobs only live in the API process; use redis or sqlite")
+    init_db()
+
+    services = ServiceRegistry()
+    queue = IngestionQueue(build_job_store(), services, workers=max(settings.JOB_WORKERS, 1))
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    queue.start()
+    logger.info("Ingestion worker started", extra={"backend": settings.JOB_BACKEND, "workers": queue.workers})
+    try:
+        await stop.wait()
+    finally:
+        await queue.stop()
+        await services.aclose()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""Document write-path benchmark.
+
+Writes synthetic chunks with random 768-dim vectors into `documents`
+through the old ORM path (one INSERT per row, vectors as text) and both
+BulkWriter methods, reports rows/sec for each, then deletes the rows:
+
+    python benchmarks/bench_bulk_insert.py --rows 100000 --orm-rows 5000
+
+The ANN index is maintained row by row during any insert; for a one-off
+initial load it is faster to drop it and run `manage.py build-ann-index`
+afterwards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import delete
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import Document, SessionLocal  # noqa: E402
+from app.core.init_db import init_db  # noqa: E402
+from app.services.bulk_writer import BulkWriter  # noqa: E402
+
+SOURCE = "bench-bulk-insert"
+
+
+def synthetic_rows(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, 768), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [
+        (
+            f"Synthetic chunk {i} about the zero-point drive and project antigravity.",
+            vectors[i].tolist(),
+            json.dumps({"source": SOURCE, "chunk_id": i}),
+            SOURCE
+        )
+        for i in range(n)
+    ]
+
+
+def bench_orm(rows) -> float:
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        db.add_all([
+            Document(content=c, embedding=e, doc_metadata=m, source=s) for c, e, m, s in rows
+        ])
+        db.commit()
+    return time.perf_counter() - start
+
+
+async def bench_writer(rows, method: str, batch_size: int) -> float:
+    writer = BulkWriter(method=method, batch_size=batch_size)
+    try:
+        await writer._get_pool()  # connect outside the timed section
+        start = time.perf_counter()
+        await writer.write(rows)
+        return time.perf_counter() - start
+    finally:
+        await writer.close()
+
+
+def cleanup():
+    with SessionLocal() as db:
+        db.execute(delete(Document).where(Document.source == SOURCE))
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--orm-rows", type=int, default=5000, help="the ORM path is slow; time a sample")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    init_db()
+    rows = synthetic_rows(args.rows)
+    results = []
+    try:
+        sample = rows[:args.orm_rows]
+        results.append(("orm (row-by-row)", len(sample), bench_orm(sample)))
+        cleanup()
+        for method in ("insert", "copy"):
+            elapsed = asyncio.run(bench_writer(rows, method, args.batch_size))
+            results.append((f"bulk {method}", len(rows), elapsed))
+            cleanup()
+    finally:
+        cleanup()
+
+    for name, n, elapsed in results:
+        print(f"{name:<18} {n:>7} rows  {elapsed:8.2f}s  {n / elapsed:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Chunker microbenchmark.
+
+Times the token-native SmartChunker against the previous approach
+(RecursiveCharacterTextSplitter measuring every piece with tiktoken) on
+synthetic documents of increasing size and paragraph structure:
+
+    python benchmarks/bench_chunker.py --docs 20 --repeat 3
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import tiktoken
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chunker import SmartChunker  # noqa: E402
+
+WORDS = (
+    "the zero-point drive uses quantum vacuum fluctuations to produce thrust while "
+    "project antigravity coordinates research teams across geneva and tokyo"
+).split()
+
+
+def synthetic_document(rng: random.Random, paragraphs: int, sentences: int) -> str:
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+
+    def paragraph():
+        lines = [" ".join(sentence() for _ in range(rng.randint(1, 3))) for _ in range(sentences)]
+        return "\n".join(lines)
+
+    return "\n\n".join(paragraph() for _ in range(paragraphs))
+
+
+def legacy_chunk(documents, chunk_size=1000, chunk_overlap=200):
+    encoding = tiktoken.encoding_for_model("gpt-4")
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=lambda text: len(encoding.encode(text)),
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    return [chunk for doc in documents for chunk in splitter.split_text(doc.page_content)]
+
+
+def timed(fn, repeat: int):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    encoding = tiktoken.encoding_for_model("gpt-4")
+    # (paragraphs, lines per paragraph): short docs, long docs, one huge unbroken paragraph
+    shapes = [(5, 3), (60, 5), (1, 600)]
+    for paragraphs, sentences in shapes:
+        documents = [
+            Document(page_content=synthetic_document(rng, paragraphs, sentences), metadata={})
+            for _ in range(args.docs)
+        ]
+        tokens = sum(len(encoding.encode_ordinary(d.page_content)) for d in documents)
+
+        legacy_s, legacy_chunks = timed(lambda: legacy_chunk(documents), args.repeat)
+        native_s, native_chunks = timed(lambda: SmartChunker().chunk_documents(documents), args.repeat)
+        print(
+            f"{args.docs} docs, {tokens / args.docs:8.0f} tokens/doc | "
+            f"legacy {legacy_s * 1000:8.1f} ms ({len(legacy_chunks)} chunks) | "
+            f"token-native {native_s * 1000:8.1f} ms ({len(native_chunks)} chunks) | "
+            f"x{legacy_s / native_s:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
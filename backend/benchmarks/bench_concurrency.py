@@ -0,0 +1,106 @@
+"""Concurrent /query throughput benchmark.
+
+Fires REQUESTS queries at a running API with CONCURRENCY in flight and
+reports throughput and latency percentiles. Run it once against a build
+with the old sync request path and once against the current async one
+to compare:
+
+    python benchmarks/bench_concurrency.py --requests 200 --concurrency 32
+
+With --batch N the same queries go to /query/batch, N per request, to
+compare batched throughput against one request per query.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+API_URL = "http://localhost:8000/api/v1/rag"
+
+QUERIES = [
+    "Who invented the Zero-Point Drive?",
+    "Where is Project Antigravity headquartered?",
+    "When did the project start?",
+    "What does the propulsion system use?",
+]
+
+
+async def run_batched(url: str, total: int, batch: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(timeout=600) as client:
+        async def one(first: int):
+            nonlocal errors
+            queries = [QUERIES[i % len(QUERIES)] for i in range(first, min(first + batch, total))]
+            async with semaphore:
+                start = time.perf_counter()
+                async with client.stream("POST", f"{url}/query/batch", json={"queries": queries}) as res:
+                    if res.status_code != 200:
+                        errors += len(queries)
+                        return
+                    # Per-query latency: from sending the batch to its line arriving
+                    async for line in res.aiter_lines():
+                        if line:
+                            latencies.append(time.perf_counter() - start)
+                            errors += "error" in json.loads(line)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(0, total, batch)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"queries:     {total} (batches of {batch}, concurrency {concurrency}, errors {errors})")
+    print(f"wall time:   {elapsed:.2f}s")
+    print(f"throughput:  {total / elapsed:.1f} queries/s")
+    if latencies:
+        print(f"latency p50: {statistics.median(latencies) * 1000:.0f} ms")
+        print(f"latency p95: {latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000:.0f} ms")
+
+
+async def run(url: str, total: int, concurrency: int, optimize: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                res = await client.post(
+                    f"{url}/query",
+                    json={"query": QUERIES[i % len(QUERIES)], "optimize_query": optimize},
+                )
+                latencies.append(time.perf_counter() - start)
+                if res.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"requests:    {total} (concurrency {concurrency}, errors {errors})")
+    print(f"wall time:   {elapsed:.2f}s")
+    print(f"throughput:  {total / elapsed:.1f} req/s")
+    print(f"latency p50: {statistics.median(latencies) * 1000:.0f} ms")
+    print(f"latency p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--no-optimize", action="store_true")
+    parser.add_argument("--batch", type=int, default=0, help="queries per /query/batch request")
+    args = parser.parse_args()
+    if args.batch:
+        asyncio.run(run_batched(args.url, args.requests, args.batch, args.concurrency))
+    else:
+        asyncio.run(run(args.url, args.requests, args.concurrency, not args.no_optimize))
@@ -0,0 +1,115 @@
+"""PDF parsing scaling benchmark.
+
+Writes a synthetic corpus of text-heavy PDFs and times DocumentLoader over
+it with growing process-pool sizes, reporting pages/sec and the speedup
+over in-process parsing:
+
+    python benchmarks/bench_pdf_parsing.py --files 4 --pages 300 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from langchain_community.document_loaders import PyPDFLoader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.document_loader import DocumentLoader  # noqa: E402
+
+WORDS = (
+    "antigravity propulsion drive vector retrieval embedding corpus index "
+    "latency throughput chunk token parser document query answer"
+).split()
+
+
+def _page_stream(page_no: int, lines: int) -> bytes:
+    ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+    for line in range(lines):
+        words = " ".join(WORDS[(page_no + line + i) % len(WORDS)] for i in range(12))
+        ops.append(f"(Page {page_no} line {line}: {words}) Tj T*")
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 60) -> None:
+    """Write a plain-text PDF with `pages` pages, without extra dependencies"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the kids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page_no in range(pages):
+        stream = _page_stream(page_no, lines_per_page)
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def bench(paths, workers: int, pages_per_task: int) -> float:
+    if workers <= 1:
+        # In-process baseline, the way uploads were parsed before the pool
+        start = time.perf_counter()
+        for path in paths:
+            PyPDFLoader(path).load()
+        return time.perf_counter() - start
+
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Warm the workers so interpreter start-up isn't counted
+        list(pool.map(abs, range(workers)))
+        loader = DocumentLoader(pool=pool, pages_per_task=pages_per_task, pool_size=workers)
+        start = time.perf_counter()
+        for _ in loader.iter_pages(paths):
+            pass
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=300, help="pages per file")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--pages-per-task", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"synthetic_{i}.pdf")
+            write_synthetic_pdf(path, args.pages)
+            paths.append(path)
+        total_pages = args.files * args.pages
+        print(f"{args.files} files x {args.pages} pages on {os.cpu_count()} cores")
+
+        baseline = None
+        for workers in sorted(set(args.workers)):
+            elapsed = bench(paths, workers, args.pages_per_task)
+            baseline = baseline or elapsed
+            print(
+                f"workers={workers:<3} {elapsed:7.2f}s  "
+                f"{total_pages / elapsed:8.1f} pages/s  speedup x{baseline / elapsed:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
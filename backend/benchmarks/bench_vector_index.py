@@ -0,0 +1,133 @@
+"""In-process vector index benchmark: recall@k and latency against exact search.
+
+Builds a MmapVectorIndex over synthetic clustered 768-dim vectors in a
+temp directory, then times single queries through the exact scan and IVF
+at several nprobe values. Recall is measured against the exact scan:
+
+    python benchmarks/bench_vector_index.py --rows 200000 --queries 200
+
+With --pgvector the index is synced from the documents table instead and
+the pgvector ORDER BY <=> query (using whatever ANN index exists) is timed
+and scored against the same exact results.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import get_settings  # noqa: E402
+from app.services.vector_index import MmapVectorIndex  # noqa: E402
+
+settings = get_settings()
+
+
+def synthetic(rows: int, dim: int, clusters: int, spread: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centers[rng.integers(clusters, size=rows)]
+    vectors += spread * rng.standard_normal((rows, dim), dtype=np.float32)
+    return vectors
+
+
+def timed(search, queries):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(search(q))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return results, latencies
+
+
+def recall(found, truth, k: int) -> float:
+    return statistics.mean(len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth))
+
+
+def report(name: str, latencies, r: float):
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:<22} recall {r:6.3f}   p50 {statistics.median(latencies) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+def pgvector_search(k: int):
+    from sqlalchemy import select
+
+    from app.core.database import Document, SessionLocal
+
+    session = SessionLocal()
+
+    def search(query):
+        distance = Document.embedding.cosine_distance(query.tolist())
+        return session.scalars(select(Document.id).order_by(distance).limit(k)).all()
+
+    return search, session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=2.0, help="noise around cluster centers")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--nlist", type=int, default=0, help="0 = derive from row count")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--pgvector", action="store_true", help="index the documents table and compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    # Use the IVF path whatever the corpus size
+    settings.VECTOR_INDEX_IVF_MIN_ROWS = 0
+
+    rng = np.random.default_rng(args.seed + 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = MmapVectorIndex(os.path.join(tmp, "bench"), dtype=args.dtype)
+        start = time.perf_counter()
+        if args.pgvector:
+            index.sync_from_db()
+        else:
+            vectors = synthetic(args.rows, index.dim, args.clusters, args.spread, args.seed)
+            for i in range(0, len(vectors), 50000):
+                index.append(np.arange(i, min(i + 50000, len(vectors))), vectors[i:i + 50000])
+        print(f"loaded {index.count} rows ({args.dtype}) in {time.perf_counter() - start:.2f}s")
+        if not index.count:
+            return
+
+        start = time.perf_counter()
+        nlist = index.build_ivf(nlist=args.nlist or None)
+        print(f"trained {nlist} IVF lists in {time.perf_counter() - start:.2f}s\n")
+
+        # Perturbed stored vectors, so every query has near neighbours
+        picks = rng.choice(index.count, min(args.queries, index.count), replace=False)
+        queries = np.asarray(index.vectors[np.sort(picks)], dtype=np.float32)
+        queries += 0.1 * rng.standard_normal(queries.shape, dtype=np.float32) / np.sqrt(index.dim)
+
+        truth, latencies = timed(lambda q: index.search(q, args.k, exact=True)[0][0].tolist(), queries)
+        report("exact scan", latencies, 1.0)
+
+        start = time.perf_counter()
+        index.search(queries, args.k, exact=True)
+        batched = time.perf_counter() - start
+        print(f"{'exact scan, batched':<22} {len(queries) / batched:8.0f} queries/s")
+
+        for nprobe in args.nprobe:
+            found, latencies = timed(lambda q: index.search(q, args.k, nprobe=nprobe)[0][0].tolist(), queries)
+            report(f"ivf nprobe={nprobe}", latencies, recall(found, truth, args.k))
+
+        if args.pgvector:
+            search, session = pgvector_search(args.k)
+            try:
+                search(queries[0])  # warm up the connection
+                found, latencies = timed(search, queries)
+            finally:
+                session.close()
+            report("pgvector", latencies, recall(found, truth, args.k))
+
+
+if __name__ == "__main__":
+    main()
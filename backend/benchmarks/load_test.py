@@ -0,0 +1,100 @@
+"""Offline /upload and /query load test.
+
+Uploads synthetic text files, waits for their ingestion jobs and reports
+ingest throughput, then runs the concurrent /query benchmark. Start the
+stub completion server and the API with the offline providers first:
+
+    python benchmarks/stub_llm_server.py --port 8001 --latency-ms 300 --tokens-per-sec 50 &
+    EMBEDDING_PROVIDER=hash LLM_PROVIDER=stub uvicorn app.main:app --port 8000 &
+    python benchmarks/load_test.py --files 20 --paragraphs 200 --requests 200 --concurrency 16
+
+File contents are derived from --seed, so runs are comparable; each run
+gets a fresh tag (or pass --tag) so deduplication doesn't skip the upload.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_concurrency import API_URL, run as run_queries  # noqa: E402
+
+VOCABULARY = (
+    "zero-point drive antigravity propulsion reactor lattice field coil vacuum energy "
+    "prototype test flight hangar engineer telemetry thrust vector stabilizer "
+    "superconductor cryogenic shielding navigation orbit payload launch"
+).split()
+
+
+def synthetic_file(seed: int, tag: str, index: int, paragraphs: int) -> str:
+    rng = random.Random(seed * 100003 + index)
+    return "\n\n".join(
+        f"[{tag} file {index} paragraph {p}] "
+        + " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(40, 120))) + "."
+        for p in range(paragraphs)
+    )
+
+
+async def upload(url: str, files: int, paragraphs: int, seed: int, tag: str, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    accept_latencies, job_times, chunks, failed = [], [], 0, 0
+
+    async with httpx.AsyncClient(timeout=300) as client:
+        async def one(i: int):
+            nonlocal chunks, failed
+            body = synthetic_file(seed, tag, i, paragraphs).encode()
+            async with semaphore:
+                start = time.perf_counter()
+                res = await client.post(
+                    f"{url}/upload", files={"files": (f"{tag}-{i}.txt", body, "text/plain")}
+                )
+                accept_latencies.append(time.perf_counter() - start)
+                job = res.json()
+                while job["status"] in ("queued", "running"):
+                    await asyncio.sleep(0.1)
+                    job = (await client.get(f"{url}/jobs/{job['job_id']}")).json()
+                job_times.append(time.perf_counter() - start)
+                if job["status"] != "succeeded":
+                    failed += 1
+                chunks += job["progress"].get("chunks_created", 0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(files)))
+        elapsed = time.perf_counter() - start
+
+    print(f"uploads:     {files} files x {paragraphs} paragraphs (failed {failed})")
+    print(f"wall time:   {elapsed:.2f}s")
+    print(f"ingest:      {chunks / elapsed:.1f} chunks/s")
+    print(f"accept p50:  {statistics.median(accept_latencies) * 1000:.0f} ms")
+    print(f"job p50:     {statistics.median(job_times) * 1000:.0f} ms")
+    print(f"job max:     {max(job_times) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--paragraphs", type=int, default=100)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--no-optimize", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tag", default=None)
+    args = parser.parse_args()
+
+    tag = args.tag or uuid.uuid4().hex[:8]
+    asyncio.run(upload(args.url, args.files, args.paragraphs, args.seed, tag, args.upload_concurrency))
+    print()
+    asyncio.run(run_queries(args.url, args.requests, args.concurrency, not args.no_optimize))
+
+
+if __name__ == "__main__":
+    main()
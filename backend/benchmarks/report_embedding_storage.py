@@ -0,0 +1,171 @@
+"""Embedding storage report: size, latency and recall@k per column layout.
+
+Loads the same vectors into one scratch table per layout, builds the ANN
+index on each and runs the same queries against all of them:
+
+    vector(768)        the current layout (baseline)
+    halfvec(768)       float16 storage (pgvector >= 0.7 only)
+    vector(N)          leading-dimension truncation, per --truncate
+    binary + rescore   Hamming shortlist over embedding_bits, rescored at
+                       full precision (the EMBEDDING_BINARY_RESCORE path)
+
+Recall is measured against exact full-precision cosine search done in
+NumPy. Vectors are synthetic by default; --from-db uses the embeddings in
+the documents table. Synthetic vectors carry no extra information in their
+leading dimensions, so truncation recall is only meaningful with --from-db
+on a model trained for it. Scratch tables are dropped afterwards:
+
+    python benchmarks/report_embedding_storage.py --rows 20000 --queries 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import get_settings  # noqa: E402
+from app.core.database import binary_quantize_sql, engine  # noqa: E402
+from app.core.migrations import pgvector_version  # noqa: E402
+from benchmarks.bench_vector_index import synthetic  # noqa: E402
+
+settings = get_settings()
+
+
+def vector_literal(v) -> str:
+    return "[" + ",".join(f"{x:.7g}" for x in v) + "]"
+
+
+def load_vectors(args) -> np.ndarray:
+    if not args.from_db:
+        return synthetic(args.rows, args.dim, args.clusters, args.spread, args.seed)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT embedding::text FROM documents WHERE embedding IS NOT NULL ORDER BY id")).scalars()
+        return np.array([np.array(r.strip("[]").split(","), dtype=np.float32) for r in rows])
+
+
+def layouts(dim: int, truncate, version):
+    yield {"name": f"vector({dim})", "type": f"vector({dim})", "dim": dim, "opclass": "vector_cosine_ops"}
+    if version >= (0, 7):
+        yield {"name": f"halfvec({dim})", "type": f"halfvec({dim})", "dim": dim, "opclass": "halfvec_cosine_ops"}
+    for d in truncate:
+        if d < dim:
+            yield {"name": f"vector({d}) truncated", "type": f"vector({d})", "dim": d, "opclass": "vector_cosine_ops"}
+    yield {
+        "name": "binary + rescore", "type": f"vector({dim})", "dim": dim,
+        "opclass": "vector_cosine_ops", "binary": True, "ann": False
+    }
+
+
+def index_ddl(table: str, opclass: str, index: str, rows: int) -> str:
+    if index == "hnsw":
+        params = f"m = {settings.HNSW_M}, ef_construction = {settings.HNSW_EF_CONSTRUCTION}"
+    else:
+        params = f"lists = {max(1, rows // 1000)}"
+    return f"CREATE INDEX ON {table} USING {index} (embedding {opclass}) WITH ({params})"
+
+
+def build(conn, table: str, layout: dict, vectors: np.ndarray, index: str, version):
+    conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    conn.execute(text(f"CREATE TABLE {table} (id int PRIMARY KEY, embedding {layout['type']})"))
+    insert = text(f"INSERT INTO {table} (id, embedding) VALUES (:id, CAST(:embedding AS {layout['type']}))")
+    rows = [{"id": i, "embedding": vector_literal(v)} for i, v in enumerate(vectors[:, :layout["dim"]])]
+    for start in range(0, len(rows), 1000):
+        conn.execute(insert, rows[start:start + 1000])
+    if layout.get("binary"):
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN embedding_bits bit({layout['dim']}) "
+            f"GENERATED ALWAYS AS ({binary_quantize_sql('embedding', layout['dim'])}) STORED"
+        ))
+        if version >= (0, 7):
+            conn.execute(text(f"CREATE INDEX ON {table} USING hnsw (embedding_bits bit_hamming_ops)"))
+    if index != "none" and layout.get("ann", True):
+        conn.execute(text(index_ddl(table, layout["opclass"], index, len(vectors))))
+    conn.execute(text(f"ANALYZE {table}"))
+
+
+def query_sql(table: str, layout: dict, k: int, factor: int, version) -> str:
+    if not layout.get("binary"):
+        return f"SELECT id FROM {table} ORDER BY embedding <=> CAST(:q AS {layout['type']}) LIMIT {k}"
+    hamming = (
+        "embedding_bits <~> CAST(:bits AS bit({d}))" if version >= (0, 7)
+        else "bit_count(embedding_bits # CAST(:bits AS bit({d})))"
+    ).format(d=layout["dim"])
+    return (
+        f"SELECT id FROM {table} WHERE id IN "
+        f"(SELECT id FROM {table} ORDER BY {hamming} LIMIT {k * factor}) "
+        f"ORDER BY embedding <=> CAST(:q AS {layout['type']}) LIMIT {k}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=2.0)
+    parser.add_argument("--from-db", action="store_true", help="use the documents table's embeddings")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--truncate", type=int, nargs="*", default=[512, 256])
+    parser.add_argument("--index", choices=["hnsw", "ivfflat", "none"], default=settings.ANN_INDEX_TYPE)
+    parser.add_argument("--rescore-factor", type=int, default=settings.BINARY_RESCORE_FACTOR)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="don't drop the scratch tables")
+    args = parser.parse_args()
+
+    version = pgvector_version()
+    vectors = load_vectors(args)
+    if not len(vectors):
+        print("No vectors to test.")
+        return
+    dim = vectors.shape[1]
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + 0.1 * rng.standard_normal((len(picks), dim), dtype=np.float32)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    truth = np.argsort(-(queries @ unit.T), axis=1)[:, :args.k]
+    print(f"pgvector {'.'.join(map(str, version))}, {len(vectors)} rows x {dim} dims, "
+          f"{len(queries)} queries, k={args.k}, index={args.index}\n")
+    print(f"{'layout':<22} {'table MB':>9} {'index MB':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+
+    tables = []
+    try:
+        for i, layout in enumerate(layouts(dim, args.truncate, version)):
+            table = f"bench_layout_{i}"
+            tables.append(table)
+            with engine.begin() as conn:
+                build(conn, table, layout, vectors, args.index, version)
+            sql = text(query_sql(table, layout, args.k, args.rescore_factor, version))
+            latencies, found = [], []
+            with engine.connect() as conn:
+                table_mb = conn.execute(text(f"SELECT pg_table_size('{table}')")).scalar() / 2**20
+                index_mb = conn.execute(text(
+                    f"SELECT pg_indexes_size('{table}') - pg_relation_size('{table}_pkey')"
+                )).scalar() / 2**20
+                for q in queries:
+                    params = {"q": vector_literal(q[:layout["dim"]]), "bits": "".join("1" if x > 0 else "0" for x in q)}
+                    start = time.perf_counter()
+                    found.append(conn.execute(sql, params).scalars().all())
+                    latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            recall = statistics.mean(len(set(f) & set(t)) / args.k for f, t in zip(found, truth.tolist()))
+            print(
+                f"{layout['name']:<22} {table_mb:9.1f} {index_mb:9.1f} "
+                f"{statistics.median(latencies) * 1000:8.2f} "
+                f"{latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000:8.2f} {recall:7.3f}"
+            )
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                for table in tables:
+                    conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+
+if __name__ == "__main__":
+    main()
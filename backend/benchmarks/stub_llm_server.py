@@ -0,0 +1,120 @@
+"""OpenAI-compatible stand-in for the chat completions API.
+
+Answers every request after a fixed time to first token and then emits
+words at a fixed rate, so generation cost is reproducible without network
+access or credentials. The reply is a deterministic function of the prompt
+and always cites [Doc 1]. Supports plain and streamed completions,
+including the final usage chunk from stream_options.include_usage:
+
+    python benchmarks/stub_llm_server.py --port 8001 --latency-ms 300 --tokens-per-sec 50
+
+then run the API with LLM_PROVIDER=stub (STUB_LLM_URL defaults to
+http://localhost:8001/v1).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _count_tokens(text: str) -> int:
+    # Close enough to BPE counts for load testing
+    return len(_WORD_RE.findall(text))
+
+
+def reply_words(messages, max_tokens: int):
+    """Deterministic answer: words picked from the prompt by its hash"""
+    prompt = " ".join(m.get("content") or "" for m in messages)
+    words = _WORD_RE.findall(prompt) or ["stub"]
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    length = max(1, min(max_tokens, 40))
+    return ["[Doc", "1]"] + [words[(seed + i * 7) % len(words)] for i in range(length - 2)]
+
+
+def create_app(latency_ms: float = 200.0, tokens_per_sec: float = 50.0) -> FastAPI:
+    app = FastAPI(title="Stub LLM")
+    token_delay = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "stub")
+        words = reply_words(messages, body.get("max_tokens") or 256)
+        usage = {
+            "prompt_tokens": sum(_count_tokens(m.get("content") or "") for m in messages),
+            "completion_tokens": len(words),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        await asyncio.sleep(latency_ms / 1000)
+
+        if not body.get("stream"):
+            await asyncio.sleep(token_delay * len(words))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        def chunk(delta, finish_reason=None, with_usage=None):
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if with_usage else [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+                "usage": with_usage
+            }) + "\n\n"
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"content": word if i == 0 else " " + word})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk(None, with_usage=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="0 = emit instantly")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.tokens_per_sec), host=args.host, port=args.port, log_level="warning")
@@ -3,6 +3,7 @@ import os
 import sys
 import requests
 import json
+import time
 from typing import List, Dict
 
 # Add app to path
@@ -48,11 +49,19 @@ async def eval_system():
         with open(filename, "rb") as f:
             files = {'files': (filename, f, 'text/plain')}
             res = requests.post(f"{API_URL}/upload", files=files)
-            if res.status_code != 201:
+            if res.status_code != 202:
                 print(f"❌ Upload failed: {res.text}")
                 return
+            # Ingestion is asynchronous; poll the job until it settles
+            job = res.json()
+            while job["status"] in ("queued", "running"):
+                time.sleep(1)
+                job = requests.get(f"{API_URL}/jobs/{job['job_id']}").json()
+            if job["status"] != "succeeded":
+                print(f"❌ Ingestion failed: {job['error']}")
+                return
             print("✅ Upload Successful")
-            print(f"   Response: {res.json()}")
+            print(f"   Response: {job}")
     except Exception as e:
         print(f"❌ Upload Error: {e}")
         return
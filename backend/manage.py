@@ -0,0 +1,85 @@
+import argparse
+
+from app.core import migrations
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG System maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "backfill-tsvector",
+        help="Add the stored tsvector column and GIN index to an existing documents table"
+    )
+
+    commands.add_parser(
+        "backfill-content-hash",
+        help="Add, fill and uniquely index documents (source, content_hash) (removes duplicate chunks)"
+    )
+
+    commands.add_parser(
+        "migrate-metadata",
+        help="Convert documents.doc_metadata to jsonb and index it and source for filtered queries"
+    )
+
+    ann = commands.add_parser(
+        "build-ann-index",
+        help="Build the ANN index on documents.embedding (run after bulk loads)"
+    )
+    ann.add_argument("--type", choices=["hnsw", "ivfflat"], help="Override ANN_INDEX_TYPE")
+    ann.add_argument("--rebuild", action="store_true", help="Replace an existing index")
+
+    compact = commands.add_parser(
+        "compact-embeddings",
+        help="Convert documents.embedding to EMBEDDING_DIM / EMBEDDING_STORAGE (rewrites the table)"
+    )
+    compact.add_argument("--dim", type=int, help="Override EMBEDDING_DIM (keeps leading dimensions)")
+    compact.add_argument("--storage", choices=["vector", "halfvec"], help="Override EMBEDDING_STORAGE")
+    compact.add_argument(
+        "--binary", action=argparse.BooleanOptionalAction, default=None,
+        help="Add (or drop) the embedding_bits column; default EMBEDDING_BINARY_RESCORE"
+    )
+
+    index = commands.add_parser(
+        "build-vector-index",
+        help="Sync the in-process vector index with documents and train its IVF partitions"
+    )
+    index.add_argument("--rebuild", action="store_true", help="Start from an empty index")
+    index.add_argument("--nlist", type=int, help="Train IVF with this many partitions, whatever the size")
+
+    args = parser.parse_args()
+
+    if args.command == "backfill-tsvector":
+        print("Backfilling content_tsv...")
+        migrations.backfill_tsvector()
+        print("Done.")
+    elif args.command == "backfill-content-hash":
+        print("Backfilling content_hash...")
+        removed = migrations.backfill_content_hash()
+        print(f"Done. Removed {removed} duplicate chunks.")
+    elif args.command == "migrate-metadata":
+        print("Migrating doc_metadata to jsonb...")
+        migrations.migrate_metadata_jsonb()
+        print("Done.")
+    elif args.command == "build-ann-index":
+        ddl = migrations.build_ann_index(index_type=args.type, rebuild=args.rebuild)
+        print(ddl or "Nothing to do (index exists, type is 'none' or table is empty).")
+    elif args.command == "compact-embeddings":
+        print("Converting embeddings...")
+        sizes = migrations.compact_embeddings(dim=args.dim, storage=args.storage, binary=args.binary)
+        for name, before in sizes["before"].items():
+            print(f"  {name:<28} {before / 2**20:10.1f} MB -> {sizes['after'][name] / 2**20:10.1f} MB")
+        print("Done. Set the same EMBEDDING_* settings for the API, and run "
+              "build-vector-index --rebuild if the in-process index is used.")
+    elif args.command == "build-vector-index":
+        from app.services.vector_index import MmapVectorIndex
+
+        vector_index = MmapVectorIndex()
+        if args.rebuild:
+            vector_index.reset()
+        added = vector_index.sync_from_db()
+        if args.nlist:
+            vector_index.build_ivf(nlist=args.nlist)
+        print(f"Done. Added {added} rows; index stats: {vector_index.stats()}")
+
+if __name__ == "__main__":
+    main()
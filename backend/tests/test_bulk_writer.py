@@ -0,0 +1,70 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.core.database import Document, SessionLocal
+from app.core.init_db import init_db
+from app.services.bulk_writer import BulkWriter, content_hash
+
+
+@pytest.mark.parametrize("method", ["copy", "insert"])
+def test_rows_round_trip_and_dedupe(method):
+    """Test both write paths store exact vectors and skip known content"""
+    init_db()  # creates the corpus_version table the writer bumps
+    source = f"bulk-{method}-{uuid.uuid4().hex}"
+    contents = [f"{source} chunk {i}" for i in range(5)]
+    rows = [
+        (content, [i / 10, 0.5] + [0.0] * 766, '{"chunk_id": %d}' % i, source, content_hash(content))
+        for i, content in enumerate(contents)
+    ]
+
+    async def scenario():
+        writer = BulkWriter(method=method, batch_size=2)
+        try:
+            first = await writer.write(rows[:3])
+            second = await writer.write(rows)
+        finally:
+            await writer.close()
+        return first, second, writer.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    with SessionLocal() as db:
+        try:
+            stored = db.scalars(select(Document).where(Document.source == source).order_by(Document.id)).all()
+            assert [d.content for d in stored] == contents
+            assert [round(float(d.embedding[0]), 4) for d in stored] == [r[1][0] for r in rows]
+            assert stored[3].doc_metadata == {"chunk_id": 3}
+        finally:
+            db.execute(delete(Document).where(Document.source == source))
+            db.commit()
+    assert (first, second) == (3, 2)
+    assert stats["rows_deduplicated"] == 3
+
+
+def test_same_chunk_is_stored_once_per_source():
+    """Test identical content in another source is kept, so source filters still find it"""
+    init_db()  # also moves an older table to per-source uniqueness
+    sources = [f"bulk-scope-{uuid.uuid4().hex}" for _ in range(2)]
+    content = f"shared clause {uuid.uuid4().hex}"
+    rows = [(content, [0.1] * 768, "{}", source, content_hash(content)) for source in sources]
+
+    async def scenario():
+        writer = BulkWriter()
+        try:
+            first = await writer.write(rows[:1])
+            second = await writer.write(rows)
+            known = await writer.existing_keys([(s, content_hash(content)) for s in sources + ["other"]])
+        finally:
+            await writer.close()
+        return first, second, known
+
+    try:
+        first, second, known = asyncio.run(scenario())
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Document).where(Document.source.in_(sources)))
+            db.commit()
+    assert (first, second) == (1, 1)
+    assert known == {(s, content_hash(content)) for s in sources}
@@ -0,0 +1,44 @@
+from langchain_core.documents import Document
+
+from app.services.chunker import SmartChunker, get_encoding
+
+PARAGRAPH = "The Zero-Point Drive was invented by Dr. Sarah Connor. It produces thrust from vacuum fluctuations."
+
+
+def test_chunks_respect_token_budget_and_overlap():
+    """Test chunks stay within chunk_size tokens and consecutive ones overlap"""
+    chunker = SmartChunker(chunk_size=60, chunk_overlap=15)
+    text = " ".join([PARAGRAPH] * 20)
+    chunks = chunker.split_text(text)
+    encoding = get_encoding()
+
+    assert len(chunks) > 1
+    assert all(len(encoding.encode_ordinary(c)) <= 60 for c in chunks)
+    for first, second in zip(chunks, chunks[1:]):
+        assert second.split()[0] in first.split()
+
+
+def test_prefers_paragraph_breaks():
+    """Test a cut lands on a blank line when one fits in the window"""
+    chunker = SmartChunker(chunk_size=30, chunk_overlap=5)
+    chunks = chunker.split_text(f"{PARAGRAPH}\n\n{PARAGRAPH}")
+    assert chunks[0] == PARAGRAPH
+
+
+def test_multibyte_text_round_trips():
+    """Test offsets stay aligned when tokens split multi-byte characters"""
+    chunker = SmartChunker(chunk_size=20, chunk_overlap=5)
+    text = "日本語のテキスト 😀 émoji " * 10
+    tokens = chunker.encoding.encode_ordinary(text)
+    decoded, char_at = chunker._decode_with_offsets(tokens)
+    assert decoded == text
+    assert list(char_at[:-1]) == chunker.encoding.decode_with_offsets(tokens)[1]
+    assert all(c in text for c in chunker.split_text(text))
+
+
+def test_chunk_documents_metadata():
+    """Test every chunk keeps its document metadata plus chunk numbering"""
+    docs = [Document(page_content=" ".join([PARAGRAPH] * 10), metadata={"source": "a.txt"})]
+    chunks = SmartChunker(chunk_size=40, chunk_overlap=10).chunk_documents(docs)
+    assert [c.metadata["chunk_id"] for c in chunks] == list(range(len(chunks)))
+    assert all(c.metadata["total_chunks"] == len(chunks) and c.metadata["source"] == "a.txt" for c in chunks)
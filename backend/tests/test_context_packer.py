@@ -0,0 +1,58 @@
+from app.services.chunker import SmartChunker
+from app.services.context_packer import ContextPacker
+
+PARAGRAPH = "The Zero-Point Drive was invented by Dr. Sarah Connor. It produces thrust from vacuum fluctuations."
+
+
+def chunk_docs(text: str, source: str = "drive.txt", chunk_size: int = 60, chunk_overlap: int = 15):
+    chunks = SmartChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap).split_text(text)
+    return [
+        {"id": i, "content": c, "source": source, "metadata": {"source": source, "chunk_id": i}, "score": 1.0 - i / 100}
+        for i, c in enumerate(chunks)
+    ]
+
+
+def test_adjacent_chunks_merge_without_their_overlap():
+    """Test consecutive chunks of a source become one block with no repeated text"""
+    text = " ".join(f"Sentence {i} of the drive manual explains part {i}." for i in range(40))
+    docs = chunk_docs(text)
+    packed = ContextPacker(budget_tokens=0).pack(docs)
+
+    assert len(docs) > 2 and len(packed.docs) == 1
+    assert packed.docs[0]["content"] == text
+    assert packed.docs[0]["chunk_ids"] == list(range(len(docs)))
+    assert packed.chunks_merged == len(docs) - 1 and packed.chunks_dropped == 0
+    assert packed.tokens_saved > 0
+
+
+def test_budget_keeps_best_chunks_and_never_returns_nothing():
+    """Test chunks are taken by score within the budget; an oversized best chunk is cut"""
+    packer = ContextPacker(budget_tokens=70)
+    docs = [
+        {"content": PARAGRAPH, "source": "a.txt", "metadata": {"chunk_id": 0}, "score": 0.2},
+        {"content": PARAGRAPH.upper(), "source": "b.txt", "metadata": {"chunk_id": 4}, "score": 0.9},
+        {"content": PARAGRAPH.lower(), "source": "c.txt", "metadata": {"chunk_id": 2}, "score": 0.5},
+    ]
+    packed = packer.pack(docs)
+    assert [d["source"] for d in packed.docs] == ["b.txt", "c.txt"]
+    assert packed.tokens <= 70 and packed.chunks_dropped == 1
+
+    packed = ContextPacker(budget_tokens=10).pack(docs)
+    assert [d["source"] for d in packed.docs] == ["b.txt"]
+    assert PARAGRAPH.upper().startswith(packed.docs[0]["content"])
+    assert packed.tokens <= 10
+    assert packer.stats()["contexts_packed"] == 1
+
+
+def test_chunk_ids_restart_per_page_and_do_not_merge_across_pages():
+    """Test chunks sharing a chunk_id on different pages stay separate blocks"""
+    pages = {1: "Page one covers the drive's power coupling in detail.", 7: "Page seven lists the maintenance schedule for the drive."}
+    docs = [
+        {"content": f"{text} Part {i}.", "source": "manual.pdf", "metadata": {"page": page, "chunk_id": i}, "score": 0.9 - page / 100 - i / 1000}
+        for page, text in pages.items() for i in (2, 3)
+    ]
+    packed = ContextPacker(budget_tokens=0).pack(docs)
+    assert len(packed.docs) == 2
+    assert {d["metadata"]["page"]: d["chunk_ids"] for d in packed.docs} == {1: [2, 3], 7: [2, 3]}
+    assert all(pages[d["metadata"]["page"]] in d["content"] for d in packed.docs)
+    assert not any(pages[7] in d["content"] for d in packed.docs if d["metadata"]["page"] == 1)
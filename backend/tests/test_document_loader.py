@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_community.document_loaders import PyPDFLoader
+
+from app.services.document_loader import DocumentLoader, page_ranges
+from benchmarks.bench_pdf_parsing import write_synthetic_pdf
+
+
+def test_page_ranges_cover_every_page():
+    """Test ranges are contiguous and the last one is clipped"""
+    assert page_ranges(70, 32) == [(0, 32), (32, 64), (64, 70)]
+    assert page_ranges(0, 32) == []
+
+
+def test_split_pdf_reassembles_in_order(tmp_path):
+    """Test range-split parsing matches a whole-file PyPDFLoader parse"""
+    path = str(tmp_path / "doc.pdf")
+    write_synthetic_pdf(path, pages=20, lines_per_page=5)
+
+    with ThreadPoolExecutor(3) as pool:
+        pages = DocumentLoader(pool=pool, pages_per_task=7, pool_size=3).load_pdf(path)
+    expected = PyPDFLoader(path).load()
+
+    assert [p.metadata["page"] for p in pages] == list(range(20))
+    assert [p.page_content for p in pages] == [p.page_content for p in expected]
+    assert pages[0].metadata["total_pages"] == 20
+    assert pages[0].metadata["source"] == path
+
+
+def test_text_files_are_read_in_paragraph_blocks(tmp_path):
+    """Test text is streamed in bounded blocks that reassemble the file"""
+    path = tmp_path / "notes.txt"
+    text = "\n\n".join(f"Paragraph {i} " + "word " * (i % 7) for i in range(200))
+    path.write_text(text)
+
+    with ThreadPoolExecutor(2) as pool:
+        loader = DocumentLoader(pool=pool, pool_size=2, text_block_chars=256)
+        blocks = [pages for _, pages in loader.iter_pages([str(path)])]
+
+    assert len(blocks) > 10
+    assert all(len(pages) == 1 for pages in blocks)
+    docs = [pages[0] for pages in blocks]
+    assert "".join(d.page_content for d in docs) == text
+    assert all(d.page_content.endswith("\n\n") and len(d.page_content) <= 2 * 256 for d in docs[:-1])
+    assert [d.metadata["block"] for d in docs] == list(range(len(docs)))
+    assert docs[0].metadata["source"] == str(path)
@@ -0,0 +1,99 @@
+import asyncio
+import random
+
+import httpx
+import openai
+import pytest
+
+from app.services.embed_executor import EmbeddingExecutor, TokenBucket, is_retryable
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class StubProvider:
+    """Embeds a text as [len(text)] after a random delay; fails the first
+    `failures` calls with `status`"""
+
+    def __init__(self, failures=0, status=429, max_latency=0.01):
+        self.failures = failures
+        self.status = status
+        self.max_latency = max_latency
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, batch):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(random.uniform(0, self.max_latency))
+            if self.calls <= self.failures:
+                raise ProviderError(self.status)
+            return [[float(len(text))] for text in batch]
+        finally:
+            self.in_flight -= 1
+
+
+def run(executor, provider, texts, batch_size=3):
+    return asyncio.run(executor.run(provider, texts, batch_size))
+
+
+def test_order_is_preserved_under_bounded_concurrency():
+    """Test batches finishing out of order still come back in input order"""
+    texts = ["x" * i for i in range(1, 41)]
+    provider = StubProvider()
+    executor = EmbeddingExecutor(concurrency=4, requests_per_minute=0, texts_per_minute=0)
+    assert run(executor, provider, texts) == [[float(i)] for i in range(1, 41)]
+    assert 1 < provider.peak <= 4
+    assert executor.stats()["texts_embedded"] == 40
+
+
+def test_rate_limits_and_server_errors_are_retried():
+    """Test 429/5xx answers are retried per batch until they succeed"""
+    provider = StubProvider(failures=3, status=503)
+    executor = EmbeddingExecutor(concurrency=1, requests_per_minute=0, texts_per_minute=0, retries=3, backoff=0.001)
+    assert run(executor, provider, ["a", "bb"]) == [[1.0], [2.0]]
+    assert executor.stats()["retries"] == 3
+
+
+def test_transport_errors_are_retryable():
+    """Test client-library connection failures and timeouts count as transient"""
+    request = httpx.Request("POST", "https://provider.test/embed")
+    assert is_retryable(httpx.ConnectError("refused", request=request))
+    assert is_retryable(httpx.ReadTimeout("slow", request=request))
+    assert is_retryable(openai.APIConnectionError(request=request))
+    assert is_retryable(openai.APITimeoutError(request=request))
+    assert not is_retryable(ValueError("bad input"))
+
+
+def test_client_errors_fail_fast():
+    """Test a non-retryable error surfaces without further attempts"""
+    provider = StubProvider(failures=1, status=400)
+    executor = EmbeddingExecutor(concurrency=1, requests_per_minute=0, texts_per_minute=0, retries=5, backoff=0.001)
+    with pytest.raises(ProviderError):
+        run(executor, provider, ["a"])
+    assert provider.calls == 1
+    assert executor.stats()["failures"] == 1
+
+
+def test_token_bucket_spaces_out_requests():
+    """Test a drained bucket makes callers wait for the refill"""
+    bucket = TokenBucket(rate_per_minute=600, capacity=2)  # 10/s
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.01)
+    assert waits[3] == pytest.approx(0.2, abs=0.01)
+
+
+def test_batches_larger_than_the_bucket_keep_the_configured_rate():
+    """Test a batch bigger than capacity is charged in full, not capped at capacity"""
+    bucket = TokenBucket(rate_per_minute=600)  # 10 texts/s, capacity 10
+    waits = [bucket.reserve(20) for _ in range(5)]
+    assert waits == pytest.approx([1.0, 3.0, 5.0, 7.0, 9.0], abs=0.01)
+    # 100 texts may start within 9s only because the first 10 were already banked
+    assert (100 - bucket.capacity) / waits[-1] == pytest.approx(10.0, rel=0.01)
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+from app.services.embedding_cache import (
+    EmbeddingCache,
+    MemoryCacheTier,
+    SQLiteCacheTier,
+    make_cache_key,
+)
+
+def test_key_includes_task_type():
+    """Test query and document vectors for the same text never collide"""
+    doc_key = make_cache_key("m", "retrieval_document", "hello")
+    query_key = make_cache_key("m", "retrieval_query", "hello")
+    assert doc_key != query_key
+
+def test_memory_tier_evicts_lru():
+    """Test the in-memory tier stays bounded and counts evictions"""
+    tier = MemoryCacheTier(max_entries=2)
+    tier.set_many({"a": [1.0], "b": [2.0]})
+    tier.get_many(["a"])  # "b" is now least recently used
+    tier.set_many({"c": [3.0]})
+    assert set(tier.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert tier.stats() == {"hits": 3, "misses": 1, "evictions": 1}
+
+def test_disk_hits_are_promoted(tmp_path):
+    """Test a vector found on disk is served from memory afterwards"""
+    disk = SQLiteCacheTier(str(tmp_path / "emb.sqlite"))
+    disk.set_many({"k": [0.5, 0.25]})
+    memory = MemoryCacheTier(max_entries=10)
+    cache = EmbeddingCache([memory, disk])
+
+    assert cache.get("k") == [0.5, 0.25]
+    assert cache.get("k") == [0.5, 0.25]
+    assert memory.stats()["hits"] == 1
+    assert disk.stats()["hits"] == 1
+    disk.close()
+
+def test_disk_reads_batch_access_time_updates(tmp_path):
+    """Test disk hits don't write until touch_batch keys are queued or the next write"""
+    disk = SQLiteCacheTier(str(tmp_path / "emb.sqlite"), touch_batch=3)
+    disk.set_many({k: [1.0] for k in "abcd"})
+    written = disk._conn.total_changes
+
+    disk.get_many(["a", "b"])
+    disk.get_many(["a"])
+    assert disk._conn.total_changes == written
+    disk.get_many(["c"])  # third distinct key: one batched update
+    assert disk._conn.total_changes == written + 3
+    disk.close()
+
+def test_async_lookups_run_blocking_tiers_off_the_loop(tmp_path):
+    """Test aget_many reads the disk tier from a worker thread and promotes hits"""
+    disk = SQLiteCacheTier(str(tmp_path / "emb.sqlite"))
+    disk.set_many({"k": [0.5, 0.25]})
+    memory = MemoryCacheTier(max_entries=10)
+    cache = EmbeddingCache([memory, disk])
+    threads = []
+    read = disk.get_many
+    disk.get_many = lambda keys: threads.append(threading.current_thread()) or read(keys)
+
+    async def scenario():
+        first = await cache.aget("k")
+        second = await cache.aget("k")
+        await cache.aset_many({"n": [1.0, 0.0]})
+        return first, second
+
+    assert asyncio.run(scenario()) == ([0.5, 0.25], [0.5, 0.25])
+    assert threads and threads[0] is not threading.main_thread()
+    assert len(threads) == 1 and memory.stats()["hits"] == 1
+    assert disk.get_many(["n"]) == {"n": [1.0, 0.0]}
+    disk.close()
+
+def test_disk_tier_keeps_a_running_row_count(tmp_path):
+    """Test writes evict by a maintained count, without counting the table each time"""
+    path = str(tmp_path / "emb.sqlite")
+    disk = SQLiteCacheTier(path, max_entries=3)
+    statements = []
+    disk._conn.set_trace_callback(statements.append)
+    disk.set_many({"a": [1.0], "b": [2.0]})
+    disk.set_many({"b": [2.5], "c": [3.0]})  # "b" is replaced, not added
+    assert disk.stats()["evictions"] == 0
+    disk.set_many({"d": [4.0], "e": [5.0]})
+    assert disk.stats()["evictions"] == 2
+    assert "SELECT COUNT(*) FROM embeddings" not in statements  # no full-table count
+    disk.close()
+
+    reopened = SQLiteCacheTier(path, max_entries=3)
+    assert len(reopened.get_many(["a", "b", "c", "d", "e"])) == 3
+    assert reopened._count == 3
+    reopened.close()
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import get_settings
+from app.core.database import Document, IngestedFile
+from app.core.init_db import init_db
+from app.services.bulk_writer import BulkWriter
+from app.services.ingestion import IngestionPipeline, StageError
+
+
+class FlakyEmbedder:
+    """Fails on the given call number, then behaves"""
+
+    def __init__(self, fail_on=None):
+        self.calls = 0
+        self.fail_on = fail_on
+
+    async def aembed_texts(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("provider down")
+        return [[0.1] * 768 for _ in texts]
+
+
+async def noop(**progress):
+    pass
+
+
+def spool(tmp_path, tag: str, paragraphs: range, filename: str = None) -> dict:
+    """Write a text file of numbered paragraphs and describe it like /upload does"""
+    filename = filename or f"{tag}-{uuid.uuid4().hex}.txt"
+    path = tmp_path / uuid.uuid4().hex
+    path.write_text("\n\n".join(f"Paragraph {i} of {tag} about the zero-point drive." for i in paragraphs))
+    return {"filename": filename, "path": str(path), "sha256": hashlib.sha256(path.read_bytes()).hexdigest()}
+
+
+@asynccontextmanager
+async def harness(files):
+    """A pipeline factory on a private engine; rows from `files` are removed afterwards"""
+    init_db()  # creates the checkpoint and file registry tables
+    engine = create_async_engine(get_settings().ASYNC_DATABASE_URL, poolclass=NullPool)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    writer = BulkWriter()
+
+    def pipeline(embedder):
+        services = SimpleNamespace(embedder=embedder, semantic_cache=None)
+        p = IngestionPipeline(
+            services, session_factory=sessions, retries=0, batch_size=1, queue_depth=1, writer=writer
+        )
+        p.chunker.chunk_size, p.chunker.chunk_overlap = 40, 0
+        return p
+
+    async def rows(filename):
+        async with sessions() as db:
+            return await db.scalar(select(func.count()).select_from(Document).where(Document.source == filename))
+
+    try:
+        yield pipeline, rows
+    finally:
+        async with sessions() as db:
+            await db.execute(delete(Document).where(Document.source.in_([f["filename"] for f in files])))
+            await db.execute(delete(IngestedFile).where(IngestedFile.file_hash.in_([f["sha256"] for f in files])))
+            await db.commit()
+        await writer.close()
+        await engine.dispose()
+
+
+def test_failed_job_resumes_after_last_committed_batch(tmp_path):
+    """Test batches commit independently and a re-run skips committed ones"""
+    file = spool(tmp_path, "resume", range(40))
+    job = {"id": uuid.uuid4().hex, "files": [file]}
+
+    async def scenario():
+        async with harness([file]) as (pipeline, rows):
+            with pytest.raises(StageError):
+                await pipeline(FlakyEmbedder(fail_on=3)).run(job, noop)
+            committed = await rows(file["filename"])
+            resumed_embedder = FlakyEmbedder()
+            result = await pipeline(resumed_embedder).run(job, noop)
+            return committed, result, resumed_embedder.calls, await rows(file["filename"])
+
+    committed, result, calls, total = asyncio.run(scenario())
+    assert committed == 2
+    assert result["resumed_from_batch"] == 2
+    assert calls == result["batches"] - 2
+    assert total == result["chunks_created"]
+
+
+def test_reuploads_are_deduplicated(tmp_path):
+    """Test a seen file is skipped and overlapping chunks aren't embedded again"""
+    tag = f"dedupe-{uuid.uuid4().hex}"
+    original = spool(tmp_path, tag, range(10))
+    # A different file sharing paragraphs 5-9 with the original
+    overlapping = spool(tmp_path, tag, range(5, 15), filename=original["filename"])
+
+    async def scenario():
+        async with harness([original, overlapping]) as (pipeline, rows):
+            first = await pipeline(FlakyEmbedder()).run({"id": uuid.uuid4().hex, "files": [original]}, noop)
+            again = await pipeline(FlakyEmbedder()).run({"id": uuid.uuid4().hex, "files": [original]}, noop)
+            embedder = FlakyEmbedder()
+            overlap = await pipeline(embedder).run({"id": uuid.uuid4().hex, "files": [overlapping]}, noop)
+            return first, again, overlap, await rows(original["filename"])
+
+    first, again, overlap, total = asyncio.run(scenario())
+    assert first["chunks_new"] == 10
+    assert again["files_deduplicated"] == 1 and again["chunks_created"] == 0
+    assert (overlap["chunks_new"], overlap["chunks_deduplicated"]) == (5, 5)
+    assert total == 15
+
+
+def test_parse_failure_is_retried_without_repeating_chunks(tmp_path):
+    """Test a parse error restarts the loader and skips pages already chunked"""
+    files = [spool(tmp_path, "parse", range(5)), spool(tmp_path, "parse", range(5, 10))]
+
+    async def scenario():
+        async with harness(files) as (pipeline, rows):
+            p = pipeline(FlakyEmbedder())
+            p.retries, p.backoff = 1, 0
+            iter_pages, calls = p.loader.iter_pages, []
+
+            def flaky_iter_pages(paths):
+                calls.append(paths)
+                for n, item in enumerate(iter_pages(paths)):
+                    if len(calls) == 1 and n == 1:
+                        raise OSError("spool volume unavailable")
+                    yield item
+
+            p.loader.iter_pages = flaky_iter_pages
+            result = await p.run({"id": uuid.uuid4().hex, "files": files}, noop)
+            return len(calls), result, [await rows(f["filename"]) for f in files]
+
+    calls, result, counts = asyncio.run(scenario())
+    assert calls == 2
+    # Both files are stored in full, and the first one's chunks only once
+    assert counts[0] == counts[1] > 0
+    assert result["chunks_created"] == result["chunks_new"] == sum(counts)
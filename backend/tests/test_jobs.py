@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from app.services import jobs as jobs_module
+from app.services.ingestion import IngestionPipeline, StageError
+from app.services.jobs import IngestionQueue, MemoryJobStore, SQLiteJobStore
+
+
+def test_stage_retries_then_succeeds():
+    """Test a flaky stage is retried with backoff before giving up"""
+    pipeline = IngestionPipeline(services=None, retries=2, backoff=0)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("transient")
+        return "ok"
+
+    assert asyncio.run(pipeline._stage("embed", flaky)) == "ok"
+    assert len(calls) == 3
+
+    async def broken():
+        raise RuntimeError("down")
+
+    with pytest.raises(StageError) as exc:
+        asyncio.run(pipeline._stage("write", broken))
+    assert exc.value.stage == "write"
+
+
+def test_queue_runs_job_to_completion(monkeypatch, tmp_path):
+    """Test a queued job is picked up by a worker and reports progress"""
+    async def fake_run(self, job, report):
+        await report(files_parsed=1, chunks_created=3)
+        return {"documents_processed": 1, "chunks_created": 3, "files": ["a.txt"]}
+
+    monkeypatch.setattr(jobs_module.IngestionPipeline, "run", fake_run)
+    spooled = tmp_path / "a.txt"
+    spooled.write_text("hello")
+
+    async def scenario():
+        queue = IngestionQueue(MemoryJobStore(), services=None, workers=1)
+        queue.start()
+        job = await queue.submit([{"filename": "a.txt", "path": str(spooled)}])
+        for _ in range(100):
+            current = await queue.get(job["id"])
+            if current["status"] not in ("queued", "running"):
+                break
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return current
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "succeeded"
+    assert job["progress"]["chunks_created"] == 3
+    assert job["result"]["chunks_created"] == 3
+    assert not spooled.exists()
+
+
+def test_sqlite_store_claims_each_job_once(tmp_path):
+    """Test two workers never dequeue the same job"""
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+    async def scenario():
+        await store.create({"id": "a", "status": "queued"})
+        first = await store.dequeue(timeout=0)
+        second = await store.dequeue(timeout=0)
+        return first, second
+
+    assert asyncio.run(scenario()) == ("a", None)
+    asyncio.run(store.close())
+
+
+def test_worker_survives_errors_and_stale_jobs_are_reclaimed(monkeypatch, tmp_path):
+    """Test a crash in run_job doesn't stop the worker, and a job left running
+    by a dead worker is requeued once its lease runs out"""
+    ran = []
+
+    async def fake_run(self, job, report):
+        ran.append(job["id"])
+        return {"documents_processed": 1, "chunks_created": 0, "files": []}
+
+    monkeypatch.setattr(jobs_module.IngestionPipeline, "run", fake_run)
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+    async def scenario():
+        queue = IngestionQueue(store, services=None, workers=1)
+        queue.lease_seconds = 0.2
+        original = queue.run_job
+        calls = []
+
+        async def flaky_run_job(job_id):
+            calls.append(job_id)
+            if len(calls) == 1:
+                raise RuntimeError("store went away")
+            await original(job_id)
+
+        queue.run_job = flaky_run_job
+        # Left "running" by a worker that died mid-job
+        orphan = await queue.submit([])
+        assert await store.dequeue(timeout=0) == orphan["id"]
+        await store.save({**orphan, "status": "running", "heartbeat_at": 0})
+        assert queue.is_stale(await queue.get(orphan["id"]))
+
+        queue.start()
+        first = await queue.submit([])
+        second = await queue.submit([])
+        for _ in range(200):
+            statuses = [(await queue.get(j["id"]))["status"] for j in (orphan, first, second)]
+            if statuses == ["succeeded"] * 3:
+                break
+            await asyncio.sleep(0.02)
+        await queue.stop()
+        return statuses, calls
+
+    statuses, calls = asyncio.run(scenario())
+    # The job claimed by the crashed run_job is reclaimed as well
+    assert statuses == ["succeeded"] * 3
+    assert len(calls) == 4 and len(ran) == 3
@@ -0,0 +1,40 @@
+import asyncio
+
+from app.core.metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test observations land in cumulative le buckets with sum and count"""
+    registry = MetricsRegistry()
+    latency = registry.register(Histogram("test_seconds", "Test latency", ["stage"], buckets=(0.1, 1.0)))
+    rows = registry.register(Counter("test_rows_total", "Test rows", ["query"]))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, stage="hydrate")
+    rows.labels(query='say "hi"').inc(3)
+
+    text = registry.render()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{stage="hydrate",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="hydrate",le="1"} 2' in text
+    assert 'test_seconds_bucket{stage="hydrate",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="hydrate"} 3' in text
+    assert 'test_rows_total{query="say \\"hi\\""} 3' in text
+
+
+def test_timer_wraps_sync_and_async_functions():
+    """Test the same timer works as a context manager and a decorator"""
+    latency = Histogram("test_timer_seconds", "Test timer", ["stage"])
+
+    @latency.time(stage="work")
+    def work():
+        return 1
+
+    @latency.time(stage="work")
+    async def awork():
+        return 2
+
+    with latency.time(stage="work"):
+        pass
+    assert work() == 1 and asyncio.run(awork()) == 2
+    counts, total = latency.labels(stage="work").snapshot()
+    assert sum(counts) == 3 and total >= 0
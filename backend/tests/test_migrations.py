@@ -0,0 +1,18 @@
+from app.core.migrations import ann_index_ddl, ivfflat_lists
+
+def test_ivfflat_lists_scale_with_rows():
+    """Test lists follow rows/1000, switching to sqrt(rows) past 1M"""
+    assert ivfflat_lists(0) == 1
+    assert ivfflat_lists(500_000) == 500
+    assert ivfflat_lists(4_000_000) == 2000
+
+def test_ann_index_uses_cosine_opclass():
+    """Test both index types are built for the <=> operator"""
+    for index_type in ("hnsw", "ivfflat"):
+        ddl = ann_index_ddl(index_type, "embedding_idx", 10_000)
+        assert f"USING {index_type} (embedding vector_cosine_ops)" in ddl
+
+def test_ann_index_opclass_follows_storage():
+    """Test a halfvec column gets the halfvec opclass"""
+    ddl = ann_index_ddl("hnsw", "embedding_idx", 10_000, storage="halfvec")
+    assert "USING hnsw (embedding halfvec_cosine_ops)" in ddl
@@ -0,0 +1,94 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from app.services.embedder import EmbeddingService
+from app.services.embedding_cache import EmbeddingCache, MemoryCacheTier
+from app.services.providers import HashEmbeddingProvider
+from benchmarks.stub_llm_server import create_app
+
+
+def test_hash_embeddings_are_deterministic_and_topical():
+    """Test the offline provider is seeded, normalised and keeps related texts close"""
+    provider = HashEmbeddingProvider(seed=7)
+    a = np.array(provider.embed("The Zero-Point Drive was invented by Dr. Connor"))
+    b = np.array(provider.embed("Who invented the Zero-Point Drive?"))
+    c = np.array(provider.embed("Quarterly sales figures for the bakery"))
+    assert len(a) == 768
+    assert np.allclose(a, HashEmbeddingProvider(seed=7).embed("The Zero-Point Drive was invented by Dr. Connor"))
+    assert not np.allclose(a, HashEmbeddingProvider(seed=8).embed("The Zero-Point Drive was invented by Dr. Connor"))
+    assert abs(np.linalg.norm(a) - 1.0) < 1e-5
+    assert a @ b > a @ c
+
+
+def test_embedding_service_runs_on_the_hash_provider():
+    """Test the service works without Gemini credentials when given a provider"""
+    service = EmbeddingService(cache=EmbeddingCache([MemoryCacheTier()]), provider=HashEmbeddingProvider())
+    vectors = asyncio.run(service.aembed_texts(["alpha beta", "gamma", "alpha beta"]))
+    assert vectors[0] == vectors[2] == service.embed_query("alpha beta")
+    assert service.model == "hash-768-seed0"
+
+
+def test_sync_embed_texts_refuses_to_run_inside_an_event_loop():
+    """Test embed_texts works from a script but raises clearly under a running loop"""
+    service = EmbeddingService(cache=EmbeddingCache([MemoryCacheTier()]), provider=HashEmbeddingProvider())
+    assert service.embed_texts(["alpha"]) == asyncio.run(service.aembed_texts(["alpha"]))
+
+    async def inside_loop():
+        with pytest.raises(RuntimeError, match="aembed_texts"):
+            service.embed_texts(["alpha"])
+
+    asyncio.run(inside_loop())
+
+
+def test_queries_are_embedded_in_one_provider_call():
+    """Test a query batch makes one call for its uncached, unique queries"""
+    calls = []
+
+    class CountingProvider(HashEmbeddingProvider):
+        async def aembed_queries(self, texts):
+            calls.append(list(texts))
+            return await super().aembed_queries(texts)
+
+    service = EmbeddingService(cache=EmbeddingCache([MemoryCacheTier()]), provider=CountingProvider())
+    service.embed_query("cached already")
+    vectors = asyncio.run(service.aembed_queries(["alpha", "cached already", "beta", "alpha"]))
+    assert calls == [["alpha", "beta"]]
+    assert vectors[0] == vectors[3] == service.embed_query("alpha")
+
+
+def test_embeddings_are_truncated_to_the_stored_dimension():
+    """Test shortened vectors keep the leading components and are renormalised"""
+    service = EmbeddingService(cache=EmbeddingCache([MemoryCacheTier()]), provider=HashEmbeddingProvider())
+    full = np.array(service.embed_query("alpha beta"))
+    service.dim = 256
+    short = np.array(service.embed_query("alpha beta"))
+    assert len(short) == 256
+    assert abs(np.linalg.norm(short) - 1.0) < 1e-5
+    assert np.allclose(short, full[:256] / np.linalg.norm(full[:256]), atol=1e-6)
+
+
+def test_stub_llm_server_speaks_the_openai_protocol():
+    """Test the stand-in server works with the real OpenAI client, plain and streamed"""
+    client = OpenAI(
+        base_url="http://testserver/v1",
+        api_key="stub",
+        http_client=TestClient(create_app(latency_ms=0, tokens_per_sec=0))
+    )
+    messages = [{"role": "user", "content": "Context about the drive. Question: who built it?"}]
+
+    response = client.chat.completions.create(model="stub", messages=messages, max_tokens=10)
+    answer = response.choices[0].message.content
+    assert answer.startswith("[Doc 1]")
+    assert response.usage.completion_tokens == len(answer.split()) == 10
+
+    stream = client.chat.completions.create(
+        model="stub", messages=messages, max_tokens=10, stream=True, stream_options={"include_usage": True}
+    )
+    chunks = list(stream)
+    streamed = "".join(c.choices[0].delta.content or "" for c in chunks if c.choices)
+    assert streamed == answer
+    assert chunks[-1].usage.total_tokens == response.usage.total_tokens
@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services.query_optimizer import QueryOptimizer, normalize_query
+
+class _FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=" reset password steps ")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def _optimizer():
+    completions = _FakeCompletions()
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return QueryOptimizer(client=fake_client, async_client=fake_client), completions
+
+def test_keyword_queries_skip_rewrite():
+    """Test short keyword-like queries don't need an LLM round trip"""
+    optimizer, _ = _optimizer()
+    assert not optimizer.should_rewrite("pgvector hnsw index")
+    assert optimizer.peek("pgvector hnsw index") == "pgvector hnsw index"
+    assert optimizer.should_rewrite("how do I reset my password?")
+    assert optimizer.peek("how do I reset my password?") is None
+
+def test_rewrites_are_cached_by_normalized_query():
+    """Test a repeated question reuses the earlier rewrite"""
+    optimizer, completions = _optimizer()
+    first = asyncio.run(optimizer.aoptimize("How do I reset my password?"))
+    second = asyncio.run(optimizer.aoptimize("  how do i reset my   password "))
+    assert first == second == "reset password steps"
+    assert completions.calls == 1
+    assert normalize_query("Hello  World?") == "hello world"
@@ -1,6 +1,13 @@
+import json
+from types import SimpleNamespace
+
 import pytest
 from fastapi.testclient import TestClient
 
+from app.main import app
+from app.services.registry import get_services
+from app.services.retriever import HybridRetriever
+
 def test_read_stats(client: TestClient):
     """Test the stats endpoint returns 200 and expected structure"""
     response = client.get("/api/v1/rag/stats")
@@ -18,6 +25,48 @@ def test_query_no_input(client: TestClient):
     # Let's verify it doesn't crash 500.
     assert response.status_code in [200, 422, 400]
 
+def test_query_stream_no_input(client: TestClient):
+    """Test streaming query rejects empty input before opening a stream"""
+    response = client.post("/api/v1/rag/query/stream", json={"query": "  "})
+    assert response.status_code == 400
+
+def test_query_batch_rejects_empty_and_oversized_batches(client: TestClient):
+    """Test batch queries are validated before anything is embedded"""
+    assert client.post("/api/v1/rag/query/batch", json={"queries": []}).status_code == 422
+    assert client.post("/api/v1/rag/query/batch", json={"queries": ["ok", " "]}).status_code == 400
+    response = client.post("/api/v1/rag/query/batch", json={"queries": ["q"] * 10_000})
+    assert response.status_code == 400
+
+def test_query_batch_reports_a_failed_answer_on_its_own_line(client: TestClient, monkeypatch):
+    """Test one query's generation error doesn't cut the NDJSON stream short"""
+    class Embedder:
+        async def aembed_queries(self, queries):
+            return [[0.1] * 768 for _ in queries]
+
+    class Generator:
+        async def agenerate_answer(self, query, docs):
+            if query == "bad":
+                raise RuntimeError("LLM timed out")
+            return {"answer": f"about {query}", "sources": [], "tokens_used": 1}
+
+    async def no_docs(self, queries, query_embs, **kwargs):
+        return [[] for _ in queries]
+
+    services = SimpleNamespace(
+        embedder=Embedder(), generator=Generator(), semantic_cache=None, vector_index=None, pgvector_version=()
+    )
+    monkeypatch.setattr(HybridRetriever, "aretrieve_batch", no_docs)
+    app.dependency_overrides[get_services] = lambda: services
+    try:
+        response = client.post("/api/v1/rag/query/batch", json={"queries": ["a", "bad", "c"]})
+    finally:
+        app.dependency_overrides.pop(get_services)
+
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert lines[1]["error"] == "LLM timed out"
+    assert lines[0]["answer"] == "about a" and lines[2]["answer"] == "about c"
+
 def test_upload_no_file(client: TestClient):
     """Test upload without file fails"""
     response = client.post("/api/v1/rag/upload")
@@ -25,3 +74,30 @@ def test_upload_no_file(client: TestClient):
 
 # Note: Integration tests with real DB/OpenAI would require mocking or a live env.
 # For now, we test basic reachability and validation.
+
+def test_upload_unsupported_type(client: TestClient):
+    """Test unsupported files are rejected before a job is queued"""
+    response = client.post(
+        "/api/v1/rag/upload",
+        files={"files": ("notes.docx", b"data", "application/octet-stream")}
+    )
+    assert response.status_code == 400
+
+def test_unknown_job(client: TestClient):
+    """Test polling a job that does not exist"""
+    response = client.get("/api/v1/rag/jobs/does-not-exist")
+    assert response.status_code == 404
+
+def test_metrics_endpoint_exposes_request_latency(client: TestClient):
+    """Test /metrics is Prometheus text and records requests by endpoint"""
+    client.get("/api/v1/rag/jobs/unknown")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'endpoint="get_job",status="404"' in response.text
+    assert "# TYPE rag_stage_seconds histogram" in response.text
+
+def test_request_id_is_echoed(client: TestClient):
+    """Test responses carry the caller's X-Request-ID, or a new one"""
+    assert client.get("/", headers={"X-Request-ID": "abc"}).headers["x-request-id"] == "abc"
+    assert len(client.get("/").headers["x-request-id"]) == 32
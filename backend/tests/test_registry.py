@@ -0,0 +1,13 @@
+from app.core.config import get_settings
+from app.services.registry import ServiceRegistry
+
+def test_services_are_reused(monkeypatch):
+    """Test registry hands out the same long-lived instances"""
+    monkeypatch.setattr(get_settings(), "OPENROUTER_API_KEY", "test-key")
+    services = ServiceRegistry()
+    assert services.generator is services.generator
+    assert services.optimizer is services.optimizer
+    # Generator and optimizer share one pooled client
+    assert services.generator.client is services.optimizer.client
+    assert services.generator.async_client is services.optimizer.async_client
+    services.close()
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.rag import MetadataFilter
+from app.services.retriever import HybridRetriever
+
+
+def compiled(clause, literal_binds: bool = True) -> str:
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": literal_binds}))
+
+
+def test_filters_compile_to_indexable_predicates():
+    """Test source uses IN, metadata uses @> and ranges use a jsonpath @?"""
+    retriever = HybridRetriever(None, None)
+    filters = MetadataFilter(
+        source=["a.pdf", "b.pdf"],
+        metadata={"collection": "handbook"},
+        ranges={"page": {"gte": 3, "lte": 9}, "year": {"gte": 2020}}
+    )
+    source, metadata, page, year = retriever._filter_clauses(filters)
+    source, page, year = map(compiled, (source, page, year))
+    assert "documents.source IN ('a.pdf', 'b.pdf')" in source
+    assert "documents.doc_metadata @>" in compiled(metadata, literal_binds=False)
+    assert metadata.right.value == {"collection": "handbook"}
+    assert """@? CAST('$."page" ? (@ >= 3.0 && @ <= 9.0)' AS JSONPATH)""" in page
+    assert """'$."year" ? (@ >= 2020.0)'""" in year
+    assert retriever._filter_clauses(None) == []
+    assert retriever._filter_clauses(MetadataFilter()) == []
+
+
+def test_filtered_queries_widen_or_iterate_the_ann_scan(monkeypatch):
+    """Test pgvector >= 0.8 gets iterative scans and older servers a wider search"""
+    retriever = HybridRetriever(None, None, pgvector_version=(0, 8, 0))
+    monkeypatch.setattr("app.services.retriever.settings.HNSW_EF_SEARCH", 50)
+    knobs = compiled(retriever._ann_knobs_stmt(None, None, filtered=True))
+    assert "'hnsw.iterative_scan', 'relaxed_order'" in knobs
+    assert "'hnsw.ef_search', '50'" in knobs
+
+    retriever = HybridRetriever(None, None, pgvector_version=(0, 6, 2))
+    knobs = compiled(retriever._ann_knobs_stmt(None, None, filtered=True))
+    assert "iterative_scan" not in knobs
+    assert "'hnsw.ef_search', '200'" in knobs and "'ivfflat.probes', '4'" in knobs
+    assert "ef_search" in compiled(retriever._ann_knobs_stmt(None, None))
+
+
+def test_hydration_keeps_rank_order_and_pool_sizes_are_independent(monkeypatch):
+    """Test content is attached in rank order and candidate pools follow settings"""
+    retriever = HybridRetriever(None, None)
+    ranked = [{"id": 7, "score": 0.9, "final_score": 0.6}, {"id": 3, "score": 0.8, "final_score": 0.5}, {"id": 5}]
+    rows = [SimpleNamespace(id=i, content=f"chunk {i}", doc_metadata={}, source="a.txt") for i in (3, 7)]
+    hydrated = retriever._hydrated(ranked, rows)
+    assert [(d["id"], d["content"]) for d in hydrated] == [(7, "chunk 7"), (3, "chunk 3")]
+    assert "= ANY (" in compiled(retriever._hydrate_stmt(ranked), literal_binds=False)
+
+    assert retriever._pool_sizes(5) == (10, 10)
+    monkeypatch.setattr("app.services.retriever.settings.SEMANTIC_CANDIDATES", 50)
+    assert retriever._pool_sizes(5) == (50, 10)
+
+
+def test_binary_rescoring_widens_ef_search_and_needs_pgvector_07(monkeypatch):
+    """Test the HNSW scan covers the whole Hamming shortlist, and old servers skip it"""
+    monkeypatch.setattr("app.services.retriever.settings.EMBEDDING_BINARY_RESCORE", True)
+    monkeypatch.setattr("app.services.retriever.settings.BINARY_RESCORE_FACTOR", 10)
+    retriever = HybridRetriever(None, None, pgvector_version=(0, 7, 4))
+    assert retriever.binary_rescore
+    assert "'hnsw.ef_search', '100'" in compiled(retriever._ann_knobs_stmt(None, None, k=10))
+    assert "'hnsw.ef_search', '300'" in compiled(retriever._ann_knobs_stmt(None, 300, k=10))
+
+    retriever = HybridRetriever(None, None, pgvector_version=(0, 6, 2))
+    assert not retriever.binary_rescore
+    assert retriever._ann_knobs_stmt(None, None, k=10) is None
+    assert "embedding_bits" not in compiled(retriever._semantic_stmt([0.1] * 768, 10), literal_binds=False)
@@ -0,0 +1,86 @@
+import asyncio
+import uuid
+
+from sqlalchemy import delete
+
+from app.core.database import Document, SessionLocal, async_engine
+from app.core.init_db import init_db
+from app.services.bulk_writer import BulkWriter, content_hash
+from app.services.semantic_cache import SemanticCache, shared_corpus_version
+
+def test_near_duplicate_hits_within_scope():
+    """Test a similar query reuses the answer, but only in the same scope"""
+    cache = SemanticCache(max_entries=4, threshold=0.9, dim=3)
+    cache.store([1.0, 0.0, 0.0], "k5", {"answer": "A"})
+
+    assert cache.lookup([0.99, 0.05, 0.0], "k5")["answer"] == "A"
+    assert cache.lookup([0.99, 0.05, 0.0], "k10") is None
+    assert cache.lookup([0.0, 1.0, 0.0], "k5") is None
+
+def test_corpus_bump_invalidates():
+    """Test answers generated before an upload are not served after it"""
+    cache = SemanticCache(max_entries=4, threshold=0.9, dim=3)
+    cache.store([1.0, 0.0, 0.0], "k5", {"answer": "A"})
+    cache.bump_corpus_version()
+    assert cache.lookup([1.0, 0.0, 0.0], "k5") is None
+
+def test_answer_generated_across_an_invalidation_is_not_stored():
+    """Test store() drops an answer whose lookup predates a corpus bump"""
+    cache = SemanticCache(max_entries=4, threshold=0.9, dim=3)
+    assert cache.lookup([1.0, 0.0, 0.0], "s") is None
+    version = cache.corpus_version
+    cache.bump_corpus_version()  # documents ingested while the answer was generated
+    cache.store([1.0, 0.0, 0.0], "s", {"answer": "old"}, version=version)
+
+    assert cache.lookup([1.0, 0.0, 0.0], "s") is None
+    cache.store([1.0, 0.0, 0.0], "s", {"answer": "new"}, version=cache.corpus_version)
+    assert cache.lookup([1.0, 0.0, 0.0], "s")["answer"] == "new"
+
+def test_bounded_size_evicts_lru():
+    """Test the cache never holds more than max_entries"""
+    cache = SemanticCache(max_entries=2, threshold=0.9, dim=3)
+    cache.store([1.0, 0.0, 0.0], "s", {"answer": "x"})
+    cache.store([0.0, 1.0, 0.0], "s", {"answer": "y"})
+    cache.lookup([1.0, 0.0, 0.0], "s")  # "y" is now least recently used
+    cache.store([0.0, 0.0, 1.0], "s", {"answer": "z"})
+
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup([0.0, 1.0, 0.0], "s") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "s")["answer"] == "x"
+
+def test_expired_entries_miss():
+    """Test entries past their TTL are dropped"""
+    cache = SemanticCache(max_entries=2, threshold=0.9, ttl_seconds=-1, dim=3)
+    cache.store([1.0, 0.0, 0.0], "s", {"answer": "x"})
+    assert cache.lookup([1.0, 0.0, 0.0], "s") is None
+    assert cache.stats()["entries"] == 0
+
+def test_writes_from_another_process_invalidate_via_shared_version():
+    """Test a document write anywhere bumps the shared version the cache polls"""
+    init_db()  # creates the corpus_version table
+    source = f"corpus-version-{uuid.uuid4().hex}"
+    content = f"{source} chunk"
+    cache = SemanticCache(max_entries=2, threshold=0.9, dim=3, version_source=shared_corpus_version, check_interval=0)
+
+    async def scenario():
+        # A separate writer stands in for app.worker: nothing calls bump_corpus_version()
+        writer = BulkWriter()
+        try:
+            await cache.refresh_version()
+            cache.store([1.0, 0.0, 0.0], "s", {"answer": "x"})
+            before = await cache.alookup([1.0, 0.0, 0.0], "s")
+            await writer.write([(content, [0.1] * 768, "{}", source, content_hash(content))])
+            after = await cache.alookup([1.0, 0.0, 0.0], "s")
+        finally:
+            await writer.close()
+            await async_engine.dispose()
+        return before, after
+
+    try:
+        before, after = asyncio.run(scenario())
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(Document).where(Document.source == source))
+            db.commit()
+    assert before["answer"] == "x"
+    assert after is None and cache.stats()["entries"] == 0
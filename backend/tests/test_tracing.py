@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from app.core.metrics import record_cache_lookup, record_llm_usage, record_rows, timed
+from app.core.tracing import RequestIdFilter, current_trace, finish_trace, request_id_var, start_trace
+
+
+def test_stages_and_counters_land_in_the_active_trace():
+    """Test timers, rows, cache results and tokens are recorded per request,
+    including from tasks and threads the request starts"""
+    async def request():
+        request_id_var.set("req-1")
+        trace = start_trace(detailed=True)
+        with timed("retrieve"):
+            await asyncio.to_thread(record_rows, "hydrate", 5)
+            await asyncio.create_task(asyncio.sleep(0))
+            record_cache_lookup("semantic", misses=1)
+        record_llm_usage("generator", SimpleNamespace(prompt_tokens=30, completion_tokens=12))
+        current_trace().add_retrieval("q", [{"id": 1, "score": 0.9, "final_score": 0.6}], semantic=[], keyword=None)
+        return trace.to_dict()
+
+    trace = asyncio.run(request())
+    assert trace["request_id"] == "req-1"
+    assert [s["stage"] for s in trace["spans"]] == ["retrieve"]
+    assert trace["rows"] == {"hydrate": 5}
+    assert trace["cache"] == {"semantic": {"hit": 0, "miss": 1}}
+    assert trace["tokens"] == {"generator": {"prompt": 30, "completion": 12}}
+    assert trace["retrievals"] == [{"query": "q", "ranked": [{"id": 1, "score": 0.9, "final_score": 0.6}], "semantic": []}]
+    assert current_trace() is None
+
+
+def test_traces_are_logged_when_debug_or_slow(caplog):
+    """Test only debug or slow traces are logged, tagged with the request id"""
+    async def request(detailed, slow_ms):
+        request_id_var.set("req-2")
+        trace = start_trace(detailed=detailed)
+        await asyncio.sleep(0.005)
+        finish_trace(trace, slow_ms, query="q")
+
+    caplog.handler.addFilter(RequestIdFilter())
+    with caplog.at_level(logging.INFO, logger="app.core.tracing"):
+        asyncio.run(request(False, 1000))
+        assert not caplog.records
+        asyncio.run(request(False, 1))
+        asyncio.run(request(True, 0))
+    assert len(caplog.records) == 2
+    assert all(r.request_id == "req-2" and r.query == "q" for r in caplog.records)
+    assert "retrievals" not in caplog.records[0].__dict__ and caplog.records[1].retrievals == []
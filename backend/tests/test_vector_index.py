@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from pgvector import HalfVector
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy.dialects import postgresql
+
+from app.services.vector_index import MmapVectorIndex
+
+
+def clustered(n: int, dim: int = 768, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.3 * rng.standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def brute_force(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_exact_search_matches_brute_force(tmp_path, dtype):
+    """Test blocked argpartition top-k returns the true neighbours, best first"""
+    vectors = clustered(500)
+    index = MmapVectorIndex(str(tmp_path / "docs"), dtype=dtype)
+    index.append(np.arange(1000, 1500), vectors)
+    queries = vectors[:5] + 0.01
+
+    ids, scores = index.search(queries, k=10)
+    expected = brute_force(vectors, queries / np.linalg.norm(queries, axis=1, keepdims=True), 10) + 1000
+    overlap = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(ids, expected)])
+    assert overlap >= (1.0 if dtype == "float32" else 0.9)
+    assert np.all(np.diff(scores, axis=1) <= 1e-6)
+
+
+def test_appends_are_visible_to_other_handles_and_deduplicated(tmp_path):
+    """Test a second process-style handle sees new rows and ids are stored once"""
+    path = str(tmp_path / "docs")
+    writer, reader = MmapVectorIndex(path), MmapVectorIndex(path)
+    vectors = clustered(30)
+    assert writer.append(range(20), vectors[:20]) == 20
+    assert writer.append(range(10, 30), vectors[10:]) == 10
+
+    ids, _ = reader.search(vectors[25], k=1)
+    assert reader.count == 30 and ids[0][0] == 25
+    assert reader.search_one(vectors[3], k=50)[0][0] == 3
+    assert len(reader.search_one(vectors[3], k=50)[0]) == 30
+
+
+def test_ivf_search_recall_and_tail(tmp_path, monkeypatch):
+    """Test IVF probing every partition is exact and unpartitioned tail rows are found"""
+    monkeypatch.setattr("app.services.vector_index.settings.VECTOR_INDEX_IVF_MIN_ROWS", 0)
+    vectors = clustered(2000)
+    index = MmapVectorIndex(str(tmp_path / "docs"))
+    index.append(range(1500), vectors[:1500])
+    nlist = index.build_ivf(nlist=16)
+    index.append(range(1500, 2000), vectors[1500:])
+
+    queries = vectors[::100]
+    exact_ids, _ = index.search(queries, k=10, exact=True)
+    full_ids, _ = index.search(queries, k=10, nprobe=nlist)
+    probe_ids, _ = index.search(queries, k=10, nprobe=4)
+    assert np.array_equal(full_ids, exact_ids)
+    recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(probe_ids, exact_ids)])
+    assert recall >= 0.8
+    assert index.search_one(vectors[1999], k=1, nprobe=1)[0] == [1999]
+
+
+class StubDocuments:
+    """Answers sync_from_db's two queries from {id: embedding}. Embeddings
+    can be loaded the way a halfvec column loads: HalfVector when the driver
+    decodes it (psycopg with register_vector), a list of floats when the
+    SQLAlchemy type parses the text form"""
+
+    def __init__(self, vectors: np.ndarray, ids=None, halfvec: str = None):
+        ids = range(len(vectors)) if ids is None else ids
+        if halfvec == "driver":
+            vectors = [HalfVector(v) for v in vectors]
+        elif halfvec == "text":
+            load = HALFVEC(vectors.shape[1]).result_processor(postgresql.dialect(), None)
+            vectors = [load(HalfVector(v).to_text()) for v in vectors]
+        self.rows = dict(zip(ids, vectors))
+        self.listed = None  # ids the id scan returns, if not the rows' ids
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def connect(self):
+        return self
+
+    def execute(self, statement):
+        if len(statement.selected_columns) == 1:
+            return SimpleNamespace(scalars=lambda: iter(self.listed if self.listed is not None else self.rows))
+        ids = statement.whereclause.right.value
+        return SimpleNamespace(all=lambda: [SimpleNamespace(id=i, embedding=self.rows[i]) for i in ids if i in self.rows])
+
+
+@pytest.mark.parametrize("halfvec", ["driver", "text"])
+def test_sync_from_db_loads_halfvec_storage(tmp_path, halfvec):
+    """Test rows stored as halfvec (EMBEDDING_STORAGE=halfvec) are synced into the index"""
+    vectors = clustered(50)
+    engine = StubDocuments(vectors, halfvec=halfvec)
+
+    index = MmapVectorIndex(str(tmp_path / "docs"))
+    assert index.sync_from_db(engine) == 50
+    assert index.sync_from_db(engine) == 0
+    ids, scores = index.search_one(vectors[7], k=1)
+    assert ids[0] == 7 and scores[0] > 0.99
+
+
+def test_sync_rebuilds_when_ids_were_reused_or_deleted(tmp_path, monkeypatch):
+    """Test ids gone from the table (e.g. after reset_db) never map onto new rows"""
+    monkeypatch.setattr("app.services.vector_index._SYNC_FETCH", 10)
+    old, new = clustered(30, seed=1), clustered(20, seed=2)
+    index = MmapVectorIndex(str(tmp_path / "docs"))
+    assert index.sync_from_db(StubDocuments(old)) == 30
+
+    # Table recreated: ids 0-19 now belong to different documents
+    assert index.sync_from_db(StubDocuments(new)) == 20
+    assert index.count == 20
+    assert index.search_one(new[5], k=1)[0] == [5]
+    assert index.search_one(old[25], k=1)[1][0] < 0.99
+
+    # A whole fetch of ids (130-139) deleted between the id scan and the fetch
+    documents = StubDocuments(clustered(30, seed=3), ids=range(100, 130))
+    documents.listed = list(range(100, 140))
+    assert index.sync_from_db(documents) == 30
+    assert index.count == 30 and index.ready
@@ -74,9 +74,18 @@ export const RAGInterface: React.FC = () => {
         });
 
         try {
-            await axios.post('/api/v1/rag/upload', formData, {
+            const res = await axios.post('/api/v1/rag/upload', formData, {
                 headers: { 'Content-Type': 'multipart/form-data' }
             });
+            // Ingestion runs in the background; wait for the job to finish
+            let job = res.data;
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                job = (await axios.get(`/api/v1/rag/jobs/${job.job_id}`)).data;
+            }
+            if (job.status === 'failed') {
+                throw { response: { data: { detail: job.error || 'Ingestion failed' } } };
+            }
             // Refresh stats after upload
             await fetchStats();
             setQuery(''); // Optional: clear query